@@ -0,0 +1,63 @@
+"""
+Abbreviation expansion throughput: the re.sub-per-entry loop clean_legal_text used to run versus AbbreviationExpander's
+single pass, over the legal abbreviation dictionary padded with synthetic entries to grow it.
+
+Usage:
+    python -m benchmarks.bench_abbreviations [--documents 200] [--sizes 238 1000 5000]
+"""
+import argparse
+import random
+import re
+import string
+import time
+
+from text_processing.abbreviations import AbbreviationExpander, abbreviation_pattern
+from text_processing.cleaning import legal_abbreviations
+from benchmarks.bench_clean_parallel import make_documents
+
+
+def make_dictionary(size, seed=0):
+    abbreviations = dict(legal_abbreviations)
+    rng = random.Random(seed)
+    while len(abbreviations) < size:
+        # upper-case letters and a trailing period, so the synthetic entries never occur in the documents
+        abbreviation = "".join(rng.choices(string.ascii_uppercase, k=rng.randint(4, 7))) + "."
+        abbreviations.setdefault(abbreviation, abbreviation.lower().rstrip("."))
+    return abbreviations
+
+
+def expand_loop(text, abbreviations):
+    for abbreviation, expansion in abbreviations.items():
+        text = re.sub(abbreviation_pattern(abbreviation), r"\1" + expansion, text)
+    return text
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=200)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[len(legal_abbreviations), 1000, 5000])
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+    print(f"{'entries':>8} {'build':>10} {'loop':>16} {'single pass':>16}  single_pass")
+    for size in args.sizes:
+        abbreviations = make_dictionary(size)
+        start = time.perf_counter()
+        expander = AbbreviationExpander(abbreviations)
+        build_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expected = [expand_loop(document, abbreviations) for document in documents]
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        expanded = [expander.expand(document) for document in documents]
+        single_time = time.perf_counter() - start
+        assert expanded == expected, "single-pass expansion changed the output"
+
+        print(f"{len(expander.abbreviations):>8} {build_time:8.2f} s {len(documents) / loop_time:10.1f} docs/s "
+              f"{len(documents) / single_time:10.1f} docs/s  {expander.single_pass}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Cleaning throughput in documents/sec: a plain clean_legal_text loop versus clean_legal_texts over 1, 2, 4 and 8
+worker processes.
+
+Usage:
+    python -m benchmarks.bench_clean_parallel [--documents 20000] [--workers 1 2 4 8] [--chunksize 64]
+"""
+import argparse
+import random
+import time
+
+from text_processing import clean_legal_text, clean_legal_texts
+
+SENTENCES = [
+    "135. Abetment WAPDA of desertion of soldier, sailor [or] [airman.]",
+    "By A.O., the Govt. or govt. has decided to include WAPDA and PC for max or max. profit p/a.",
+    "The penalty under Sec. 3(a)-2 of the Act may include fines and imprisonment.",
+    "Under the Copyright Ordinance 1962 the High Court heard the petition on Pg. 45.",
+    "Page 3of10 The Companies Ordinance 1984 and SRO 123(I)/2020 are also relevant to the company.",
+]
+
+
+def make_documents(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(SENTENCES, k=rng.randint(3, 12))) for _ in range(n)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=20000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument("--chunksize", type=int, default=64)
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+
+    start = time.perf_counter()
+    expected = [clean_legal_text(document) for document in documents]
+    loop_time = time.perf_counter() - start
+    print(f"loop:       {len(documents) / loop_time:10.1f} documents/sec")
+
+    for workers in args.workers:
+        start = time.perf_counter()
+        cleaned = list(clean_legal_texts(documents, workers=workers, chunksize=args.chunksize))
+        elapsed = time.perf_counter() - start
+        assert cleaned == expected, "parallel cleaning changed the output"
+        print(f"{workers:>2} workers: {len(documents) / elapsed:10.1f} documents/sec ({loop_time / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
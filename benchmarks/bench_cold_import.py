@@ -0,0 +1,58 @@
+"""
+Cold-import time of each package, measured in a fresh interpreter per run so nothing is already in sys.modules.
+
+Usage:
+    python -m benchmarks.bench_cold_import [--runs 5] [--modules ml_integration text_processing ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+MODULES = ["utils", "text_processing", "urdu_processing", "ml_integration"]
+
+# imports the module and reports the time it took, plus whether any heavy resource got loaded on the way
+PROBE = """
+import sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+from utils.resources import _resources
+heavy = sorted(name for name in ("transformers", "torch", "langdetect", "urduhack") if name in sys.modules)
+print(elapsed, len(_resources), ",".join(heavy))
+"""
+
+
+def measure(module, runs, root):
+    times = []
+    resources, heavy = 0, ""
+    for _ in range(runs):
+        output = subprocess.run([sys.executable, "-c", PROBE.format(module=module)], cwd=root, check=True,
+                                capture_output=True, text=True).stdout.split()
+        times.append(float(output[0]))
+        resources = int(output[1])
+        heavy = output[2] if len(output) > 2 else ""
+    return times, resources, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--modules", nargs="+", default=MODULES)
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    print(f"{'module':<18} {'median':>10} {'min':>10}  resources loaded  heavy modules imported")
+    for module in args.modules:
+        try:
+            times, resources, heavy = measure(module, args.runs, root)
+        except subprocess.CalledProcessError as error:
+            print(f"{module:<18} failed to import: {error.stderr.strip().splitlines()[-1]}")
+            continue
+        print(f"{module:<18} {statistics.median(times) * 1000:8.1f} ms {min(times) * 1000:8.1f} ms  "
+              f"{resources:>16}  {heavy or '-'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Pattern extraction throughput on a large synthetic statute: six re.findall scans over patterns rebuilt on every call
+(how extract_patterns used to run), extract_patterns over its precompiled patterns, PatternScanner's single pass,
+and the same scan streamed page by page.
+
+Usage:
+    python -m benchmarks.bench_pattern_scanner [--pages 50 500] [--runs 3]
+"""
+import argparse
+import random
+import re
+import time
+
+from text_processing.pattern_matching import PATTERNS, extract_patterns, pattern_scanner
+
+# the provisions, amendment notes and references a statute is made of
+PROVISIONS = [
+    "135. Abetment of desertion of soldier, sailor or airman. Whoever abets the desertion of any officer shall be "
+    "punished with imprisonment which may extend to two years, or with fine, or with both.",
+    "[Definition of “Queen”.] Omitted by A.O., 1961, Art. 2 and Sch. (w.e.f. the 23rd March, 1956).",
+    "[Adultery.] Rep. by the Offences of Zina (Enforcement of Hudood) Ordinance, 1979 (VII of 1979), s. 19 (w.e.f "
+    "the 10th day of February, 1979).",
+    "The Workmen's Breach of Contract (Repealing) Act, 1925 (III of 1925), s. 2 and Sch.",
+    "Nothing in Section 123(a) or Sec. 4.66 shall affect the powers conferred by 123 U.S.C. § 456 as in force on "
+    "Aug 15, 2024.",
+    "In the case of Smith v. Jones, 123 F.2d 456 (2022), the court interpreted the Ordinance, 1984.",
+]
+
+
+def make_statute(pages, words_per_page=500, seed=0):
+    rng = random.Random(seed)
+    statute = []
+    for _ in range(pages):
+        page = []
+        while sum(len(provision.split()) for provision in page) < words_per_page:
+            page.append(rng.choice(PROVISIONS))
+        statute.append(" ".join(page) + "\n")
+    return statute
+
+
+def extract_rebuilt(text):
+    patterns = dict(PATTERNS)
+    return {key: re.findall(pattern, text) for key, pattern in patterns.items()}
+
+
+def best_time(function, runs):
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 500])
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'MB':>6} {'six findall':>14} {'precompiled':>14} {'one pass':>14} {'streamed':>14}")
+    for pages in args.pages:
+        statute = make_statute(pages)
+        text = "".join(statute)
+        assert list(pattern_scanner.scan_chunks(statute)) == list(pattern_scanner.scan(text)), \
+            "streaming changed the matches"
+        megabytes = len(text.encode("utf-8")) / 1e6
+        timings = [
+            best_time(lambda: extract_rebuilt(text), args.runs),
+            best_time(lambda: extract_patterns(text), args.runs),
+            best_time(lambda: list(pattern_scanner.scan(text)), args.runs),
+            best_time(lambda: list(pattern_scanner.scan_chunks(statute)), args.runs),
+        ]
+        print(f"{pages:>6} {megabytes:6.1f} " + " ".join(f"{megabytes / t:9.1f} MB/s" for t in timings))
+
+
+if __name__ == "__main__":
+    main()
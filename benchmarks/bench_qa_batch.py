@@ -0,0 +1,47 @@
+"""
+End-to-end throughput in questions/sec: calling legal_qa_system once per question versus legal_qa_system_batch.
+
+Usage:
+    python -m benchmarks.bench_qa_batch [--questions 200] [--batch-size 16]
+"""
+import argparse
+import time
+
+from ml_integration import (LegalCorpusIndex, legal_qa_system, legal_qa_system_batch, load_finetuned_model,
+                            load_sample_documents)
+
+QUESTIONS = [
+    "What is the penalty for copyright infringement?",
+    "Which ordinance governs copyright law in Pakistan?",
+    "Is copyright infringement a punishable offense?",
+    "When was the Copyright Ordinance enacted?",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=200)
+    parser.add_argument("--batch-size", type=int, default=16)
+    args = parser.parse_args()
+
+    documents = load_sample_documents()
+    model, tokenizer = load_finetuned_model()
+    index = LegalCorpusIndex.build(documents)
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.questions)]
+
+    start = time.perf_counter()
+    for question in questions:
+        legal_qa_system(question, documents, model, tokenizer, index=index)
+    loop_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legal_qa_system_batch(questions, documents, model, tokenizer, index=index, batch_size=args.batch_size)
+    batch_time = time.perf_counter() - start
+
+    print(f"single-question loop: {len(questions) / loop_time:8.2f} questions/sec")
+    print(f"batched (size {args.batch_size:>3}): {len(questions) / batch_time:8.2f} questions/sec "
+          f"({loop_time / batch_time:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Per-question QA latency and answer agreement of the int8 dynamically quantized model against the fp32 model,
+on the sample documents.
+
+Usage:
+    python -m benchmarks.bench_quantization [--repeats 20] [--threads 4] [--cache-dir .model_cache]
+"""
+import argparse
+import statistics
+import time
+
+from transformers import pipeline
+
+from ml_integration import LegalCorpusIndex, generate_answer, load_finetuned_model, load_sample_documents
+
+QUESTIONS = [
+    "What is the penalty for copyright infringement?",
+    "Which ordinance governs copyright law in Pakistan?",
+    "Is copyright infringement a punishable offense?",
+    "When was the Copyright Ordinance enacted?",
+    "How is copyright infringement considered in Pakistan?",
+]
+
+
+def run(model, tokenizer, contexts, repeats):
+    qa_pipeline = pipeline("question-answering", model=model, tokenizer=tokenizer)
+    # the first call pays one-off initialisation costs, so it is not timed
+    generate_answer(QUESTIONS[0], contexts[0], model, tokenizer, [], qa_pipeline=qa_pipeline)
+    latencies, answers = [], []
+    for repeat in range(repeats):
+        for question, context in zip(QUESTIONS, contexts):
+            start = time.perf_counter()
+            answer, _ = generate_answer(question, context, model, tokenizer, [], qa_pipeline=qa_pipeline)
+            latencies.append(time.perf_counter() - start)
+            if repeat == 0:
+                answers.append(answer)
+    return latencies, answers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--threads", type=int, default=None)
+    parser.add_argument("--cache-dir", default=None)
+    args = parser.parse_args()
+
+    documents = load_sample_documents()
+    index = LegalCorpusIndex.build(documents)
+    contexts = [" ".join(index.retrieve(question)) for question in QUESTIONS]
+
+    model, tokenizer = load_finetuned_model(num_threads=args.threads)
+    fp32_latencies, fp32_answers = run(model, tokenizer, contexts, args.repeats)
+
+    start = time.perf_counter()
+    model, tokenizer = load_finetuned_model(optimize=True, num_threads=args.threads, cache_dir=args.cache_dir)
+    load_time = time.perf_counter() - start
+    int8_latencies, int8_answers = run(model, tokenizer, contexts, args.repeats)
+
+    agreement = sum(a == b for a, b in zip(fp32_answers, int8_answers)) / len(QUESTIONS)
+    for name, latencies in (("fp32", fp32_latencies), ("int8", int8_latencies)):
+        print(f"{name}: mean {statistics.mean(latencies) * 1000:8.2f} ms  "
+              f"p50 {statistics.median(latencies) * 1000:8.2f} ms per question")
+    print(f"speed-up: {statistics.mean(fp32_latencies) / statistics.mean(int8_latencies):.2f}x")
+    print(f"answer agreement: {agreement:.0%} of {len(QUESTIONS)} questions")
+    print(f"int8 load time: {load_time:.2f} s (run again with --cache-dir to time a cached startup)")
+    for question, fp32_answer, int8_answer in zip(QUESTIONS, fp32_answers, int8_answers):
+        if fp32_answer != int8_answer:
+            print(f"  differs: {question!r}: fp32 {fp32_answer!r} vs int8 {int8_answer!r}")
+
+
+if __name__ == "__main__":
+    main()
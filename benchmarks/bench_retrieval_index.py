@@ -0,0 +1,70 @@
+"""
+Per-query retrieval latency: refitting TF-IDF on every question (retrieve_relevant_segments without an index)
+versus querying a prefit LegalCorpusIndex or BM25Index.
+
+Usage:
+    python -m benchmarks.bench_retrieval_index [--sizes 10000 100000] [--queries 20]
+"""
+import argparse
+import random
+import time
+
+from ml_integration import BM25Index, LegalCorpusIndex, retrieve_relevant_segments
+
+VOCABULARY = (
+    "court penalty copyright infringement ordinance section act fine imprisonment appeal law pakistan "
+    "constitution article jurisdiction supreme high petition federal provincial government offence "
+    "punishment accused witness evidence contract property tax company director shareholder notification"
+).split()
+
+QUESTIONS = [
+    "what is the penalty for copyright infringement",
+    "article jurisdiction of the supreme court",
+    "punishment for an offence under the ordinance",
+    "tax notification issued by the federal government",
+]
+
+
+def make_segments(n, seed=0):
+    rng = random.Random(seed)
+    return [" ".join(rng.choices(VOCABULARY, k=rng.randint(10, 60))) for _ in range(n)]
+
+
+def time_per_query(fn, questions):
+    start = time.perf_counter()
+    for question in questions:
+        fn(question)
+    return (time.perf_counter() - start) / len(questions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--queries", type=int, default=20)
+    args = parser.parse_args()
+
+    questions = [QUESTIONS[i % len(QUESTIONS)] for i in range(args.queries)]
+    for size in args.sizes:
+        segments = make_segments(size)
+
+        # the refit path is O(corpus) per question, so a handful of queries is enough
+        before = time_per_query(lambda q: retrieve_relevant_segments(q, segments), questions[:3])
+
+        start = time.perf_counter()
+        index = LegalCorpusIndex.build(segments)
+        build_time = time.perf_counter() - start
+        after = time_per_query(lambda q: retrieve_relevant_segments(q, segments, index=index), questions)
+
+        print(f"{size:>7} segments | refit per query: {before * 1000:9.2f} ms | "
+              f"prefit index: {after * 1000:7.3f} ms | one-off build: {build_time:.2f} s | "
+              f"speedup: {before / after:6.1f}x")
+
+        start = time.perf_counter()
+        bm25 = BM25Index.build(segments)
+        build_time = time.perf_counter() - start
+        after = time_per_query(lambda q: retrieve_relevant_segments(q, segments, index=bm25), questions)
+        print(f"{size:>7} segments | {'':27} | bm25 index:   {after * 1000:7.3f} ms | one-off build: {build_time:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""
+Legal POS tagging throughput in documents/sec: the full en_core_web_sm pipeline called once per document versus
+tag_documents, which runs only the tagging components through nlp.pipe, over 1, 2 and 4 processes.
+
+Usage:
+    python -m benchmarks.bench_spacy_tagging [--documents 2000] [--batch-size 64] [--processes 1 2 4]
+"""
+import argparse
+import time
+
+from text_processing.pos_tagging import TAGGING_COMPONENTS, get_legal_pos_model, tag_documents
+from benchmarks.bench_clean_parallel import make_documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--processes", type=int, nargs="+", default=[1, 2, 4])
+    args = parser.parse_args()
+
+    documents = make_documents(args.documents)
+
+    for label, components in (("full", None), ("pruned", TAGGING_COMPONENTS)):
+        start = time.perf_counter()
+        model = get_legal_pos_model(components)
+        print(f"load {label + ':':8} {time.perf_counter() - start:6.2f} s  {model.pipe_names}")
+
+    model = get_legal_pos_model()
+    start = time.perf_counter()
+    expected = [[token.tag_ for token in model(document)] for document in documents]
+    loop_time = time.perf_counter() - start
+    print(f"per-document loop: {len(documents) / loop_time:10.1f} documents/sec")
+
+    for processes in args.processes:
+        start = time.perf_counter()
+        tags = [[token.tag_ for token in doc]
+                for doc in tag_documents(documents, batch_size=args.batch_size, n_process=processes)]
+        elapsed = time.perf_counter() - start
+        assert tags == expected, "pruned, batched tagging changed the tags"
+        print(f"tag_documents, {processes} process{'es' if processes > 1 else '  '}: "
+              f"{len(documents) / elapsed:10.1f} documents/sec ({loop_time / elapsed:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -3,7 +3,7 @@ import cv2
 import unittest
 from tests.test_text_processing import TestTokenizeLegalText, TestCleanLegalText, TestNormalizeLegalText, TestPatternExtraction
 from tests.test_ml_integration import TestLegalQASystem
-from text_processing import clean_legal_text
+from text_processing import clean_legal_texts
 from ml_integration import legal_qa_system, load_sample_documents, load_finetuned_model
 
 # Example usage
@@ -25,9 +25,7 @@ question = """What is the penalty for copyright infringement?"""
 documents = load_sample_documents() # Implement this function to load your legal corpus
 fine_tuned_model, tokenizer = load_finetuned_model()
 if documents and isinstance(documents, list):
-  cleaned_documents = []
-  for i in range(len(documents)):
-    cleaned_documents.append(clean_legal_text(documents[i]))
+  cleaned_documents = list(clean_legal_texts(documents))
   print(cleaned_documents)
   answer = legal_qa_system(question, cleaned_documents, fine_tuned_model, tokenizer)
   print(f"\nQuestion: {question}")
@@ -1,3 +1,13 @@
-from .legal_qa_system import legal_qa_system, load_sample_documents, load_legal_documents, load_finetuned_model, postprocess_answer, generate_answer, retrieve_relevant_segments, preprocess_question
+from .legal_qa_system import legal_qa_system, load_sample_documents, load_legal_documents, load_finetuned_model, postprocess_answer, generate_answer, retrieve_relevant_segments, preprocess_question, legal_qa_system_batch, preprocess_questions, generate_answers, answer_from_passages, quantize_model, generate_answer_cascade, generate_answers_cascade, retrieve_cited_segments
+from .corpus_index import LegalCorpusIndex
+from .bm25_index import BM25Index
+from .passages import PassageIndex, Passage, split_passages
+from .dense_index import DenseIndex, HybridIndex, TransformerEncoder
+from .answer_cache import AnswerCache, corpus_fingerprint, model_fingerprint, settings_fingerprint
+from .qa_engine import LegalQAEngine
+from .qa_service import QAService
+from .citation_index import CitationIndex, canonicalize_citation, extract_citations
+from .token_store import TokenStore, TokenStoreWriter
+from .ingestion import ingest_pdfs, iter_corpus, build_index_from_corpus, build_citation_index_from_corpus, build_token_store_from_corpus
 
-__all__ = ["legal_qa_system", "load_legal_documents", "load_sample_documents", "load_finetuned_model", "postprocess_answer", "generate_answer", "retrieve_relevant_segments", "preprocess_question"]
+__all__ = ["legal_qa_system", "load_legal_documents", "load_sample_documents", "load_finetuned_model", "postprocess_answer", "generate_answer", "retrieve_relevant_segments", "preprocess_question", "legal_qa_system_batch", "preprocess_questions", "generate_answers", "answer_from_passages", "quantize_model", "generate_answer_cascade", "generate_answers_cascade", "retrieve_cited_segments", "LegalCorpusIndex", "BM25Index", "PassageIndex", "Passage", "split_passages", "DenseIndex", "HybridIndex", "TransformerEncoder", "AnswerCache", "corpus_fingerprint", "model_fingerprint", "settings_fingerprint", "LegalQAEngine", "QAService", "ingest_pdfs", "iter_corpus", "build_index_from_corpus", "CitationIndex", "canonicalize_citation", "extract_citations", "build_citation_index_from_corpus", "TokenStore", "TokenStoreWriter", "build_token_store_from_corpus"]
@@ -0,0 +1,267 @@
+import hashlib
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def corpus_fingerprint(documents):
+    """
+    Computes a content hash of a corpus. Any added, removed, reordered or edited document changes it.
+
+    Args:
+        documents (list of str): The corpus of legal documents.
+
+    Returns:
+        str: A hex digest identifying the corpus version.
+    """
+    digest = hashlib.sha256()
+    for document in documents:
+        encoded = document.encode("utf-8")
+        digest.update(len(encoded).to_bytes(8, "little"))
+        digest.update(encoded)
+    return digest.hexdigest()
+
+
+def model_fingerprint(model, tokenizer=None):
+    """
+    Computes a hash identifying a QA model: its name or path, its configuration and whether it is quantized, plus the
+    tokenizer's name.
+
+    Weights are not hashed; when a checkpoint is retrained in place under the same path, pass an explicit
+    model_version to the cache instead.
+
+    Args:
+        model (PreTrainedModel): The question answering model.
+        tokenizer (PreTrainedTokenizer, optional): The tokenizer corresponding to the model.
+
+    Returns:
+        str: A hex digest identifying the model version.
+    """
+    digest = hashlib.sha256()
+    digest.update(type(model).__name__.encode("utf-8"))
+    name = getattr(model, "name_or_path", None)
+    config = getattr(model, "config", None)
+    if config is not None and hasattr(config, "to_json_string"):
+        digest.update(config.to_json_string().encode("utf-8"))
+    digest.update(str(name if name is not None else model).encode("utf-8"))
+    modules = getattr(model, "modules", None)
+    if callable(modules) and any(type(module).__module__.startswith("torch.ao.nn.quantized") for module in modules()):
+        # an int8 model shares its fp32 config but may give slightly different answers
+        digest.update(b"int8")
+    if tokenizer is not None:
+        digest.update(str(getattr(tokenizer, "name_or_path", type(tokenizer).__name__)).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def settings_fingerprint(**settings):
+    """
+    Computes a hash of the pipeline settings that change an answer (retriever, top_k, cascade threshold, ...), so
+    that engines configured differently never serve each other's answers from a shared cache.
+
+    Args:
+        **settings: The settings, as names and values with a stable repr.
+
+    Returns:
+        str: A hex digest identifying the settings.
+    """
+    raw = "\0".join(f"{name}={settings[name]!r}" for name in sorted(settings))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class AnswerCache:
+    """
+    A two-tier cache of final answers: an in-memory LRU in front of an optional SQLite file.
+
+    Entries are keyed on the preprocessed question together with the corpus, model and settings versions, so a new
+    corpus, model or configuration never serves stale answers. Engines over different corpora can share one disk
+    file: entries of other versions are left alone and only go through TTL and size eviction.
+    """
+
+    def __init__(self, corpus_version, model_version, max_entries=1024, ttl=None, path=None, max_disk_entries=100_000,
+                 settings_version=""):
+        """
+        Args:
+            corpus_version (str): The corpus fingerprint, e.g. from corpus_fingerprint.
+            model_version (str): The model fingerprint, e.g. from model_fingerprint.
+            max_entries (int): The size of the in-memory LRU tier.
+            ttl (float, optional): The time to live of an entry in seconds. Entries never expire when None.
+            path (str, optional): The SQLite file of the disk tier. Only the memory tier is used when None.
+            max_disk_entries (int): The number of entries kept on disk; the least recently used are evicted.
+            settings_version (str): The pipeline settings fingerprint, e.g. from settings_fingerprint.
+        """
+        self.corpus_version = corpus_version
+        self.model_version = model_version
+        self.settings_version = settings_version
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.max_disk_entries = max_disk_entries
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._disk_entries = 0
+        if path is not None:
+            self._db = sqlite3.connect(path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS answers (key TEXT PRIMARY KEY, corpus_version TEXT, model_version TEXT, "
+                "answer TEXT, created REAL, accessed REAL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_accessed ON answers (accessed)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS answers_created ON answers (created)")
+            # a running count of the disk entries, so put() only evicts once the table is over max_disk_entries
+            self._disk_entries = self._db.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    @classmethod
+    def for_corpus(cls, documents, model, tokenizer=None, **kwargs):
+        """
+        Creates a cache bound to the fingerprints of a corpus and model.
+
+        Args:
+            documents (list of str): The corpus of legal documents.
+            model (PreTrainedModel): The question answering model.
+            tokenizer (PreTrainedTokenizer, optional): The tokenizer corresponding to the model.
+            **kwargs: Passed on to AnswerCache (max_entries, ttl, path, max_disk_entries, settings_version).
+
+        Returns:
+            AnswerCache: The cache.
+        """
+        return cls(corpus_fingerprint(documents), model_fingerprint(model, tokenizer), **kwargs)
+
+    def bind(self, corpus_version, model_version, settings_version=""):
+        """
+        Switches the cache to another corpus, model or settings version. Entries of the previous versions are no
+        longer served, and are left to TTL and size eviction.
+
+        Args:
+            corpus_version (str): The new corpus fingerprint.
+            model_version (str): The new model fingerprint.
+            settings_version (str): The new pipeline settings fingerprint.
+        """
+        with self._lock:
+            self.corpus_version = corpus_version
+            self.model_version = model_version
+            self.settings_version = settings_version
+
+    def key(self, question):
+        """
+        Builds the cache key of a preprocessed question for the current corpus, model and settings.
+
+        Args:
+            question (str): The question as returned by preprocess_question.
+
+        Returns:
+            str: The cache key.
+        """
+        raw = "\0".join([self.corpus_version, self.model_version, self.settings_version, question])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, question):
+        """
+        Looks up the answer to a preprocessed question.
+
+        Args:
+            question (str): The question as returned by preprocess_question.
+
+        Returns:
+            str: The cached final answer, or None on a miss.
+        """
+        key = self.key(question)
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                answer, created = entry
+                if self.ttl is None or now - created <= self.ttl:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return answer
+                del self._memory[key]
+            if self._db is not None:
+                row = self._db.execute("SELECT answer, created FROM answers WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    answer, created = row
+                    if self.ttl is None or now - created <= self.ttl:
+                        self._db.execute("UPDATE answers SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, answer, created)
+                        self.hits += 1
+                        self.disk_hits += 1
+                        return answer
+                    self._disk_entries -= self._db.execute("DELETE FROM answers WHERE key = ?", (key,)).rowcount
+                    self._db.commit()
+            self.misses += 1
+            return None
+
+    def put(self, question, answer):
+        """
+        Stores the final answer to a preprocessed question in both tiers.
+
+        Args:
+            question (str): The question as returned by preprocess_question.
+            answer (str): The final answer.
+        """
+        key = self.key(question)
+        now = time.time()
+        with self._lock:
+            self._remember(key, answer, now)
+            if self._db is not None:
+                if self._db.execute("SELECT 1 FROM answers WHERE key = ?", (key,)).fetchone() is None:
+                    self._disk_entries += 1
+                self._db.execute(
+                    "INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?, ?)",
+                    (key, self.corpus_version, self.model_version, answer, now, now),
+                )
+                if self.ttl is not None:
+                    self._disk_entries -= self._db.execute("DELETE FROM answers WHERE created < ?",
+                                                           (now - self.ttl,)).rowcount
+                if self._disk_entries > self.max_disk_entries:
+                    # only the least recently used rows are read, through the index on accessed
+                    self._disk_entries -= self._db.execute(
+                        "DELETE FROM answers WHERE key IN (SELECT key FROM answers ORDER BY accessed LIMIT ?)",
+                        (self._disk_entries - self.max_disk_entries,),
+                    ).rowcount
+                self._db.commit()
+
+    def _remember(self, key, answer, created):
+        self._memory[key] = (answer, created)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def stats(self):
+        """
+        Returns the hit and miss counters.
+
+        Returns:
+            dict: hits, misses, disk_hits, hit_rate and the number of entries held in memory.
+        """
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "disk_hits": self.disk_hits,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._memory),
+        }
+
+    def clear(self):
+        """
+        Removes every entry from both tiers.
+        """
+        with self._lock:
+            self._memory.clear()
+            if self._db is not None:
+                self._db.execute("DELETE FROM answers")
+                self._db.commit()
+                self._disk_entries = 0
+
+    def close(self):
+        """
+        Closes the disk tier.
+        """
+        if self._db is not None:
+            self._db.close()
+            self._db = None
@@ -0,0 +1,281 @@
+import numpy as np
+from scipy import sparse
+from .answer_cache import corpus_fingerprint
+from .corpus_index import build_analyzer, pack_strings, unpack_strings, top_k_sparse, store_term_counts, npz_path
+
+
+class BM25Index:
+    """
+    An Okapi BM25 inverted index over a legal corpus.
+
+    Posting lists are stored as three flat arrays: the document ids (int32) and precomputed BM25 term weights
+    (float32) of every posting, concatenated term by term, plus an offsets array that marks where each term's
+    postings start. A query only reads the postings of its own terms.
+    """
+
+    def __init__(self, k1=1.5, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.documents = []
+        self.vocabulary = {}
+        self.idf = np.empty(0, dtype=np.float32)
+        self.posting_offsets = np.zeros(1, dtype=np.int64)
+        self.posting_docs = np.empty(0, dtype=np.int32)
+        self.posting_weights = np.empty(0, dtype=np.float32)
+        self.version = corpus_fingerprint([])
+        # same tokenisation as the TF-IDF retriever so the two backends see identical terms
+        self._analyzer = build_analyzer()
+
+    def __len__(self):
+        return len(self.documents)
+
+    def fit(self, documents):
+        """
+        Builds the posting lists for the corpus.
+
+        Args:
+            documents (list of str): The corpus of legal documents.
+
+        Returns:
+            BM25Index: The fitted index.
+        """
+        if not documents or not isinstance(documents, list):
+            raise ValueError("documents must be a non-empty list")
+        vocabulary = {}
+        term_ids, doc_ids, term_freqs = [], [], []
+        for doc_id, document in enumerate(documents):
+            term_counts = {}
+            for term in self._analyzer(document):
+                term_id = vocabulary.setdefault(term, len(vocabulary))
+                term_counts[term_id] = term_counts.get(term_id, 0) + 1
+            term_ids.extend(term_counts.keys())
+            doc_ids.extend([doc_id] * len(term_counts))
+            term_freqs.extend(term_counts.values())
+
+        counts = sparse.csc_matrix((term_freqs, (doc_ids, term_ids)), shape=(len(documents), len(vocabulary)),
+                                   dtype=np.float32)
+        return self._fit_counts(documents, vocabulary, counts)
+
+    def fit_store(self, store, documents):
+        """
+        Builds the posting lists from a token store instead of re-tokenizing the text.
+
+        Args:
+            store (TokenStore): The token store of the corpus.
+            documents (list of str): The documents the store was built from, returned by retrieve.
+
+        Returns:
+            BM25Index: The fitted index.
+        """
+        if not documents or not isinstance(documents, list):
+            raise ValueError("documents must be a non-empty list")
+        if len(documents) != len(store):
+            raise ValueError(f"the token store holds {len(store)} documents, not {len(documents)}")
+        vocabulary, counts = store_term_counts(store)
+        return self._fit_counts(documents, vocabulary, counts.astype(np.float32).tocsc())
+
+    def _fit_counts(self, documents, vocabulary, counts):
+        # the CSC layout of the (documents x terms) counts is the posting lists: document ids ascending in each column
+        counts.sort_indices()
+        doc_lengths = np.asarray(counts.sum(axis=1), dtype=np.float32).ravel()
+        doc_freqs = np.diff(counts.indptr)
+        self.posting_offsets = counts.indptr.astype(np.int64)
+        self.posting_docs = counts.indices.astype(np.int32)
+
+        avg_length = max(float(doc_lengths.mean()), 1.0)
+        tf = counts.data
+        length_norm = self.k1 * (1.0 - self.b + self.b * doc_lengths[self.posting_docs] / avg_length)
+        self.posting_weights = (tf * (self.k1 + 1.0) / (tf + length_norm)).astype(np.float32)
+
+        n_docs = len(documents)
+        self.idf = np.log1p((n_docs - doc_freqs + 0.5) / (doc_freqs + 0.5)).astype(np.float32)
+        self.vocabulary = vocabulary
+        self.documents = list(documents)
+        self.version = corpus_fingerprint(documents)
+        return self
+
+    def search(self, question, top_k=5):
+        """
+        Scores the documents that contain at least one question term and returns the best matches.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of documents to return.
+
+        Returns:
+            tuple: A tuple containing:
+              - np.ndarray: The indices of the top documents, best first.
+              - np.ndarray: Their BM25 scores.
+        """
+        # terms in id order and float64 weights, so scores are bit-identical to search_batch
+        query_terms = sorted(self._query_terms(question).items())
+        if query_terms:
+            docs = np.concatenate([
+                self.posting_docs[self.posting_offsets[t]:self.posting_offsets[t + 1]] for t, _ in query_terms
+            ])
+            weights = np.concatenate([
+                self.posting_weights[self.posting_offsets[t]:self.posting_offsets[t + 1]] * np.float64(self.idf[t] * qtf)
+                for t, qtf in query_terms
+            ])
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            candidate_scores = np.bincount(inverse, weights=weights, minlength=len(candidates))
+        else:
+            candidates = np.empty(0, dtype=np.int32)
+            candidate_scores = np.empty(0, dtype=np.float64)
+        # like the TF-IDF retriever, always return top_k documents when the corpus has them
+        return top_k_sparse(candidates, candidate_scores, len(self.documents), top_k)
+
+    def search_batch(self, questions, top_k=5):
+        """
+        Scores many questions at once with a single sparse matrix-matrix product.
+
+        The posting arrays already are the CSR layout of the (terms x documents) weight matrix, so they are used
+        directly as that matrix.
+
+        Args:
+            questions (list of str): The processed legal questions.
+            top_k (int): The number of documents to return per question.
+
+        Returns:
+            list of tuple: One (indices, scores) pair per question, as returned by search.
+        """
+        rows, cols, values = [], [], []
+        for row, question in enumerate(questions):
+            for term_id, qtf in self._query_terms(question).items():
+                rows.append(row)
+                cols.append(term_id)
+                values.append(self.idf[term_id] * qtf)
+        queries = sparse.csr_matrix((values, (rows, cols)), shape=(len(questions), len(self.vocabulary)),
+                                    dtype=np.float64)
+        queries.sort_indices()
+        postings = sparse.csr_matrix((self.posting_weights, self.posting_docs, self.posting_offsets),
+                                     shape=(len(self.vocabulary), len(self.documents)))
+        scores = (queries @ postings).tocsr()
+        scores.sort_indices()
+        results = []
+        for row in range(len(questions)):
+            start, end = scores.indptr[row], scores.indptr[row + 1]
+            results.append(top_k_sparse(scores.indices[start:end], scores.data[start:end], len(self.documents), top_k))
+        return results
+
+    def score_documents(self, question, doc_ids):
+        """
+        Scores only the given documents against a question, without ranking the rest of the corpus.
+
+        Args:
+            question (str): The processed legal question.
+            doc_ids (list of int): The ids of the documents to score.
+
+        Returns:
+            np.ndarray: The BM25 score of every document, in the order of doc_ids.
+        """
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = np.zeros(len(doc_ids), dtype=np.float64)
+        for t, qtf in sorted(self._query_terms(question).items()):
+            begin, end = self.posting_offsets[t], self.posting_offsets[t + 1]
+            # posting lists hold ascending document ids, so each document is found by binary search
+            positions = np.searchsorted(self.posting_docs[begin:end], doc_ids)
+            found = positions < end - begin
+            found[found] = self.posting_docs[begin + positions[found]] == doc_ids[found]
+            scores[found] += self.posting_weights[begin + positions[found]] * np.float64(self.idf[t] * qtf)
+        return scores
+
+    def _query_terms(self, question):
+        query_terms = {}
+        for term in self._analyzer(question):
+            term_id = self.vocabulary.get(term)
+            if term_id is not None:
+                query_terms[term_id] = query_terms.get(term_id, 0) + 1
+        return query_terms
+
+    def retrieve(self, question, top_k=5):
+        """
+        Retrieves the most relevant document segments for a question.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of segments to return.
+
+        Returns:
+            list of str: The top relevant document segments.
+        """
+        top_indices, _ = self.search(question, top_k)
+        return [self.documents[i] for i in top_indices]
+
+    def save(self, path):
+        """
+        Saves the posting arrays, idf weights, vocabulary and documents to an .npz file.
+
+        Args:
+            path (str): The file path to write.
+        """
+        terms = sorted(self.vocabulary, key=self.vocabulary.get)
+        term_data, term_offsets = pack_strings(terms)
+        doc_data, doc_offsets = pack_strings(self.documents)
+        np.savez(
+            npz_path(path),
+            params=np.array([self.k1, self.b], dtype=np.float64),
+            term_data=term_data,
+            term_offsets=term_offsets,
+            idf=self.idf,
+            posting_offsets=self.posting_offsets,
+            posting_docs=self.posting_docs,
+            posting_weights=self.posting_weights,
+            doc_data=doc_data,
+            doc_offsets=doc_offsets,
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index previously written by save.
+
+        Args:
+            path (str): The .npz file path.
+
+        Returns:
+            BM25Index: The loaded index.
+        """
+        with np.load(npz_path(path), allow_pickle=False) as arrays:
+            k1, b = arrays["params"]
+            index = cls(k1=float(k1), b=float(b))
+            terms = unpack_strings(arrays["term_data"], arrays["term_offsets"])
+            index.vocabulary = {term: i for i, term in enumerate(terms)}
+            index.idf = arrays["idf"]
+            index.posting_offsets = arrays["posting_offsets"]
+            index.posting_docs = arrays["posting_docs"]
+            index.posting_weights = arrays["posting_weights"]
+            index.documents = unpack_strings(arrays["doc_data"], arrays["doc_offsets"])
+        index.version = corpus_fingerprint(index.documents)
+        return index
+
+    @classmethod
+    def build(cls, documents, k1=1.5, b=0.75):
+        """
+        Convenience constructor that fits a new index on the documents.
+
+        Args:
+            documents (list of str): The corpus of legal documents.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalisation.
+
+        Returns:
+            BM25Index: The fitted index.
+        """
+        return cls(k1=k1, b=b).fit(documents)
+
+    @classmethod
+    def build_from_store(cls, store, documents, k1=1.5, b=0.75):
+        """
+        Convenience constructor that fits a new index on a token store.
+
+        Args:
+            store (TokenStore): The token store of the corpus.
+            documents (list of str): The documents the store was built from.
+            k1 (float): Term frequency saturation.
+            b (float): Document length normalisation.
+
+        Returns:
+            BM25Index: The fitted index.
+        """
+        return cls(k1=k1, b=b).fit_store(store, documents)
@@ -0,0 +1,288 @@
+import json
+import re
+from utils.helpers import find_citations
+
+# the keyword a citation of each kind starts with, in any of its abbreviations; it is dropped from the canonical
+# form so "Sec. 302", "Section 302" and "sec.302" meet
+CITATION_KEYWORDS = {
+    "section": re.compile(r"^sect?i?o?n?s?\.?"),
+    "article": re.compile(r"^arti?c?l?e?s?\.?"),
+    "rule": re.compile(r"^rules?\.?"),
+}
+# the kinds that name a statute, and the word the statute's name ends before: "Evidence Act, 1872" is keyed on
+# "evidence" so it does not meet "Contract Act, 1872"
+STATUTE_KEYWORDS = {
+    "act": re.compile(r"\bact\b"),
+    "ordinance": re.compile(r"\bord(?:inance)?\b\.?"),
+}
+# the kinds whose sub-clauses may be written apart from the number: "Art.184 (3)"
+SUBDIVIDED_KINDS = {"section", "article", "rule"}
+SUBDIVISION = re.compile(r"\s+((?:\([0-9a-zA-Z]{1,4}\))+)")
+# words that precede a statute's name rather than being part of it
+NAME_STOPWORDS = {"a", "an", "and", "any", "by", "for", "in", "of", "or", "said", "same", "such", "that", "the", "this",
+                  "to", "under", "with"}
+# the last word before the citation, closing a parenthesised name as in "(Enforcement of Hudood) Ordinance"
+NAME_WORD = re.compile(r"([A-Za-z][\w'-]*)\)?\s*$")
+# the number of characters before a citation searched for the statute name
+NAME_WINDOW = 64
+SPACE_AROUND_PUNCTUATION = re.compile(r"\s*([(),./-])\s*")
+# "Copyright Ordinance of 1962" is the same law as "Copyright Ordinance 1962"
+OF_YEAR = re.compile(r"\bo?f (\d{4})\b")
+WHITESPACE = re.compile(r"\s+")
+
+
+def statute_name(preceding):
+    """
+    Returns the name of a statute cited without it, i.e. the word just before "Act" or "Ordinance".
+
+    Args:
+        preceding (str): The text before the citation.
+
+    Returns:
+        str: The lower-cased name, or "" when the citation is not preceded by one.
+    """
+    match = NAME_WORD.search(preceding[-NAME_WINDOW:])
+    if match is None:
+        return ""
+    name = match.group(1).lower()
+    return "" if name in NAME_STOPWORDS else name
+
+
+def canonicalize_citation(citation, kind, preceding=""):
+    """
+    Reduces a citation to a canonical key, so that spelling variants of the same provision are found together:
+    "Article 184(3)", "Art. 184(3)" and "Art.184 (3)" all become "article 184(3)". Acts and ordinances keep the
+    statute's name, taken from the citation or from the word before it: "Evidence Act, 1872" becomes
+    "act evidence 1872".
+
+    Args:
+        citation (str): The citation text.
+        kind (str): The citation kind reported by find_citations.
+        preceding (str): The text before the citation, where the name of a statute cited as "Act, 1872" is found.
+
+    Returns:
+        str: The canonical key.
+    """
+    reference = WHITESPACE.sub(" ", citation.lower()).strip()
+    keyword = CITATION_KEYWORDS.get(kind)
+    if keyword is not None:
+        reference = keyword.sub("", reference)
+    statute = STATUTE_KEYWORDS.get(kind)
+    if statute is not None:
+        match = statute.search(reference)
+        if match is not None:
+            name, reference = reference[:match.start()].split(), reference[match.end():].strip(" ,.")
+            name = name[-1] if name else statute_name(preceding)
+            if name:
+                reference = f"{name} {reference}"
+    reference = OF_YEAR.sub(r"\1", reference)
+    reference = SPACE_AROUND_PUNCTUATION.sub(r"\1", reference).strip(" ,.")
+    return f"{kind} {reference}"
+
+
+def extract_citations(text):
+    """
+    Finds the citations of a text in canonical form.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        list of tuple: (canonical citation, character offset) of every citation, in order of position.
+    """
+    citations = []
+    for start, end, kind in find_citations(text):
+        citation = text[start:end]
+        if kind in SUBDIVIDED_KINDS:
+            subdivision = SUBDIVISION.match(text, end)
+            if subdivision is not None:
+                citation += subdivision.group(1)
+        citations.append((canonicalize_citation(citation, kind, text[max(0, start - NAME_WINDOW):start]), start))
+    return citations
+
+
+class CitationIndex:
+    """
+    An inverted index from canonical citations to the documents that contain them.
+
+    Lexical retrieval tokenizes a citation such as "Article 184(3)" or "PLD 2020 SC 1" into fragments that many
+    documents share. The index gives the documents that cite a question's provisions, which boost() moves to the front
+    of the lexical ranking; the ranking still orders them, so a generic key such as "section 302", which every
+    statute has, is broken by the words of the question. Document ids are positions in the corpus the retrieval
+    index was built from.
+    """
+
+    def __init__(self):
+        self.postings = {}
+        self.n_docs = 0
+        self.deleted = set()
+
+    def __len__(self):
+        return self.n_docs
+
+    @classmethod
+    def build(cls, documents):
+        """
+        Indexes the citations of a corpus.
+
+        Args:
+            documents (list of str): The corpus of legal documents.
+
+        Returns:
+            CitationIndex: The index; document i is documents[i].
+        """
+        index = cls()
+        index.add_documents(documents)
+        return index
+
+    def add_document(self, citations):
+        """
+        Appends a document given its already extracted citations, e.g. those stored by ingestion.
+
+        Args:
+            citations (list of tuple): (canonical citation, offset) pairs from extract_citations.
+
+        Returns:
+            int: The id of the document.
+        """
+        doc_id = self.n_docs
+        for citation, offset in citations:
+            self.postings.setdefault(citation, []).append((doc_id, offset))
+        self.n_docs += 1
+        return doc_id
+
+    def add_documents(self, documents):
+        """
+        Appends documents, extracting their citations.
+
+        Args:
+            documents (list of str): The documents to add.
+
+        Returns:
+            list of int: The ids assigned to the new documents.
+        """
+        return [self.add_document(extract_citations(document)) for document in documents]
+
+    def remove_documents(self, doc_ids):
+        """
+        Stops returning documents; their ids are not reused.
+
+        Args:
+            doc_ids (list of int): The ids of the documents to remove.
+        """
+        self.deleted.update(doc_ids)
+
+    def renumber(self, mapping):
+        """
+        Renumbers the documents after the retrieval index was compacted, dropping removed documents.
+
+        Args:
+            mapping (np.ndarray): The new id of every old document id, or -1 for removed documents, as returned by
+                LegalCorpusIndex.compact.
+        """
+        mapping = [int(doc_id) for doc_id in mapping]
+        postings = {}
+        for citation, occurrences in self.postings.items():
+            renumbered = [(mapping[doc_id], offset) for doc_id, offset in occurrences
+                          if doc_id < len(mapping) and mapping[doc_id] >= 0 and doc_id not in self.deleted]
+            if renumbered:
+                postings[citation] = renumbered
+        self.postings = postings
+        self.deleted = set()
+        self.n_docs = max(mapping, default=-1) + 1
+
+    def lookup(self, citation):
+        """
+        Returns where a canonical citation occurs.
+
+        Args:
+            citation (str): A canonical citation, as built by canonicalize_citation.
+
+        Returns:
+            list of tuple: (doc_id, offset) of every occurrence, in document order.
+        """
+        return [posting for posting in self.postings.get(citation, ()) if posting[0] not in self.deleted]
+
+    def cited_documents(self, question):
+        """
+        Finds the documents that contain the citations named in a question.
+
+        Args:
+            question (str): The question, as asked; citations are matched before any lower-casing.
+
+        Returns:
+            dict: The number of the question's distinct citations each citing document contains, by document id;
+            empty when the question cites nothing that is indexed.
+        """
+        counts = {}
+        for citation in {citation for citation, _ in extract_citations(question)}:
+            for doc_id in {doc_id for doc_id, _ in self.lookup(citation)}:
+                counts[doc_id] = counts.get(doc_id, 0) + 1
+        return counts
+
+    def search(self, question, top_k=5):
+        """
+        Finds the documents that cite the most of a question's provisions, without any lexical scoring.
+
+        Args:
+            question (str): The question, as asked.
+            top_k (int): The maximum number of documents to return.
+
+        Returns:
+            list of int: The ids of the citing documents, ties broken by document order; empty when the question
+            cites nothing that is indexed.
+        """
+        counts = self.cited_documents(question)
+        return sorted(counts, key=lambda doc_id: (-counts[doc_id], doc_id))[:top_k]
+
+    def boost(self, cited, scores, ranking, top_k=5):
+        """
+        Moves the documents citing a question's provisions to the front of a lexical ranking.
+
+        Args:
+            cited (dict): The cited_documents of the question.
+            scores (dict): The lexical score of every citing document, by document id, as given by an index's
+                score_documents.
+            ranking (list of int): Document ids, best first, as returned by an index's search.
+            top_k (int): The number of documents to return.
+
+        Returns:
+            list of int: The citing documents, those citing more of the question's provisions first and otherwise
+            by lexical score, followed by the rest of the ranking.
+        """
+        boosted = sorted(cited, key=lambda doc_id: (-cited[doc_id], -scores[doc_id], doc_id))
+        rest = (int(doc_id) for doc_id in ranking if int(doc_id) not in cited)
+        return (boosted + [doc_id for doc_id, _ in zip(rest, range(top_k))])[:top_k]
+
+    def save(self, path):
+        """
+        Saves the index to a JSON file.
+
+        Args:
+            path (str): The file path to write.
+        """
+        state = {"n_docs": self.n_docs, "deleted": sorted(self.deleted),
+                 "postings": {citation: [list(posting) for posting in postings]
+                              for citation, postings in self.postings.items()}}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(state, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index previously written by save.
+
+        Args:
+            path (str): The JSON file path.
+
+        Returns:
+            CitationIndex: The loaded index.
+        """
+        with open(path, "r", encoding="utf-8") as f:
+            state = json.load(f)
+        index = cls()
+        index.n_docs = state["n_docs"]
+        index.deleted = set(state["deleted"])
+        index.postings = {citation: [tuple(posting) for posting in postings]
+                          for citation, postings in state["postings"].items()}
+        return index
@@ -0,0 +1,606 @@
+import hashlib
+import threading
+from collections import namedtuple
+import numpy as np
+from scipy import sparse
+from .answer_cache import corpus_fingerprint
+
+
+def pack_strings(strings):
+    """
+    Packs a list of strings into a flat UTF-8 byte array and an offsets array so they can be stored in an .npz file.
+
+    Args:
+        strings (list of str): The strings to pack.
+
+    Returns:
+        tuple: A tuple containing:
+          - np.ndarray: The concatenated UTF-8 bytes (uint8).
+          - np.ndarray: The byte offsets (int64), of length len(strings) + 1.
+    """
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum([len(b) for b in encoded], dtype=np.int64)
+    data = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return data, offsets
+
+
+def npz_path(path):
+    """
+    Returns the file np.savez writes for a path: np.savez appends ".npz" to a path that lacks it, so save and load
+    both normalise the path with this function and agree on the file.
+
+    Args:
+        path (str): The path given to save or load.
+
+    Returns:
+        str: The path, ending in ".npz".
+    """
+    path = str(path)
+    return path if path.endswith(".npz") else path + ".npz"
+
+
+def build_analyzer():
+    """
+    Returns scikit-learn's default TF-IDF analyzer (lowercasing, token pattern), shared by the sparse retrievers so
+    they all see the same terms. sklearn is imported here rather than at module import because it is slow to load.
+
+    Returns:
+        callable: A function mapping a text to its list of terms.
+    """
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    return TfidfVectorizer().build_analyzer()
+
+
+def store_term_counts(store):
+    """
+    Counts the retrievers' terms in a token store without re-tokenizing the text: each distinct token of the store is
+    run through the analyzer once, and the store's document-token count matrix is mapped onto the terms. A citation
+    token such as "Article 184(3)" yields the same terms as the text it came from.
+
+    Args:
+        store (TokenStore): The token store of the corpus.
+
+    Returns:
+        tuple: A tuple containing:
+          - dict: The vocabulary, mapping each term to its column; terms are in sorted order, as TfidfVectorizer
+            numbers them.
+          - scipy.sparse.csr_matrix: A (documents, terms) matrix of float64 term counts.
+    """
+    analyzer = build_analyzer()
+    token_ids, term_ids, terms = [], [], {}
+    for token_id, token in enumerate(store.vocabulary):
+        for term in analyzer(token):
+            token_ids.append(token_id)
+            term_ids.append(terms.setdefault(term, len(terms)))
+    sorted_terms = sorted(terms)
+    column = np.empty(len(terms), dtype=np.int64)
+    column[[terms[term] for term in sorted_terms]] = np.arange(len(terms))
+    token_terms = sparse.csr_matrix((np.ones(len(token_ids)), (token_ids, column[term_ids])),
+                                    shape=(len(store.vocabulary), len(terms)))
+    counts = (store.count_matrix() @ token_terms).tocsr()
+    counts.sort_indices()
+    return {term: i for i, term in enumerate(sorted_terms)}, counts
+
+
+def unpack_strings(data, offsets):
+    """
+    Inverse of pack_strings.
+
+    Args:
+        data (np.ndarray): The concatenated UTF-8 bytes.
+        offsets (np.ndarray): The byte offsets.
+
+    Returns:
+        list of str: The unpacked strings.
+    """
+    raw = data.tobytes()
+    return [raw[offsets[i]:offsets[i + 1]].decode("utf-8") for i in range(len(offsets) - 1)]
+
+
+def top_k_indices(scores, k):
+    """
+    Returns the indices of the k highest scores, best first, without sorting the whole score vector.
+
+    Args:
+        scores (np.ndarray): A 1-D array of scores.
+        k (int): The number of indices to return.
+
+    Returns:
+        np.ndarray: The indices of the top k scores in descending score order.
+    """
+    k = min(k, scores.shape[0])
+    if k <= 0:
+        return np.empty(0, dtype=np.int64)
+    if k < scores.shape[0]:
+        candidates = np.argpartition(-scores, k - 1)[:k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    # order the k candidates by score, breaking ties on the lower index
+    order = np.lexsort((candidates, -scores[candidates]))
+    return candidates[order]
+
+
+def top_k_sparse(doc_ids, scores, n_docs, k, deleted=None):
+    """
+    Selects the top k documents from sparse scores, i.e. only the documents that matched at least one query term.
+
+    When fewer than k documents matched, the remaining slots are filled with unmatched documents (score 0) in index
+    order, so that a corpus with at least k documents always yields k results.
+
+    Args:
+        doc_ids (np.ndarray): The ids of the matched documents, ascending and without duplicates, so that equal
+            scores are ranked by document id.
+        scores (np.ndarray): The scores of the matched documents.
+        n_docs (int): The number of documents in the corpus.
+        k (int): The number of documents to return.
+        deleted (np.ndarray, optional): A boolean mask of removed documents, which are never returned.
+
+    Returns:
+        tuple: A tuple containing:
+          - np.ndarray: The indices of the top documents, best first.
+          - np.ndarray: Their scores.
+    """
+    doc_ids = np.asarray(doc_ids)
+    scores = np.asarray(scores, dtype=np.float64)
+    n_live = n_docs
+    if deleted is not None:
+        alive = ~deleted[doc_ids]
+        doc_ids, scores = doc_ids[alive], scores[alive]
+        n_live = n_docs - int(np.count_nonzero(deleted[:n_docs]))
+    best = top_k_indices(scores, k)
+    top_indices = doc_ids[best].astype(np.int64)
+    top_scores = scores[best]
+    missing = min(k, n_live) - len(top_indices)
+    if missing > 0:
+        unmatched = np.setdiff1d(np.arange(n_docs), doc_ids)
+        if deleted is not None:
+            unmatched = unmatched[~deleted[unmatched]]
+        unmatched = unmatched[:missing]
+        top_indices = np.concatenate([top_indices, unmatched])
+        top_scores = np.concatenate([top_scores, np.zeros(len(unmatched))])
+    return top_indices, top_scores
+
+
+# everything a query reads, published as one tuple so that a query never mixes two versions of the index:
+# (first doc id, CSC matrix) per segment, the first being the fitted base segment and the rest deltas, and the
+# tombstones, over-allocated so that appending documents is amortised O(1) per document
+IndexState = namedtuple("IndexState", ["documents", "vocabulary", "idf", "segments", "deleted"])
+
+
+class LegalCorpusIndex:
+    """
+    A TF-IDF index over a legal corpus that is fit once and reused across questions.
+
+    The document matrix is L2-normalised, so the cosine similarity used by retrieve_relevant_segments
+    reduces to a dot product that only touches the columns (postings) of the terms in the question.
+
+    The index can be updated without refitting. add_documents appends a small delta segment that uses the fitted
+    vocabulary and idf weights, and remove_documents records tombstones. Queries see both at once. Terms that are not
+    in the fitted vocabulary, and the idf drift caused by new documents, are only taken into account by compact(),
+    which refits the whole index. It can run in a background thread through start_compaction().
+    """
+
+    def __init__(self, max_deltas=8):
+        """
+        Args:
+            max_deltas (int): The maximum number of delta segments; beyond it the smallest are merged.
+        """
+        self._state = IndexState([], {}, np.empty(0, dtype=np.float64),
+                                 [(0, sparse.csc_matrix((0, 0), dtype=np.float64))], np.zeros(0, dtype=bool))
+        self.version = corpus_fingerprint([])
+        self.max_deltas = max_deltas
+        self._n_deleted = 0
+        self._lock = threading.Lock()
+        self._analyzer = build_analyzer()
+
+    def __len__(self):
+        return self._n_docs(self._state.segments) - self._n_deleted
+
+    @property
+    def documents(self):
+        return self._state.documents
+
+    @property
+    def vocabulary(self):
+        return self._state.vocabulary
+
+    @property
+    def idf(self):
+        return self._state.idf
+
+    @staticmethod
+    def _n_docs(segments):
+        start, matrix = segments[-1]
+        return start + matrix.shape[0]
+
+    @property
+    def _doc_matrix(self):
+        # the base segment, i.e. the documents seen by the last fit or compaction
+        return self._state.segments[0][1]
+
+    def fit(self, documents):
+        """
+        Fits the TF-IDF vocabulary, idf weights and document matrix on the corpus.
+
+        Args:
+            documents (list of str): The corpus of legal documents.
+
+        Returns:
+            LegalCorpusIndex: The fitted index.
+        """
+        if not documents or not isinstance(documents, list):
+            raise ValueError("documents must be a non-empty list")
+        from sklearn.feature_extraction.text import TfidfVectorizer
+
+        vectorizer = TfidfVectorizer()
+        doc_matrix = vectorizer.fit_transform(documents)
+        # column access is what queries need: one column per term is its posting list
+        self._state = IndexState(list(documents), {term: int(i) for term, i in vectorizer.vocabulary_.items()},
+                                 vectorizer.idf_.astype(np.float64), [(0, doc_matrix.tocsc())],
+                                 np.zeros(len(documents), dtype=bool))
+        self._n_deleted = 0
+        self.version = corpus_fingerprint(documents)
+        return self
+
+    def fit_store(self, store, documents):
+        """
+        Fits the index from a token store instead of re-tokenizing the text, with TfidfVectorizer's default weighting
+        (raw counts, smoothed idf, L2-normalised rows).
+
+        Args:
+            store (TokenStore): The token store of the corpus.
+            documents (list of str): The documents the store was built from, returned by retrieve.
+
+        Returns:
+            LegalCorpusIndex: The fitted index.
+        """
+        if not documents or not isinstance(documents, list):
+            raise ValueError("documents must be a non-empty list")
+        if len(documents) != len(store):
+            raise ValueError(f"the token store holds {len(store)} documents, not {len(documents)}")
+        vocabulary, counts = store_term_counts(store)
+        n_docs = counts.shape[0]
+        document_frequencies = np.bincount(counts.indices, minlength=len(vocabulary))
+        idf = np.log((1 + n_docs) / (1 + document_frequencies)) + 1
+        weights = counts @ sparse.diags(idf)
+        norms = np.sqrt(np.asarray(weights.multiply(weights).sum(axis=1)).ravel())
+        norms[norms == 0] = 1.0
+        doc_matrix = sparse.diags(1 / norms) @ weights
+        self._state = IndexState(list(documents), vocabulary, idf, [(0, doc_matrix.tocsc())],
+                                 np.zeros(len(documents), dtype=bool))
+        self._n_deleted = 0
+        self.version = corpus_fingerprint(documents)
+        return self
+
+    def transform(self, texts):
+        """
+        Transforms texts into L2-normalised TF-IDF vectors using the fitted vocabulary and idf weights.
+
+        Args:
+            texts (list of str): The texts (usually questions) to transform.
+
+        Returns:
+            scipy.sparse.csr_matrix: A (len(texts), vocabulary size) matrix.
+        """
+        return self._transform(self._state, texts)
+
+    def _transform(self, state, texts):
+        vocabulary, idf = state.vocabulary, state.idf
+        rows, cols, values = [], [], []
+        for row, text in enumerate(texts):
+            counts = {}
+            for term in self._analyzer(text):
+                col = vocabulary.get(term)
+                if col is not None:
+                    counts[col] = counts.get(col, 0) + 1
+            if not counts:
+                continue
+            term_cols = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+            weights = np.fromiter(counts.values(), dtype=np.float64, count=len(counts)) * idf[term_cols]
+            weights /= np.linalg.norm(weights)
+            rows.extend([row] * len(counts))
+            cols.extend(term_cols.tolist())
+            values.extend(weights.tolist())
+        matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(texts), len(vocabulary)))
+        # term id order inside each row keeps search and search_batch summing in the same order
+        matrix.sort_indices()
+        return matrix
+
+    def search(self, question, top_k=5):
+        """
+        Scores the corpus against a question and returns the best matching documents.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of documents to return.
+
+        Returns:
+            tuple: A tuple containing:
+              - np.ndarray: The indices of the top documents, best first.
+              - np.ndarray: Their cosine similarity scores.
+        """
+        return self._search(self._state, question, top_k)
+
+    def _search(self, state, question, top_k):
+        query = self._transform(state, [question])
+        docs, weights = [], []
+        for t, w in zip(query.indices, query.data):
+            # gather the posting list (CSC column) of every question term in every segment
+            for start, matrix in state.segments:
+                begin, end = matrix.indptr[t], matrix.indptr[t + 1]
+                docs.append(matrix.indices[begin:end] + start)
+                weights.append(matrix.data[begin:end] * w)
+        if docs:
+            candidates, inverse = np.unique(np.concatenate(docs), return_inverse=True)
+            candidate_scores = np.bincount(inverse, weights=np.concatenate(weights), minlength=len(candidates))
+        else:
+            candidates = np.empty(0, dtype=np.int64)
+            candidate_scores = np.empty(0, dtype=np.float64)
+        return top_k_sparse(candidates, candidate_scores, self._n_docs(state.segments), top_k, deleted=state.deleted)
+
+    def search_batch(self, questions, top_k=5):
+        """
+        Scores many questions at once with a single sparse matrix-matrix product per segment.
+
+        Args:
+            questions (list of str): The processed legal questions.
+            top_k (int): The number of documents to return per question.
+
+        Returns:
+            list of tuple: One (indices, scores) pair per question, as returned by search.
+        """
+        state = self._state
+        queries = self._transform(state, questions)
+        # (questions x terms) @ (terms x documents); the transpose of a CSC matrix is CSR without copying
+        similarities = sparse.hstack([queries @ matrix.T for _, matrix in state.segments], format="csr")
+        similarities.sort_indices()
+        n_docs = self._n_docs(state.segments)
+        results = []
+        for row in range(len(questions)):
+            start, end = similarities.indptr[row], similarities.indptr[row + 1]
+            results.append(top_k_sparse(similarities.indices[start:end], similarities.data[start:end],
+                                        n_docs, top_k, deleted=state.deleted))
+        return results
+
+    def score_documents(self, question, doc_ids):
+        """
+        Scores only the given documents against a question, without ranking the rest of the corpus.
+
+        Args:
+            question (str): The processed legal question.
+            doc_ids (list of int): The ids of the documents to score.
+
+        Returns:
+            np.ndarray: The cosine similarity score of every document, in the order of doc_ids.
+        """
+        state = self._state
+        query = self._transform(state, [question])
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = np.zeros(len(doc_ids), dtype=np.float64)
+        for start, matrix in state.segments:
+            inside = np.flatnonzero((doc_ids >= start) & (doc_ids < start + matrix.shape[0]))
+            if len(inside):
+                # the question's columns are cheap to take from a CSC matrix; the documents' rows are then few
+                rows = matrix[:, query.indices][doc_ids[inside] - start]
+                scores[inside] = rows @ query.data
+        return scores
+
+    def retrieve(self, question, top_k=5):
+        """
+        Retrieves the most relevant document segments for a question.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of segments to return.
+
+        Returns:
+            list of str: The top relevant document segments.
+        """
+        state = self._state
+        top_indices, _ = self._search(state, question, top_k)
+        return [state.documents[i] for i in top_indices]
+
+    def add_documents(self, documents):
+        """
+        Adds documents as a new delta segment, without refitting. Deltas are merged by size tiers, so over many
+        additions each document is copied O(log n) times.
+
+        Args:
+            documents (list of str): The documents to add.
+
+        Returns:
+            list of int: The ids assigned to the new documents.
+        """
+        if not documents:
+            return []
+        with self._lock:
+            # transformed under the lock, so a compaction cannot swap the vocabulary in between
+            state = self._state
+            delta = self._transform(state, documents).tocsc()
+            first_id = self._n_docs(state.segments)
+            deleted = state.deleted
+            if first_id + len(documents) > len(deleted):
+                deleted = np.zeros(max(2 * len(deleted), first_id + len(documents)), dtype=bool)
+                deleted[:first_id] = state.deleted[:first_id]
+            # appending to the shared list is safe: queries only index documents their segments contain
+            state.documents.extend(documents)
+            segments = [state.segments[0]] + self._merge_tiers(state.segments[1:] + [(first_id, delta)])
+            # publishing the new state makes the documents visible to queries
+            self._state = state._replace(segments=segments, deleted=deleted)
+            self.version = self._next_version("add", corpus_fingerprint(documents))
+        return list(range(first_id, first_id + len(documents)))
+
+    def remove_documents(self, doc_ids):
+        """
+        Removes documents by marking them with tombstones; their postings are dropped by the next compaction.
+
+        Args:
+            doc_ids (list of int): The ids of the documents to remove.
+        """
+        with self._lock:
+            state = self._state
+            n_docs = self._n_docs(state.segments)
+            for doc_id in doc_ids:
+                if not 0 <= doc_id < n_docs:
+                    raise IndexError(f"document id {doc_id} is out of range")
+                if not state.deleted[doc_id]:
+                    state.deleted[doc_id] = True
+                    self._n_deleted += 1
+            self.version = self._next_version("remove", ",".join(map(str, sorted(doc_ids))))
+
+    def _merge_tiers(self, deltas):
+        # merge the newest delta into the one before it while that one is less than twice its size, so sizes at
+        # least halve along the list and a document is only copied when its segment doubles
+        deltas = list(deltas)
+        while len(deltas) > 1 and (deltas[-2][1].shape[0] < 2 * deltas[-1][1].shape[0]
+                                   or len(deltas) > self.max_deltas):
+            deltas[-2:] = [self._merge(deltas[-2:])]
+        return deltas
+
+    @staticmethod
+    def _merge(deltas):
+        # deltas are contiguous in id order, so stacking their rows gives one segment starting at the first id
+        return deltas[0][0], sparse.vstack([matrix for _, matrix in deltas], format="csc")
+
+    def _next_version(self, operation, detail):
+        return hashlib.sha256("\0".join([self.version, operation, detail]).encode("utf-8")).hexdigest()
+
+    def compact(self):
+        """
+        Refits the index on the live documents, dropping tombstoned documents and folding the delta segments into the
+        vocabulary and idf weights. Documents added or removed while the refit runs are replayed afterwards.
+
+        Document ids are renumbered: live documents keep their relative order.
+
+        Returns:
+            np.ndarray: The new id of every old document id, or -1 for removed documents.
+        """
+        with self._lock:
+            state = self._state
+            n_snapshot = self._n_docs(state.segments)
+            live = np.flatnonzero(~state.deleted[:n_snapshot])
+            documents = [state.documents[i] for i in live]
+        if not documents:
+            raise ValueError("cannot compact an index without live documents")
+        fitted = LegalCorpusIndex(max_deltas=self.max_deltas).fit(documents)
+
+        with self._lock:
+            state = self._state
+            n_docs = self._n_docs(state.segments)
+            added = state.documents[n_snapshot:n_docs]
+            mapping = np.full(n_docs, -1, dtype=np.int64)
+            mapping[live] = np.arange(len(live))
+            mapping[n_snapshot:] = np.arange(len(live), len(live) + len(added))
+            if added:
+                fitted.add_documents(added)
+            # replay removals that happened during the refit
+            removed_since = [int(mapping[i]) for i in np.flatnonzero(state.deleted[:n_docs]) if mapping[i] >= 0]
+            if removed_since:
+                fitted.remove_documents(removed_since)
+            mapping[np.flatnonzero(state.deleted[:n_docs])] = -1
+
+            # one assignment swaps documents, vocabulary, idf, segments and tombstones together
+            self._state = fitted._state
+            self._n_deleted = fitted._n_deleted
+            self.version = self._next_version("compact", fitted.version)
+        return mapping
+
+    def start_compaction(self):
+        """
+        Runs compact() in a background thread. Queries and updates keep working while it runs.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        thread = threading.Thread(target=self.compact, name="legal-corpus-index-compaction", daemon=True)
+        thread.start()
+        return thread
+
+    def save(self, path):
+        """
+        Saves the index (vocabulary, idf weights, CSR document matrix, tombstones and documents) to an .npz file.
+
+        Delta segments are stored stacked with the base segment; they keep their fitted-vocabulary weights.
+
+        Args:
+            path (str): The file path to write.
+        """
+        state = self._state
+        segments, deleted = state.segments, state.deleted
+        n_docs = self._n_docs(segments)
+        terms = sorted(state.vocabulary, key=state.vocabulary.get)
+        term_data, term_offsets = pack_strings(terms)
+        doc_data, doc_offsets = pack_strings(state.documents[:n_docs])
+        doc_matrix = sparse.vstack([matrix for _, matrix in segments], format="csr")
+        np.savez(
+            npz_path(path),
+            term_data=term_data,
+            term_offsets=term_offsets,
+            idf=state.idf,
+            data=doc_matrix.data,
+            indices=doc_matrix.indices,
+            indptr=doc_matrix.indptr,
+            shape=np.array(doc_matrix.shape, dtype=np.int64),
+            doc_data=doc_data,
+            doc_offsets=doc_offsets,
+            deleted=deleted[:n_docs],
+            version=np.array([self.version]),
+        )
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads an index previously written by save.
+
+        Args:
+            path (str): The .npz file path.
+
+        Returns:
+            LegalCorpusIndex: The loaded index.
+        """
+        index = cls()
+        with np.load(npz_path(path), allow_pickle=False) as arrays:
+            terms = unpack_strings(arrays["term_data"], arrays["term_offsets"])
+            doc_matrix = sparse.csr_matrix(
+                (arrays["data"], arrays["indices"], arrays["indptr"]), shape=tuple(arrays["shape"])
+            )
+            documents = unpack_strings(arrays["doc_data"], arrays["doc_offsets"])
+            if "deleted" in arrays:
+                deleted = arrays["deleted"].copy()
+                index.version = str(arrays["version"][0])
+            else:
+                deleted = np.zeros(len(documents), dtype=bool)
+                index.version = corpus_fingerprint(documents)
+            index._state = IndexState(documents, {term: i for i, term in enumerate(terms)}, arrays["idf"],
+                                      [(0, doc_matrix.tocsc())], deleted)
+        index._n_deleted = int(np.count_nonzero(deleted))
+        return index
+
+    @classmethod
+    def build(cls, documents):
+        """
+        Convenience constructor that fits a new index on the documents.
+
+        Args:
+            documents (list of str): The corpus of legal documents.
+
+        Returns:
+            LegalCorpusIndex: The fitted index.
+        """
+        return cls().fit(documents)
+
+    @classmethod
+    def build_from_store(cls, store, documents):
+        """
+        Convenience constructor that fits a new index on a token store.
+
+        Args:
+            store (TokenStore): The token store of the corpus.
+            documents (list of str): The documents the store was built from.
+
+        Returns:
+            LegalCorpusIndex: The fitted index.
+        """
+        return cls().fit_store(store, documents)
@@ -0,0 +1,383 @@
+import numpy as np
+from .corpus_index import pack_strings, unpack_strings, top_k_indices
+
+
+def normalize_rows(matrix):
+    """
+    L2-normalises the rows of a matrix so that dot products are cosine similarities.
+
+    Args:
+        matrix (np.ndarray): A (n, dim) matrix.
+
+    Returns:
+        np.ndarray: The normalised float32 matrix.
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def spherical_kmeans(embeddings, n_clusters, iterations=10, sample_size=50_000, block_size=65_536, seed=0):
+    """
+    Clusters normalised embeddings by cosine similarity (k-means with unit-length centroids).
+
+    Centroids are trained on a random sample; every row is then assigned block by block, so the embeddings can be a
+    memory map larger than RAM.
+
+    Args:
+        embeddings (np.ndarray): The (n, dim) normalised embeddings, possibly memory-mapped.
+        n_clusters (int): The number of clusters.
+        iterations (int): The number of Lloyd iterations on the sample.
+        sample_size (int): The number of rows used to train the centroids.
+        block_size (int): The number of rows assigned per block.
+        seed (int): The random seed.
+
+    Returns:
+        tuple: A tuple containing:
+          - np.ndarray: The (n_clusters, dim) float32 centroids.
+          - np.ndarray: The cluster (int32) of every row.
+    """
+    n = embeddings.shape[0]
+    n_clusters = min(n_clusters, n)
+    rng = np.random.default_rng(seed)
+    sample_rows = np.sort(rng.choice(n, size=min(sample_size, n), replace=False))
+    sample = np.asarray(embeddings[sample_rows], dtype=np.float32)
+    centroids = sample[rng.choice(len(sample), size=n_clusters, replace=False)]
+    for _ in range(iterations):
+        labels = np.argmax(sample @ centroids.T, axis=1)
+        for cluster in range(n_clusters):
+            members = sample[labels == cluster]
+            if len(members):
+                centroids[cluster] = members.sum(axis=0)
+        centroids = normalize_rows(centroids)
+
+    assignments = np.empty(n, dtype=np.int32)
+    for start in range(0, n, block_size):
+        block = np.asarray(embeddings[start:start + block_size], dtype=np.float32)
+        assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return centroids, assignments
+
+
+class DenseIndex:
+    """
+    A dense retrieval index whose passage embeddings live in a memory-mapped float16 .npy file.
+
+    Searching multiplies the query embeddings with the store block by block, so only one block is converted to
+    float32 at a time and workers share the file's pages through the OS cache. With an IVF coarse quantiser, only the
+    rows of the clusters closest to the query are read.
+
+    The encoder is any callable mapping a list of texts to a (len(texts), dim) array, which makes it easy to swap in a
+    deterministic stand-in for tests.
+    """
+
+    def __init__(self, encoder, embeddings, documents, centroids=None, list_offsets=None, list_rows=None,
+                 block_size=65_536):
+        self.encoder = encoder
+        self.embeddings = embeddings
+        self.documents = documents
+        self.centroids = centroids
+        self.list_offsets = list_offsets
+        self.list_rows = list_rows
+        self.block_size = block_size
+
+    def __len__(self):
+        return len(self.documents)
+
+    @classmethod
+    def build(cls, documents, encoder, path, n_lists=None, batch_size=256, block_size=65_536):
+        """
+        Encodes the documents into a float16 .npy file and optionally trains an IVF coarse quantiser.
+
+        Args:
+            documents (list of str): The corpus of legal documents or passages.
+            encoder (callable): Maps a list of texts to a (len(texts), dim) array.
+            path (str): The .npy file for the embeddings; metadata is written to path + ".meta.npz".
+            n_lists (int, optional): The number of IVF clusters. Exhaustive search when None.
+            batch_size (int): The number of documents encoded per encoder call.
+            block_size (int): The number of rows scored per block at search time.
+
+        Returns:
+            DenseIndex: The index, reading the embeddings through a memory map.
+        """
+        if not documents or not isinstance(documents, list):
+            raise ValueError("documents must be a non-empty list")
+        first = normalize_rows(encoder(documents[:batch_size]))
+        embeddings = np.lib.format.open_memmap(path, mode="w+", dtype=np.float16,
+                                               shape=(len(documents), first.shape[1]))
+        embeddings[:len(first)] = first
+        for start in range(batch_size, len(documents), batch_size):
+            embeddings[start:start + batch_size] = normalize_rows(encoder(documents[start:start + batch_size]))
+        embeddings.flush()
+        del embeddings
+
+        embeddings = np.load(path, mmap_mode="r")
+        centroids = list_offsets = list_rows = None
+        if n_lists:
+            centroids, assignments = spherical_kmeans(embeddings, n_lists, block_size=block_size)
+            # group row ids by cluster, in ascending row order inside each list
+            list_rows = np.argsort(assignments, kind="stable").astype(np.int64)
+            list_offsets = np.zeros(len(centroids) + 1, dtype=np.int64)
+            np.cumsum(np.bincount(assignments, minlength=len(centroids)), out=list_offsets[1:])
+
+        index = cls(encoder, embeddings, list(documents), centroids, list_offsets, list_rows, block_size)
+        index._save_meta(path)
+        return index
+
+    @classmethod
+    def load(cls, path, encoder, block_size=65_536):
+        """
+        Opens an index previously written by build without reading the embeddings into memory.
+
+        Args:
+            path (str): The .npy file given to build.
+            encoder (callable): The encoder used to build the index.
+            block_size (int): The number of rows scored per block at search time.
+
+        Returns:
+            DenseIndex: The index.
+        """
+        embeddings = np.load(path, mmap_mode="r")
+        with np.load(path + ".meta.npz", allow_pickle=False) as arrays:
+            documents = unpack_strings(arrays["doc_data"], arrays["doc_offsets"])
+            centroids = list_offsets = list_rows = None
+            if "centroids" in arrays:
+                centroids = arrays["centroids"]
+                list_offsets = arrays["list_offsets"]
+                list_rows = arrays["list_rows"]
+        return cls(encoder, embeddings, documents, centroids, list_offsets, list_rows, block_size)
+
+    def _save_meta(self, path):
+        doc_data, doc_offsets = pack_strings(self.documents)
+        arrays = {"doc_data": doc_data, "doc_offsets": doc_offsets}
+        if self.centroids is not None:
+            arrays.update(centroids=self.centroids, list_offsets=self.list_offsets, list_rows=self.list_rows)
+        np.savez(path + ".meta.npz", **arrays)
+
+    def search_batch(self, questions, top_k=5, n_probe=8):
+        """
+        Scores many questions against the store with blocked matrix products.
+
+        Args:
+            questions (list of str): The processed legal questions.
+            top_k (int): The number of documents to return per question.
+            n_probe (int): The number of IVF clusters searched per question when the index has clusters.
+
+        Returns:
+            list of tuple: One (indices, scores) pair per question, best first.
+        """
+        queries = normalize_rows(self.encoder(list(questions)))
+        if self.centroids is None:
+            return self._scan(queries, None, top_k)
+        probes = np.argsort(-(queries @ self.centroids.T), axis=1)[:, :n_probe]
+        results = []
+        for query, clusters in zip(queries, probes):
+            rows = np.sort(np.concatenate([
+                self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in clusters
+            ]))
+            results.append(self._scan(query[None, :], rows, top_k)[0])
+        return results
+
+    def search(self, question, top_k=5, n_probe=8):
+        """
+        Scores the store against a question.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of documents to return.
+            n_probe (int): The number of IVF clusters searched when the index has clusters.
+
+        Returns:
+            tuple: A tuple containing:
+              - np.ndarray: The indices of the top documents, best first.
+              - np.ndarray: Their cosine similarity scores.
+        """
+        return self.search_batch([question], top_k=top_k, n_probe=n_probe)[0]
+
+    def retrieve(self, question, top_k=5):
+        """
+        Retrieves the most relevant document segments for a question.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of segments to return.
+
+        Returns:
+            list of str: The top relevant document segments.
+        """
+        top_indices, _ = self.search(question, top_k)
+        return [self.documents[i] for i in top_indices]
+
+    def score_documents(self, question, doc_ids):
+        """
+        Scores only the given documents against a question, reading just their rows of the store.
+
+        Args:
+            question (str): The processed legal question.
+            doc_ids (list of int): The ids of the documents to score.
+
+        Returns:
+            np.ndarray: The cosine similarity score of every document, in the order of doc_ids.
+        """
+        query = normalize_rows(self.encoder([question]))[0]
+        rows = np.asarray(self.embeddings[np.asarray(doc_ids, dtype=np.int64)], dtype=np.float32)
+        return rows @ query
+
+    def _scan(self, queries, rows, top_k):
+        # running top-k per query over blocks of the store (all rows, or only the given ones)
+        n_rows = len(self.documents) if rows is None else len(rows)
+        best_indices = [np.empty(0, dtype=np.int64) for _ in range(len(queries))]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in range(len(queries))]
+        for start in range(0, n_rows, self.block_size):
+            if rows is None:
+                block_rows = np.arange(start, min(start + self.block_size, n_rows))
+                block = np.asarray(self.embeddings[start:start + self.block_size], dtype=np.float32)
+            else:
+                block_rows = rows[start:start + self.block_size]
+                block = np.asarray(self.embeddings[block_rows], dtype=np.float32)
+            block_scores = queries @ block.T
+            for q in range(len(queries)):
+                candidate_indices = np.concatenate([best_indices[q], block_rows])
+                candidate_scores = np.concatenate([best_scores[q], block_scores[q]])
+                keep = top_k_indices(candidate_scores, top_k)
+                best_indices[q], best_scores[q] = candidate_indices[keep], candidate_scores[keep]
+        return list(zip(best_indices, best_scores))
+
+
+class HybridIndex:
+    """
+    Fuses a sparse retriever (LegalCorpusIndex or BM25Index) and a DenseIndex over the same documents with weighted
+    reciprocal rank fusion, so that lexical matches and paraphrases both surface.
+    """
+
+    def __init__(self, sparse_index, dense_index, dense_weight=0.5, candidates=50, rrf_k=60):
+        """
+        Args:
+            sparse_index (LegalCorpusIndex or BM25Index): The lexical retriever.
+            dense_index (DenseIndex): The dense retriever, built over the same documents in the same order.
+            dense_weight (float): The weight of the dense ranking, between 0 and 1.
+            candidates (int): The number of results taken from each retriever before fusion.
+            rrf_k (int): The reciprocal rank fusion constant.
+        """
+        if len(sparse_index.documents) != len(dense_index.documents):
+            raise ValueError("the sparse and dense indexes must cover the same documents")
+        self.sparse_index = sparse_index
+        self.dense_index = dense_index
+        self._sparse_version = getattr(sparse_index, "version", None)
+        self.dense_weight = dense_weight
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+
+    def __len__(self):
+        return len(self.sparse_index)
+
+    @property
+    def documents(self):
+        return self.sparse_index.documents
+
+    def _check_aligned(self):
+        # the sparse index may be updated in place (add_documents, remove_documents, compact), which the dense index
+        # cannot follow; fusing would then mix two versions of the corpus
+        if (len(self.sparse_index.documents) != len(self.dense_index.documents)
+                or getattr(self.sparse_index, "version", None) != self._sparse_version):
+            raise ValueError("the sparse index was updated after the hybrid index was built; build the dense index "
+                             "and the hybrid index again over its documents")
+
+    def _fuse(self, sparse_result, dense_result, top_k):
+        fused = {}
+        for weight, (indices, _) in ((1.0 - self.dense_weight, sparse_result), (self.dense_weight, dense_result)):
+            for rank, doc_id in enumerate(indices):
+                fused[int(doc_id)] = fused.get(int(doc_id), 0.0) + weight / (self.rrf_k + rank + 1)
+        doc_ids = np.array(sorted(fused), dtype=np.int64)
+        scores = np.array([fused[d] for d in doc_ids], dtype=np.float64)
+        keep = top_k_indices(scores, top_k)
+        return doc_ids[keep], scores[keep]
+
+    def search(self, question, top_k=5):
+        """
+        Scores a question with both retrievers and fuses their rankings.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of documents to return.
+
+        Returns:
+            tuple: A tuple containing:
+              - np.ndarray: The indices of the top documents, best first.
+              - np.ndarray: Their fused scores.
+        """
+        self._check_aligned()
+        n = max(top_k, self.candidates)
+        return self._fuse(self.sparse_index.search(question, n), self.dense_index.search(question, n), top_k)
+
+    def score_documents(self, question, doc_ids):
+        """
+        Scores only the given documents against a question by fusing their ranks among each other under both
+        retrievers. The fused scores order the given documents but are not comparable with those of search.
+
+        Args:
+            question (str): The processed legal question.
+            doc_ids (list of int): The ids of the documents to score.
+
+        Returns:
+            np.ndarray: The fused score of every document, in the order of doc_ids.
+        """
+        self._check_aligned()
+        doc_ids = np.asarray(doc_ids, dtype=np.int64)
+        scores = np.zeros(len(doc_ids), dtype=np.float64)
+        for weight, index in ((1.0 - self.dense_weight, self.sparse_index), (self.dense_weight, self.dense_index)):
+            order = np.lexsort((doc_ids, -index.score_documents(question, doc_ids)))
+            scores[order] += weight / (self.rrf_k + np.arange(len(order)) + 1)
+        return scores
+
+    def search_batch(self, questions, top_k=5):
+        """
+        Scores many questions with both retrievers' batch searches and fuses their rankings question by question.
+
+        Args:
+            questions (list of str): The processed legal questions.
+            top_k (int): The number of documents to return per question.
+
+        Returns:
+            list of tuple: One (indices, scores) pair per question, as returned by search.
+        """
+        self._check_aligned()
+        n = max(top_k, self.candidates)
+        return [self._fuse(sparse_result, dense_result, top_k) for sparse_result, dense_result in
+                zip(self.sparse_index.search_batch(questions, n), self.dense_index.search_batch(questions, n))]
+
+    def retrieve(self, question, top_k=5):
+        """
+        Retrieves the most relevant document segments for a question.
+
+        Args:
+            question (str): The processed legal question.
+            top_k (int): The number of segments to return.
+
+        Returns:
+            list of str: The top relevant document segments.
+        """
+        top_indices, _ = self.search(question, top_k)
+        return [self.documents[i] for i in top_indices]
+
+
+class TransformerEncoder:
+    """
+    Mean-pooled sentence embeddings from a Hugging Face encoder, usable as the DenseIndex encoder.
+    """
+
+    def __init__(self, model_name="sentence-transformers/all-MiniLM-L6-v2", max_length=256):
+        from transformers import AutoModel, AutoTokenizer
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.model = AutoModel.from_pretrained(model_name)
+        self.model.eval()
+        self.max_length = max_length
+
+    def __call__(self, texts):
+        import torch
+        inputs = self.tokenizer(list(texts), padding=True, truncation=True, max_length=self.max_length,
+                                return_tensors="pt")
+        with torch.no_grad():
+            hidden = self.model(**inputs).last_hidden_state
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        return ((hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)).numpy()
@@ -0,0 +1,310 @@
+import glob
+import json
+import os
+import tempfile
+from collections import namedtuple
+from text_processing import clean_legal_text, tokenize_legal_text
+from .citation_index import CitationIndex, extract_citations
+from .retrievers import RETRIEVERS
+from .token_store import TokenStore, TokenStoreWriter
+
+# one page of a source PDF; page_number is 0-based
+Page = namedtuple("Page", ["source", "page_number", "text"])
+
+
+def read_pdf_pages(path, start_page=0):
+    """
+    Yields the text of a PDF one page at a time. PyPDF2 parses a page only when it is accessed, so memory stays
+    bounded by the largest page rather than the size of the document.
+
+    Args:
+        path (str): The PDF file.
+        start_page (int): The first page to read.
+
+    Yields:
+        tuple: (page_number, text) for every page from start_page on.
+    """
+    from PyPDF2 import PdfReader
+
+    with open(path, "rb") as stream:
+        reader = PdfReader(stream)
+        for page_number in range(start_page, len(reader.pages)):
+            yield page_number, reader.pages[page_number].extract_text() or ""
+
+
+class IngestionCheckpoint:
+    """
+    The progress of an ingestion run, stored as JSON next to the corpus file.
+
+    It records the files that are fully ingested, the next page of the file in progress, and the size of the corpus
+    file at that point, so that records written after the last checkpoint can be discarded on resume.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.reset()
+        if path is not None and os.path.exists(path):
+            with open(path, "r") as f:
+                state = json.load(f)
+            self.completed = set(state["completed"])
+            self.current_file = state["current_file"]
+            self.next_page = state["next_page"]
+            self.corpus_bytes = state["corpus_bytes"]
+            self.pages_written = state["pages_written"]
+
+    def reset(self):
+        """
+        Forgets all progress, so every file is ingested again.
+        """
+        self.completed = set()
+        self.current_file = None
+        self.next_page = 0
+        self.corpus_bytes = 0
+        self.pages_written = 0
+
+    def start_page(self, source):
+        """
+        Returns the page ingestion resumes at for a source file, or None when the file is already done.
+        """
+        if source in self.completed:
+            return None
+        return self.next_page if source == self.current_file else 0
+
+    def save(self):
+        if self.path is None:
+            return
+        state = {
+            "completed": sorted(self.completed),
+            "current_file": self.current_file,
+            "next_page": self.next_page,
+            "corpus_bytes": self.corpus_bytes,
+            "pages_written": self.pages_written,
+        }
+        # write then rename, so an interruption never leaves a half-written checkpoint
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(state, f)
+        os.replace(self.path + ".tmp", self.path)
+
+
+def iter_pages(paths, checkpoint=None, page_reader=read_pdf_pages):
+    """
+    Streams the pages of many files in order, skipping what a checkpoint says is already ingested.
+
+    Args:
+        paths (list of str): The source files.
+        checkpoint (IngestionCheckpoint, optional): The progress of an earlier, interrupted run.
+        page_reader (callable): Yields (page_number, text) for a file and a start page. Defaults to read_pdf_pages.
+
+    Yields:
+        Page: One page at a time.
+    """
+    for path in paths:
+        source = os.path.basename(path)
+        start_page = checkpoint.start_page(source) if checkpoint is not None else 0
+        if start_page is None:
+            continue
+        for page_number, text in page_reader(path, start_page):
+            yield Page(source, page_number, text)
+        # marks the end of a file, so the writer can record it as completed even when its last pages were empty
+        yield Page(source, None, None)
+
+
+def clean_pages(pages):
+    """
+    Applies clean_legal_text to every page. End-of-file markers pass through unchanged.
+
+    Args:
+        pages (iterable of Page): The raw pages.
+
+    Yields:
+        Page: The cleaned pages.
+    """
+    for page in pages:
+        if page.text is None:
+            yield page
+            continue
+        yield page._replace(text=clean_legal_text(page.text))
+
+
+def tokenize_pages(pages):
+    """
+    Tokenizes every cleaned page with tokenize_legal_text.
+
+    Args:
+        pages (iterable of Page): The cleaned pages.
+
+    Yields:
+        tuple: (page, sentences), where sentences is the tokenize_legal_text output or None for end-of-file markers.
+    """
+    for page in pages:
+        yield page, (tokenize_legal_text(page.text) if page.text else None)
+
+
+class CorpusWriter:
+    """
+    Appends ingested pages to a JSON lines corpus file and checkpoints progress every checkpoint_every pages.
+
+    Each line holds the source file, page number, cleaned text, tokenized sentences and canonical citations (with
+    their offsets in the text) of one non-empty page.
+    """
+
+    def __init__(self, corpus_path, checkpoint, checkpoint_every=100):
+        self.corpus_path = corpus_path
+        self.checkpoint = checkpoint
+        self.checkpoint_every = checkpoint_every
+
+    def write(self, tokenized_pages):
+        """
+        Consumes the pipeline, writing pages as they arrive.
+
+        Args:
+            tokenized_pages (iterable of tuple): (page, sentences) pairs from tokenize_pages.
+
+        Returns:
+            int: The number of pages written by this call.
+        """
+        checkpoint = self.checkpoint
+        mode = "r+b" if os.path.exists(self.corpus_path) else "wb"
+        written = 0
+        with open(self.corpus_path, mode) as corpus:
+            # records written after the last checkpoint belong to pages that are read again
+            corpus.seek(checkpoint.corpus_bytes)
+            corpus.truncate()
+            since_checkpoint = 0
+            for page, sentences in tokenized_pages:
+                if page.page_number is None:
+                    checkpoint.completed.add(page.source)
+                    checkpoint.current_file, checkpoint.next_page = None, 0
+                    self._checkpoint(corpus)
+                    since_checkpoint = 0
+                    continue
+                if page.text:
+                    record = {"source": page.source, "page": page.page_number, "text": page.text,
+                              "sentences": sentences, "citations": extract_citations(page.text)}
+                    corpus.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+                    checkpoint.pages_written += 1
+                    written += 1
+                checkpoint.current_file, checkpoint.next_page = page.source, page.page_number + 1
+                since_checkpoint += 1
+                if since_checkpoint >= self.checkpoint_every:
+                    self._checkpoint(corpus)
+                    since_checkpoint = 0
+            self._checkpoint(corpus)
+        return written
+
+    def _checkpoint(self, corpus):
+        corpus.flush()
+        os.fsync(corpus.fileno())
+        self.checkpoint.corpus_bytes = corpus.tell()
+        self.checkpoint.save()
+
+
+def ingest_pdfs(pdf_dir, corpus_path, checkpoint_path=None, checkpoint_every=100, pattern="*.pdf",
+                page_reader=read_pdf_pages):
+    """
+    Streams every PDF in a directory through read page -> clean_legal_text -> tokenize_legal_text -> corpus writer.
+
+    Pages flow through the generator stages one at a time, so memory does not grow with the size of the PDFs. When
+    checkpoint_path is given, an interrupted run resumes where the last checkpoint left off; running again after a
+    complete run only ingests new files.
+
+    Args:
+        pdf_dir (str): The directory of gazette PDFs.
+        corpus_path (str): The JSON lines corpus file to write.
+        checkpoint_path (str, optional): The checkpoint file. Progress is not saved when None.
+        checkpoint_every (int): The number of pages between checkpoints.
+        pattern (str): The file name pattern of the source files.
+        page_reader (callable): Yields (page_number, text) for a file and a start page.
+
+    Returns:
+        int: The number of pages written by this run.
+    """
+    checkpoint = IngestionCheckpoint(checkpoint_path)
+    if checkpoint_path is None and os.path.exists(corpus_path):
+        # without a checkpoint there is nothing to resume, so the corpus is rewritten from scratch
+        os.remove(corpus_path)
+    corpus_bytes = os.path.getsize(corpus_path) if os.path.exists(corpus_path) else 0
+    if corpus_bytes < checkpoint.corpus_bytes:
+        # the corpus the checkpoint describes is missing or cut short, so resuming would pad it with NUL bytes
+        checkpoint.reset()
+    paths = sorted(glob.glob(os.path.join(pdf_dir, pattern)))
+    pages = tokenize_pages(clean_pages(iter_pages(paths, checkpoint, page_reader=page_reader)))
+    return CorpusWriter(corpus_path, checkpoint, checkpoint_every=checkpoint_every).write(pages)
+
+
+def iter_corpus(corpus_path):
+    """
+    Streams the records of a corpus file written by ingest_pdfs.
+
+    Args:
+        corpus_path (str): The JSON lines corpus file.
+
+    Yields:
+        dict: One record per page, with "source", "page", "text", "sentences" and "citations".
+    """
+    with open(corpus_path, "r", encoding="utf-8") as corpus:
+        for line in corpus:
+            yield json.loads(line)
+
+
+def build_index_from_corpus(corpus_path, retriever="tfidf", store_path=None):
+    """
+    Builds a retrieval index over the page texts of a corpus file.
+
+    The sentences ingestion tokenized for each page are streamed into a token store and the index is fitted on its
+    count matrix (build_from_store), so the corpus is neither tokenized again nor held as token lists all at once.
+    The index itself still keeps every page text in memory, since retrieval returns them.
+
+    Args:
+        corpus_path (str): The JSON lines corpus file.
+        retriever (str): The retrieval backend ("tfidf" or "bm25").
+        store_path (str, optional): The directory to write the token store to, to keep it for later runs. A
+            temporary directory is used when None.
+
+    Returns:
+        LegalCorpusIndex or BM25Index: The fitted index; document i is the i-th page of the corpus file.
+    """
+    if retriever not in RETRIEVERS:
+        raise ValueError(f"Unknown retriever '{retriever}', expected one of {sorted(RETRIEVERS)}")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = store_path if store_path is not None else tmp_dir
+        documents = []
+        with TokenStoreWriter(path) as writer:
+            for record in iter_corpus(corpus_path):
+                writer.add_document(record["sentences"])
+                documents.append(record["text"])
+        return RETRIEVERS[retriever].build_from_store(TokenStore(path), documents)
+
+def build_citation_index_from_corpus(corpus_path):
+    """
+    Builds a citation index from the citations ingestion stored with each page.
+
+    Args:
+        corpus_path (str): The JSON lines corpus file.
+
+    Returns:
+        CitationIndex: The index; document i is the i-th page of the corpus file, as in build_index_from_corpus.
+    """
+    index = CitationIndex()
+    for record in iter_corpus(corpus_path):
+        # corpora written before citations were stored are indexed from the page text
+        citations = record["citations"] if "citations" in record else extract_citations(record["text"])
+        index.add_document([tuple(citation) for citation in citations])
+    return index
+
+def build_token_store_from_corpus(corpus_path, store_path):
+    """
+    Writes the sentences ingestion tokenized for each page to a token store, so later runs read token ids from the
+    mapped store instead of tokenizing the corpus again.
+
+    Args:
+        corpus_path (str): The JSON lines corpus file.
+        store_path (str): The directory to write the store to.
+
+    Returns:
+        TokenStore: The opened store; document i is the i-th page of the corpus file, as in build_index_from_corpus.
+    """
+    with TokenStoreWriter(store_path) as writer:
+        for record in iter_corpus(corpus_path):
+            writer.add_document(record["sentences"])
+    return TokenStore(store_path)
@@ -1,24 +1,38 @@
-from transformers import pipeline
-from sklearn.metrics.pairwise import cosine_similarity
-from sklearn.feature_extraction.text import TfidfVectorizer
-from transformers import AutoModelForQuestionAnswering, AutoTokenizer
-import nltk
+import os
+import re
+import warnings
 import numpy as np
-import spacy
 from text_processing import clean_legal_text, tokenize_legal_text
+from utils.resources import get_spacy_model, pipeline
+from .retrievers import RETRIEVERS
+from .passages import PassageIndex
+from .answer_cache import corpus_fingerprint, model_fingerprint, settings_fingerprint
 
-nltk.download('punkt', quiet=True)
-nltk.download('averaged_perceptron_tagger', quiet=True)
-nltk.download('maxent_ne_chunker', quiet=True)
-nltk.download('words', quiet=True)
-nlp = spacy.load('en_core_web_sm')
+# question preprocessing reads coarse POS tags and entities, so the parser and lemmatizer are not loaded
+QUESTION_COMPONENTS = ('tok2vec', 'tagger', 'attribute_ruler', 'ner')
 
-def preprocess_question(question):
+def get_nlp():
+    """
+    Returns the spaCy pipeline used for question preprocessing, loading it on first use.
+
+    Returns:
+        spacy.language.Language: The shared en_core_web_sm pipeline, with only QUESTION_COMPONENTS.
+    """
+    return get_spacy_model('en_core_web_sm', components=QUESTION_COMPONENTS)
+
+def __getattr__(name):
+    # keeps `from ml_integration.legal_qa_system import nlp` working without loading the model at import time
+    if name == 'nlp':
+        return get_nlp()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def preprocess_question(question, nlp_model=None):
     """
     Preprocesses the input question by applying NER and POS tagging to extract key elements and emphasize entities.
 
     Args:
         question (str): The raw legal question.
+        nlp_model (spacy.language.Language, optional): The spaCy pipeline to use. Defaults to the module's model.
 
     Returns:
         tuple: A tuple containing:
@@ -32,7 +46,21 @@ def preprocess_question(question):
     # Consider using POS tagging to identify key elements
     processed_question = question.lower().strip()
     
-    doc = nlp(processed_question)
+    if nlp_model is None:
+        nlp_model = get_nlp()
+    doc = nlp_model(processed_question)
+    return refine_question_doc(doc)
+
+def refine_question_doc(doc):
+    """
+    Builds the preprocess_question result from an already parsed question.
+
+    Args:
+        doc (spacy.tokens.Doc): The parsed, lower-cased question.
+
+    Returns:
+        tuple: The refined question, the important tokens and the named entities, as in preprocess_question.
+    """
     # extract POS tags and NER information
     tokens = [(token.text, token.pos_) for token in doc]
     entities = [(ent.text, ent.label_) for ent in doc.ents]
@@ -44,19 +72,54 @@ def preprocess_question(question):
     # print("Refined Question with Entities Highlighted:", refined_question)
     return refined_question, refined_question_tokens, entities
 
-def retrieve_relevant_segments(question, documents):
+def preprocess_questions(questions, nlp_model=None, batch_size=64):
+    """
+    Preprocesses many questions at once, streaming them through spaCy's nlp.pipe.
+
+    Args:
+        questions (list of str): The raw legal questions.
+        nlp_model (spacy.language.Language, optional): The spaCy pipeline to use. Defaults to the module's model.
+        batch_size (int): The number of questions spaCy processes per batch.
+
+    Returns:
+        list: One preprocess_question result per question, or None for an empty or non-string question.
+    """
+    if nlp_model is None:
+        nlp_model = get_nlp()
+    valid = [i for i, question in enumerate(questions) if question and isinstance(question, str)]
+    results = [None] * len(questions)
+    docs = nlp_model.pipe((questions[i].lower().strip() for i in valid), batch_size=batch_size)
+    for i, doc in zip(valid, docs):
+        results[i] = refine_question_doc(doc)
+    return results
+
+def retrieve_relevant_segments(question, documents, index=None, retriever="tfidf"):
     """
     Retrieves the most relevant document segments that may contain the answer to the legal question.
 
     Args:
         question (str): The processed legal question.
         documents (list of str): The corpus of legal documents.
+        index (LegalCorpusIndex, BM25Index, DenseIndex or HybridIndex, optional): A prebuilt index over the corpus.
+            When given, only the question is transformed and the documents argument is ignored.
+        retriever (str): The retrieval backend to use when no index is given, one of RETRIEVERS ("tfidf" or "bm25").
 
     Returns:
         list of str: The top relevant document segments.
     """
+    if index is not None:
+        if not question or not isinstance(question, str):
+            return None
+        return index.retrieve(question, top_k=5)
     if not question or not isinstance(question, str) or not documents:
         return None
+    if retriever not in RETRIEVERS:
+        raise ValueError(f"Unknown retriever '{retriever}', expected one of {sorted(RETRIEVERS)}")
+    if retriever != "tfidf":
+        return RETRIEVERS[retriever].build(documents).retrieve(question, top_k=5)
+    from sklearn.metrics.pairwise import cosine_similarity
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
     # Implement document retrieval logic
     # Consider using TF-IDF or more advanced retrieval methods
     vectorizer = TfidfVectorizer()
@@ -72,7 +135,46 @@ def retrieve_relevant_segments(question, documents):
 
     return relevant_segments
 
-def generate_answer(question, context, model, tokenizer, entities):
+def retrieve_cited_segments(question, processed_question, citation_index, index, top_k=5):
+    """
+    Retrieves the most relevant document segments for a question that names provisions ("Article 184(3)",
+    "PLD 2020 SC 1"): the documents citing them come first, in the order lexical retrieval ranks them, followed by
+    the best of the other documents.
+
+    Args:
+        question (str): The question as asked, before preprocessing lower-cases it.
+        processed_question (str): The processed question, for lexical retrieval.
+        citation_index (CitationIndex): The citation index over the corpus.
+        index (LegalCorpusIndex, BM25Index, DenseIndex or HybridIndex): The retrieval index over the same corpus.
+        top_k (int): The number of segments to return.
+
+    Returns:
+        list of str: The top relevant document segments, or None when the question cites nothing indexed.
+    """
+    cited = citation_index.cited_documents(question)
+    if not cited:
+        return None
+    # only the citing documents are scored to order them; an ordinary search fills the remaining slots
+    scores = cited_scores(cited, processed_question, index)
+    top_indices, _ = index.search(processed_question, top_k=top_k)
+    return [index.documents[i] for i in citation_index.boost(cited, scores, top_indices, top_k=top_k)]
+
+def cited_scores(cited, processed_question, index):
+    """
+    Scores the documents citing a question's provisions, and only them, against the processed question.
+
+    Args:
+        cited (dict): The cited_documents of the question.
+        processed_question (str): The processed question.
+        index (LegalCorpusIndex, BM25Index, DenseIndex or HybridIndex): The retrieval index.
+
+    Returns:
+        dict: The lexical score of every citing document, by document id.
+    """
+    doc_ids = sorted(cited)
+    return dict(zip(doc_ids, index.score_documents(processed_question, doc_ids).tolist()))
+
+def generate_answer(question, context, model, tokenizer, entities, qa_pipeline=None, return_offsets=False):
     """
     Generates an answer to the legal question using a fine-tuned language model and the relevant context from legal documents.
 
@@ -82,19 +184,137 @@ def generate_answer(question, context, model, tokenizer, entities):
         model (PreTrainedModel): The fine-tuned language model for question answering.
         tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model.
         entities (list): A list of named entities extracted from the question, which can be used for refining the context or processing the answer.
+        qa_pipeline (QuestionAnsweringPipeline, optional): A prebuilt question-answering pipeline. When given it is
+            reused instead of building a new pipeline from model and tokenizer.
+        return_offsets (bool): Also return the character offsets of the answer within the context.
 
     Returns:
         tuple: A tuple containing:
           - str: The raw answer generated by the model.
           - float: The confidence score associated with the answer.
+          - int, int: The start and end offsets of the answer in the context (only with return_offsets).
     """
-    if not question or not isinstance(question, str) or not context or not tokenizer:
+    if not question or not isinstance(question, str) or not context:
         return None
-    qa_pipeline = pipeline("question-answering", model=model, tokenizer=tokenizer)
+    if qa_pipeline is None:
+        if not tokenizer:
+            return None
+        qa_pipeline = pipeline("question-answering", model=model, tokenizer=tokenizer)
     result = qa_pipeline(question=question, context=context)
 
+    if return_offsets:
+        return result['answer'], result['score'], result['start'], result['end']
     return result['answer'], result['score']
 
+def generate_answers(questions, contexts, model, tokenizer, qa_pipeline=None, batch_size=16):
+    """
+    Generates answers for many (question, context) pairs, feeding them to the QA model in padded batches.
+
+    Args:
+        questions (list of str): The preprocessed legal questions.
+        contexts (list of str): The context string for each question.
+        model (PreTrainedModel): The fine-tuned language model for question answering.
+        tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model.
+        qa_pipeline (QuestionAnsweringPipeline, optional): A prebuilt question-answering pipeline.
+        batch_size (int): The number of question/context windows per forward pass.
+
+    Returns:
+        list of tuple: One (answer, score) pair per question.
+    """
+    if not questions:
+        return []
+    if qa_pipeline is None:
+        qa_pipeline = pipeline("question-answering", model=model, tokenizer=tokenizer)
+    results = qa_pipeline(question=list(questions), context=list(contexts), batch_size=batch_size)
+    # the pipeline unwraps single-element inputs
+    if isinstance(results, dict):
+        results = [results]
+    return [(result['answer'], result['score']) for result in results]
+
+# segments sent to the model at each cascade stage; None means every retrieved segment
+DEFAULT_CASCADE_STAGES = (1, 3, None)
+
+def generate_answers_cascade(questions, segment_lists, model, tokenizer, threshold=0.5,
+                             stages=DEFAULT_CASCADE_STAGES, qa_pipeline=None, batch_size=16, stage_counter=None):
+    """
+    Generates answers with a confidence cascade: every question is first answered from its top-ranked segment only,
+    and only the questions whose score stays below threshold are retried with more segments at the next stage.
+
+    Each stage is one batched pass over the questions still in the cascade. When no stage reaches the threshold the
+    highest scoring answer over all stages is returned.
+
+    Args:
+        questions (list of str): The preprocessed legal questions.
+        segment_lists (list of list of str): The retrieved segments of each question, best first.
+        model (PreTrainedModel): The fine-tuned language model for question answering.
+        tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model.
+        threshold (float): The score at which a question exits the cascade.
+        stages (tuple): The number of top segments used at each stage, in increasing order; None means all of them.
+        qa_pipeline (QuestionAnsweringPipeline, optional): A prebuilt question-answering pipeline.
+        batch_size (int): The number of question/context windows per forward pass.
+        stage_counter (collections.Counter, optional): Incremented with the stage at which each question exited.
+
+    Returns:
+        list of tuple: One (answer, score, exit stage) triple per question, or None for a question without segments.
+    """
+    if not questions:
+        return []
+    if qa_pipeline is None:
+        qa_pipeline = pipeline("question-answering", model=model, tokenizer=tokenizer)
+    best = [None] * len(questions)
+    exits = [None] * len(questions)
+    sent = [0] * len(questions)
+    pending = [i for i, segments in enumerate(segment_lists) if segments]
+    for stage in stages:
+        batch = []
+        for i in pending:
+            count = len(segment_lists[i]) if stage is None else min(stage, len(segment_lists[i]))
+            # a question whose segments were all sent already would only get the same answer again
+            if count > sent[i]:
+                sent[i] = count
+                batch.append(i)
+        if not batch:
+            break
+        contexts = [" ".join(segment_lists[i][:sent[i]]) for i in batch]
+        answers = generate_answers([questions[i] for i in batch], contexts, model, tokenizer,
+                                   qa_pipeline=qa_pipeline, batch_size=batch_size)
+        for i, (answer, score) in zip(batch, answers):
+            exits[i] = stage
+            if best[i] is None or score > best[i][1]:
+                best[i] = (answer, score)
+        pending = [i for i in batch if best[i][1] < threshold]
+
+    if stage_counter is not None:
+        stage_counter.update(exits[i] for i in range(len(questions)) if best[i] is not None)
+    return [None if best[i] is None else (best[i][0], best[i][1], exits[i]) for i in range(len(questions))]
+
+def generate_answer_cascade(question, segments, model, tokenizer, entities, threshold=0.5,
+                            stages=DEFAULT_CASCADE_STAGES, qa_pipeline=None, stage_counter=None):
+    """
+    Generates an answer for one question with the confidence cascade of generate_answers_cascade, instead of running
+    the model once over the concatenation of all retrieved segments as generate_answer does.
+
+    Args:
+        question (str): The preprocessed legal question.
+        segments (list of str): The retrieved segments, best first.
+        model (PreTrainedModel): The fine-tuned language model for question answering.
+        tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model.
+        entities (list): A list of named entities extracted from the question.
+        threshold (float): The score at which the question exits the cascade.
+        stages (tuple): The number of top segments used at each stage; None means all of them.
+        qa_pipeline (QuestionAnsweringPipeline, optional): A prebuilt question-answering pipeline.
+        stage_counter (collections.Counter, optional): Incremented with the stage at which the question exited.
+
+    Returns:
+        tuple: The raw answer, its confidence score and the exit stage, or None without a question or segments.
+    """
+    if not question or not isinstance(question, str) or not segments:
+        return None
+    if qa_pipeline is None and not tokenizer:
+        return None
+    return generate_answers_cascade([question], [segments], model, tokenizer, threshold=threshold, stages=stages,
+                                    qa_pipeline=qa_pipeline, stage_counter=stage_counter)[0]
+
 def postprocess_answer(answer, relevant_segments, question, confidence_score):
     """
     Post-process the answer by adding citations and confidence scores.
@@ -126,7 +346,79 @@ def postprocess_answer(answer, relevant_segments, question, confidence_score):
 
     return processed_answer
 
-def legal_qa_system(question, documents, model, tokenizer):
+def answer_from_passages(question, passage_index, model, tokenizer, nlp_model=None, qa_pipeline=None,
+                         max_context_tokens=384, top_k=5, preprocessed=None):
+    """
+    Answers a legal question from the top passages of a PassageIndex, sending the model only as many passages as fit
+    in the token budget, and maps the answer back to its position in the source corpus.
+
+    Args:
+        question (str): The legal question to be answered.
+        passage_index (PassageIndex): The passage-level index over the corpus.
+        model (PreTrainedModel): The fine-tuned language model for question answering.
+        tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model, also used to count tokens.
+        nlp_model (spacy.language.Language, optional): The spaCy pipeline to use. Defaults to the module's model.
+        qa_pipeline (QuestionAnsweringPipeline, optional): A prebuilt question-answering pipeline.
+        max_context_tokens (int): The token budget of the context passed to the model.
+        top_k (int): The number of passages retrieved before applying the budget.
+        preprocessed (tuple, optional): The preprocess_question result for the question, when the caller already
+            has it.
+
+    Returns:
+        dict: The final answer under "answer", plus "raw_answer", "score" and "source", the (doc_id, start, end)
+        offsets of the answer in the source documents (None if it could not be located). None for an empty question.
+    """
+    if not question or not isinstance(question, str):
+        return None
+    if preprocessed is None:
+        preprocessed = preprocess_question(question, nlp_model=nlp_model)
+    processed_question, tokens, entities = preprocessed
+    passage_ids, _ = passage_index.search(processed_question, top_k=top_k)
+    context, spans = passage_index.build_context(passage_ids, max_tokens=max_context_tokens, tokenizer=tokenizer)
+    raw_answer, confidence_score, start, end = generate_answer(processed_question, context, model, tokenizer, entities,
+                                                               qa_pipeline=qa_pipeline, return_offsets=True)
+    relevant_segments = [context[span.context_start:span.context_end] for span in spans]
+    return {
+        "answer": postprocess_answer(raw_answer, relevant_segments, processed_question, confidence_score),
+        "raw_answer": raw_answer,
+        "score": confidence_score,
+        "source": passage_index.locate(spans, start, end),
+    }
+
+def bind_answer_cache(cache, documents, index, model, tokenizer, retriever="tfidf", top_k=5, max_context_tokens=384,
+                      cascade_threshold=None, citation_index=None):
+    """
+    Binds an answer cache to the corpus, model and settings it answers with, so that it never serves answers
+    computed over another corpus, by another model or with other retrieval and cascade settings.
+
+    Args:
+        cache (AnswerCache): The answer cache.
+        documents (list of str): The corpus of legal documents, used when no index is given.
+        index (LegalCorpusIndex, BM25Index, PassageIndex, DenseIndex or HybridIndex, optional): The retrieval index.
+        model (PreTrainedModel): The question answering model.
+        tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model.
+        retriever (str): The retrieval backend used when no index is given.
+        top_k (int): The number of segments (or passages) retrieved per question.
+        max_context_tokens (int): The context token budget of a PassageIndex.
+        cascade_threshold (float, optional): The confidence cascade threshold, or None.
+        citation_index (CitationIndex, optional): The citation index used to boost cited documents.
+    """
+    # incremental indexes keep a running version, which avoids rehashing the whole corpus on every update
+    corpus_version = getattr(index, "version", None) or corpus_fingerprint(
+        documents if index is None else index.documents)
+    if index is None:
+        backend = getattr(RETRIEVERS.get(retriever), "__name__", retriever)
+    elif isinstance(index, PassageIndex):
+        backend = f"PassageIndex({type(index.index).__name__})"
+    else:
+        backend = type(index).__name__
+    settings_version = settings_fingerprint(retriever=backend, top_k=top_k, max_context_tokens=max_context_tokens,
+                                            cascade_threshold=cascade_threshold,
+                                            citations=citation_index is not None)
+    cache.bind(corpus_version, model_fingerprint(model, tokenizer), settings_version)
+
+def legal_qa_system(question, documents, model, tokenizer, index=None, retriever="tfidf", max_context_tokens=384,
+                    cache=None, cascade_threshold=None, citation_index=None):
     """
     The main pipeline that handles the complete legal question answering process:
     preprocessing the question, retrieving relevant document segments, generating an answer,
@@ -137,21 +429,155 @@ def legal_qa_system(question, documents, model, tokenizer):
         documents (list of str): The corpus of legal documents to search through.
         model (PreTrainedModel): The fine-tuned language model for question answering.
         tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model.
+        index (LegalCorpusIndex, BM25Index or PassageIndex, optional): A prebuilt index over the corpus. When given,
+            documents may be None and retrieval only computes the question vector. With a PassageIndex only the top
+            passages that fit in max_context_tokens are passed to the model.
+        retriever (str): The retrieval backend to use when no index is given ("tfidf" or "bm25").
+        max_context_tokens (int): The context token budget when index is a PassageIndex.
+        cache (AnswerCache, optional): A cache of final answers keyed on the preprocessed question. It is bound to
+            this corpus and model before it is read.
+        cascade_threshold (float, optional): Answer from the top segment first and only add segments while the
+            score stays below this threshold (see generate_answers_cascade). All segments are used at once when None.
+        citation_index (CitationIndex, optional): A citation index over the same corpus. For questions that cite an
+            indexed provision, the documents citing it are moved to the front of the retrieved segments. Not used
+            with a PassageIndex.
 
     Returns:
         str: The final answer to the legal question.
     """
-    if not question or not isinstance(question, str) or not documents or not isinstance(documents, list):
+    if not question or not isinstance(question, str):
+        return None
+    if index is None and (not documents or not isinstance(documents, list)):
         return None
     
     processed_question, tokens, entities = preprocess_question(question)
-    relevant_segments = retrieve_relevant_segments(processed_question, documents)
-    context = " ".join(relevant_segments)
-    raw_answer, confidence_score = generate_answer(processed_question, context, model, tokenizer, entities)
+    if cache is not None:
+        bind_answer_cache(cache, documents, index, model, tokenizer, retriever=retriever,
+                          max_context_tokens=max_context_tokens, cascade_threshold=cascade_threshold,
+                          citation_index=citation_index)
+        cached_answer = cache.get(processed_question)
+        if cached_answer is not None:
+            return cached_answer
+    if isinstance(index, PassageIndex):
+        final_answer = answer_from_passages(question, index, model, tokenizer, max_context_tokens=max_context_tokens,
+                                            preprocessed=(processed_question, tokens, entities))["answer"]
+        if cache is not None:
+            cache.put(processed_question, final_answer)
+        return final_answer
+
+    relevant_segments = None
+    if citation_index is not None:
+        if index is None:
+            if retriever not in RETRIEVERS:
+                raise ValueError(f"Unknown retriever '{retriever}', expected one of {sorted(RETRIEVERS)}")
+            index = RETRIEVERS[retriever].build(documents)
+        relevant_segments = retrieve_cited_segments(question, processed_question, citation_index, index)
+    if relevant_segments is None:
+        relevant_segments = retrieve_relevant_segments(processed_question, documents, index=index,
+                                                       retriever=retriever)
+    if cascade_threshold is not None:
+        raw_answer, confidence_score, _ = generate_answer_cascade(processed_question, relevant_segments, model,
+                                                                  tokenizer, entities, threshold=cascade_threshold)
+    else:
+        context = " ".join(relevant_segments)
+        raw_answer, confidence_score = generate_answer(processed_question, context, model, tokenizer, entities)
     final_answer = postprocess_answer(raw_answer, relevant_segments, processed_question, confidence_score)
+    if cache is not None:
+        cache.put(processed_question, final_answer)
     
     return final_answer
 
+def legal_qa_system_batch(questions, documents, model, tokenizer, index=None, retriever="tfidf",
+                          nlp_model=None, qa_pipeline=None, batch_size=16, max_context_tokens=384,
+                          cascade_threshold=None, stage_counter=None, citation_index=None, cache=None, top_k=5):
+    """
+    Answers many legal questions at once. Each stage runs over the whole batch: questions are parsed with nlp.pipe,
+    all questions are scored against the corpus with one sparse matrix-matrix product, and the (question, context)
+    pairs go through the QA model in padded batches.
+
+    Args:
+        questions (list of str): The legal questions to be answered.
+        documents (list of str): The corpus of legal documents to search through.
+        model (PreTrainedModel): The fine-tuned language model for question answering.
+        tokenizer (PreTrainedTokenizer): The tokenizer corresponding to the model.
+        index (LegalCorpusIndex, BM25Index or PassageIndex, optional): A prebuilt index over the corpus. When omitted
+            an index is built once for the whole batch.
+        retriever (str): The retrieval backend to use when no index is given ("tfidf" or "bm25").
+        nlp_model (spacy.language.Language, optional): The spaCy pipeline to use. Defaults to the module's model.
+        qa_pipeline (QuestionAnsweringPipeline, optional): A prebuilt question-answering pipeline.
+        batch_size (int): The number of question/context windows per QA forward pass.
+        max_context_tokens (int): The context token budget when index is a PassageIndex.
+        cascade_threshold (float, optional): Answer each question through the confidence cascade of
+            generate_answers_cascade instead of from all of its segments at once. Not used with a PassageIndex,
+            whose context is already packed under a token budget.
+        stage_counter (collections.Counter, optional): Counts the cascade stage at which each question exited.
+        citation_index (CitationIndex, optional): A citation index over the same corpus. For questions that cite an
+            indexed provision, the documents citing it are moved to the front of the retrieved segments. Not used
+            with a PassageIndex.
+        cache (AnswerCache, optional): A cache of final answers keyed on the preprocessed question. It is bound to
+            this corpus and model before it is read; cached questions skip retrieval and the model, and new answers
+            are added to it.
+        top_k (int): The number of segments (or passages) retrieved per question.
+
+    Returns:
+        list of str: One final answer per question, or None for an empty or non-string question.
+    """
+    if not questions or not isinstance(questions, list):
+        return None
+    if index is None:
+        if not documents or not isinstance(documents, list):
+            return None
+        if retriever not in RETRIEVERS:
+            raise ValueError(f"Unknown retriever '{retriever}', expected one of {sorted(RETRIEVERS)}")
+        index = RETRIEVERS[retriever].build(documents)
+
+    preprocessed = preprocess_questions(questions, nlp_model=nlp_model)
+    final_answers = [None] * len(questions)
+    valid = [i for i, result in enumerate(preprocessed) if result is not None]
+    if cache is not None:
+        bind_answer_cache(cache, documents, index, model, tokenizer, top_k=top_k,
+                          max_context_tokens=max_context_tokens, cascade_threshold=cascade_threshold,
+                          citation_index=citation_index)
+        for i in valid:
+            final_answers[i] = cache.get(preprocessed[i][0])
+        valid = [i for i in valid if final_answers[i] is None]
+        if not valid:
+            return final_answers
+    processed_questions = [preprocessed[i][0] for i in valid]
+
+    cited = [{}] * len(valid)
+    if citation_index is not None and not isinstance(index, PassageIndex):
+        cited = [citation_index.cited_documents(questions[i]) for i in valid]
+    ranked = [top_indices for top_indices, _ in index.search_batch(processed_questions, top_k=top_k)]
+    for k in range(len(valid)):
+        if cited[k]:
+            # only the citing documents are scored to order them; the ordinary ranking fills the remaining slots
+            ranked[k] = citation_index.boost(cited[k], cited_scores(cited[k], processed_questions[k], index),
+                                             ranked[k], top_k=top_k)
+    if isinstance(index, PassageIndex):
+        contexts, segments = [], []
+        for top_indices in ranked:
+            context, spans = index.build_context(top_indices, max_tokens=max_context_tokens, tokenizer=tokenizer)
+            contexts.append(context)
+            segments.append([context[span.context_start:span.context_end] for span in spans])
+    else:
+        segments = [[index.documents[d] for d in top_indices] for top_indices in ranked]
+        contexts = [" ".join(relevant_segments) for relevant_segments in segments]
+    if cascade_threshold is not None and not isinstance(index, PassageIndex):
+        answers = [result[:2] for result in generate_answers_cascade(
+            processed_questions, segments, model, tokenizer, threshold=cascade_threshold, qa_pipeline=qa_pipeline,
+            batch_size=batch_size, stage_counter=stage_counter)]
+    else:
+        answers = generate_answers(processed_questions, contexts, model, tokenizer,
+                                   qa_pipeline=qa_pipeline, batch_size=batch_size)
+
+    for i, processed_question, relevant_segments, (raw_answer, confidence_score) in zip(
+            valid, processed_questions, segments, answers):
+        final_answers[i] = postprocess_answer(raw_answer, relevant_segments, processed_question, confidence_score)
+        if cache is not None:
+            cache.put(processed_question, final_answers[i])
+    return final_answers
+
 def load_legal_documents():
     """
     Loads the corpus of legal documents that will be used for retrieving relevant information.
@@ -182,10 +608,87 @@ def load_sample_documents():
         "Copyright law in Pakistan is governed by the Copyright Ordinance of 1962.",
         "In Pakistan, copyright infringement is considered a serious offense."
     ]
-def load_finetuned_model():
-    model_name = "deepset/roberta-base-squad2"
-    fine_tuned_model = AutoModelForQuestionAnswering.from_pretrained(model_name)
+def quantize_model(model):
+    """
+    Applies PyTorch dynamic int8 quantization to the Linear layers of a model for faster CPU inference.
+
+    Weights are stored as int8 and activations are quantized on the fly, so no calibration data is needed.
+
+    Args:
+        model (PreTrainedModel): The fp32 question answering model.
+
+    Returns:
+        PreTrainedModel: The quantized model, in eval mode.
+    """
+    import torch
+
+    return torch.ao.quantization.quantize_dynamic(model.eval(), {torch.nn.Linear}, dtype=torch.qint8)
+
+def optimized_model_path(model_name, cache_dir):
+    """
+    Returns the file an optimized model is cached in. The torch and transformers versions are part of the name
+    because the layout of a quantized model's state dict is only guaranteed for the versions that wrote it.
+
+    Args:
+        model_name (str): The Hugging Face model name or path.
+        cache_dir (str): The directory of optimized models.
+
+    Returns:
+        str: The cache file path.
+    """
+    import torch
+    import transformers
+
+    safe_name = re.sub(r"[^A-Za-z0-9_.-]", "_", model_name)
+    return os.path.join(cache_dir, f"{safe_name}-int8-torch{torch.__version__}-tf{transformers.__version__}.pt")
+
+def load_finetuned_model(model_name="deepset/roberta-base-squad2", optimize=False, num_threads=None,
+                         cache_dir=None):
+    """
+    Loads the question answering model and its tokenizer.
+
+    Args:
+        model_name (str): The Hugging Face model name or path.
+        optimize (bool): Quantize the Linear layers to int8 for CPU inference (see quantize_model).
+        num_threads (int, optional): The number of intra-op threads torch uses. Left unchanged when None.
+        cache_dir (str, optional): Where the optimized model is cached, so later startups skip the conversion.
+            Only used with optimize=True.
+
+    Returns:
+        tuple: A tuple containing:
+          - PreTrainedModel: The question answering model.
+          - PreTrainedTokenizer: The tokenizer corresponding to the model.
+    """
+    from transformers import AutoConfig, AutoModelForQuestionAnswering, AutoTokenizer
+
+    if num_threads is not None:
+        import torch
+
+        torch.set_num_threads(num_threads)
     tokenizer = AutoTokenizer.from_pretrained(model_name)
+    if not optimize:
+        fine_tuned_model = AutoModelForQuestionAnswering.from_pretrained(model_name)
+        return fine_tuned_model, tokenizer
+
+    import torch
+
+    cache_path = optimized_model_path(model_name, cache_dir) if cache_dir is not None else None
+    if cache_path is not None and os.path.exists(cache_path):
+        # only weights are cached: the quantized layers are rebuilt from the config, and weights_only keeps
+        # torch.load from running code found in the cache directory
+        fine_tuned_model = quantize_model(AutoModelForQuestionAnswering.from_config(
+            AutoConfig.from_pretrained(model_name)))
+        try:
+            fine_tuned_model.load_state_dict(torch.load(cache_path, weights_only=True))
+            return fine_tuned_model, tokenizer
+        except Exception as error:
+            warnings.warn(f"Ignoring unreadable optimized model cache {cache_path}: {error}")
+    fine_tuned_model = quantize_model(AutoModelForQuestionAnswering.from_pretrained(model_name))
+    if cache_path is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        # write then rename, so a crash mid-write never leaves a truncated cache file behind
+        torch.save(fine_tuned_model.state_dict(), cache_path + ".tmp")
+        os.replace(cache_path + ".tmp", cache_path)
     return fine_tuned_model, tokenizer
     # # Load the fine-tuned model and tokenizer
     # fine_tuned_model = AutoModelForQuestionAnswering.from_pretrained('./fine_tuned_model')
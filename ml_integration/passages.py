@@ -0,0 +1,245 @@
+import re
+from collections import namedtuple
+import numpy as np
+from .corpus_index import pack_strings, unpack_strings, npz_path
+from .retrievers import RETRIEVERS, retriever_name
+
+# a passage is the slice documents[doc_id][start:end] of the source corpus
+Passage = namedtuple("Passage", ["doc_id", "start", "end", "text"])
+
+# a span records where a source range was placed inside a QA context string
+ContextSpan = namedtuple("ContextSpan", ["context_start", "context_end", "doc_id", "start", "end"])
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?])\s+")
+
+
+def sentence_offsets(text):
+    """
+    Splits text into sentences with the same rule as tokenize_legal_text, keeping character offsets.
+
+    Args:
+        text (str): The document text.
+
+    Returns:
+        list of tuple: The (start, end) offsets of every non-empty sentence.
+    """
+    offsets = []
+    start = len(text) - len(text.lstrip())
+    for boundary in SENTENCE_BOUNDARY.finditer(text, start):
+        if boundary.start() > start:
+            offsets.append((start, boundary.start()))
+        start = boundary.end()
+    end = len(text.rstrip())
+    if end > start:
+        offsets.append((start, end))
+    return offsets
+
+
+def split_passages(documents, window=3, stride=2):
+    """
+    Splits documents into passages of `window` consecutive sentences, starting a new passage every `stride`
+    sentences so that neighbouring passages overlap.
+
+    Args:
+        documents (list of str): The corpus of legal documents.
+        window (int): The number of sentences per passage.
+        stride (int): The number of sentences between the starts of consecutive passages.
+
+    Returns:
+        list of Passage: The passages, with offsets into their source document.
+    """
+    if window < 1 or stride < 1:
+        raise ValueError("window and stride must be positive")
+    passages = []
+    for doc_id, document in enumerate(documents):
+        sentences = sentence_offsets(document)
+        for first in range(0, len(sentences), stride):
+            last = min(first + window, len(sentences)) - 1
+            start, end = sentences[first][0], sentences[last][1]
+            passages.append(Passage(doc_id, start, end, document[start:end]))
+            if last == len(sentences) - 1:
+                break
+    return passages
+
+
+def count_tokens(text, tokenizer=None):
+    """
+    Counts the tokens of a text with the QA tokenizer, or by whitespace when no tokenizer is given.
+
+    Args:
+        text (str): The text to measure.
+        tokenizer (PreTrainedTokenizer, optional): The tokenizer of the QA model.
+
+    Returns:
+        int: The number of tokens.
+    """
+    if tokenizer is not None and hasattr(tokenizer, "tokenize"):
+        return len(tokenizer.tokenize(text))
+    return len(text.split())
+
+
+class PassageIndex:
+    """
+    A retrieval index over sentence-window passages instead of whole documents.
+
+    Retrieval ranks passages, build_context packs the best ones into a QA context under a token budget, and locate
+    maps an answer found in that context back to (doc_id, start, end) in the source corpus.
+    """
+
+    def __init__(self, source_documents, passages, index):
+        self.source_documents = source_documents
+        self.passages = passages
+        self.index = index
+
+    def __len__(self):
+        return len(self.passages)
+
+    @property
+    def documents(self):
+        # the passage texts, so the index can stand in wherever a document index is expected
+        return self.index.documents
+
+    @classmethod
+    def build(cls, documents, retriever="tfidf", window=3, stride=2):
+        """
+        Splits the documents into passages and indexes them.
+
+        Args:
+            documents (list of str): The corpus of legal documents.
+            retriever (str): The backend used to index the passages ("tfidf" or "bm25").
+            window (int): The number of sentences per passage.
+            stride (int): The number of sentences between the starts of consecutive passages.
+
+        Returns:
+            PassageIndex: The passage index.
+        """
+        if not documents or not isinstance(documents, list):
+            raise ValueError("documents must be a non-empty list")
+        if retriever not in RETRIEVERS:
+            raise ValueError(f"Unknown retriever '{retriever}', expected one of {sorted(RETRIEVERS)}")
+        passages = split_passages(documents, window=window, stride=stride)
+        index = RETRIEVERS[retriever].build([passage.text for passage in passages])
+        return cls(list(documents), passages, index)
+
+    def search(self, question, top_k=5):
+        return self.index.search(question, top_k)
+
+    def search_batch(self, questions, top_k=5):
+        return self.index.search_batch(questions, top_k)
+
+    def retrieve(self, question, top_k=5):
+        return self.index.retrieve(question, top_k)
+
+    def build_context(self, passage_ids, max_tokens=384, tokenizer=None):
+        """
+        Packs ranked passages into one context string without exceeding the token budget.
+
+        Overlapping passages of the same document are merged into one source range so that shared
+        sentences are not sent to the model twice. The best passage is always included.
+
+        Args:
+            passage_ids (list of int): The passage indices, best first.
+            max_tokens (int): The token budget of the context.
+            tokenizer (PreTrainedTokenizer, optional): The tokenizer used to count tokens.
+
+        Returns:
+            tuple: A tuple containing:
+              - str: The context string.
+              - list of ContextSpan: Where each source range sits inside the context.
+        """
+        ranges = []
+        used_tokens = 0
+        for passage_id in passage_ids:
+            passage = self.passages[passage_id]
+            document = self.source_documents[passage.doc_id]
+            merged = False
+            for selected in ranges:
+                doc_id, start, end, tokens = selected
+                if doc_id == passage.doc_id and passage.start <= end and start <= passage.end:
+                    new_start, new_end = min(start, passage.start), max(end, passage.end)
+                    new_tokens = count_tokens(document[new_start:new_end], tokenizer)
+                    if used_tokens - tokens + new_tokens <= max_tokens:
+                        selected[1:] = [new_start, new_end, new_tokens]
+                        used_tokens += new_tokens - tokens
+                    merged = True
+                    break
+            if merged:
+                continue
+            tokens = count_tokens(passage.text, tokenizer)
+            if ranges and used_tokens + tokens > max_tokens:
+                continue
+            ranges.append([passage.doc_id, passage.start, passage.end, tokens])
+            used_tokens += tokens
+
+        parts, spans = [], []
+        offset = 0
+        for doc_id, start, end, _ in ranges:
+            text = self.source_documents[doc_id][start:end]
+            parts.append(text)
+            spans.append(ContextSpan(offset, offset + len(text), doc_id, start, end))
+            offset += len(text) + 1
+        return " ".join(parts), spans
+
+    @staticmethod
+    def locate(spans, answer_start, answer_end):
+        """
+        Maps an answer's character offsets in a context built by build_context back to the source corpus.
+
+        Args:
+            spans (list of ContextSpan): The spans returned by build_context.
+            answer_start (int): The start offset of the answer in the context.
+            answer_end (int): The end offset of the answer in the context.
+
+        Returns:
+            tuple: (doc_id, start, end) in the source documents, or None when the offsets fall outside every span.
+        """
+        for span in spans:
+            if span.context_start <= answer_start < span.context_end:
+                start = span.start + answer_start - span.context_start
+                end = span.start + min(answer_end, span.context_end) - span.context_start
+                return span.doc_id, start, end
+        return None
+
+    def save(self, path):
+        """
+        Saves the passage offsets and source documents to path, and the wrapped index next to it.
+
+        Args:
+            path (str): The .npz file path to write, ".npz" being appended when missing; the wrapped index goes to
+                that path + ".index.npz".
+        """
+        path = npz_path(path)
+        doc_data, doc_offsets = pack_strings(self.source_documents)
+        np.savez(
+            path,
+            retriever=np.array([retriever_name(self.index)]),
+            passage_doc_ids=np.array([p.doc_id for p in self.passages], dtype=np.int32),
+            passage_starts=np.array([p.start for p in self.passages], dtype=np.int64),
+            passage_ends=np.array([p.end for p in self.passages], dtype=np.int64),
+            doc_data=doc_data,
+            doc_offsets=doc_offsets,
+        )
+        self.index.save(path + ".index.npz")
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a passage index previously written by save.
+
+        Args:
+            path (str): The .npz file path given to save.
+
+        Returns:
+            PassageIndex: The loaded passage index.
+        """
+        path = npz_path(path)
+        with np.load(path, allow_pickle=False) as arrays:
+            retriever = str(arrays["retriever"][0])
+            documents = unpack_strings(arrays["doc_data"], arrays["doc_offsets"])
+            passages = [
+                Passage(int(doc_id), int(start), int(end), documents[doc_id][start:end])
+                for doc_id, start, end in zip(arrays["passage_doc_ids"], arrays["passage_starts"],
+                                              arrays["passage_ends"])
+            ]
+        index = RETRIEVERS[retriever].load(path + ".index.npz")
+        return cls(documents, passages, index)
@@ -0,0 +1,318 @@
+import threading
+import time
+from collections import Counter
+from utils.resources import pipeline
+from .legal_qa_system import RETRIEVERS, get_nlp, preprocess_question, generate_answer, generate_answer_cascade, postprocess_answer, load_finetuned_model, legal_qa_system_batch, answer_from_passages, retrieve_cited_segments, bind_answer_cache
+from .passages import PassageIndex
+
+
+class LegalQAEngine:
+    """
+    A long-lived question answering engine.
+
+    The model, tokenizer, question-answering pipeline, spaCy model and retrieval index are loaded once and reused by
+    every call to answer(), instead of being rebuilt per question as legal_qa_system does.
+
+    Example:
+        with LegalQAEngine(documents=load_sample_documents()) as engine:
+            engine.warm_up()
+            print(engine.answer("What is the penalty for copyright infringement?"))
+    """
+
+    def __init__(self, documents=None, index=None, model=None, tokenizer=None, nlp=None,
+                 retriever="tfidf", model_name="deepset/roberta-base-squad2", top_k=5, passages=False,
+                 max_context_tokens=384, cache=None, optimize=False, num_threads=None, model_cache_dir=None,
+                 cascade_threshold=None, citation_index=None):
+        """
+        Args:
+            documents (list of str, optional): The corpus to index. Not needed when index is given.
+            index (LegalCorpusIndex, BM25Index or PassageIndex, optional): A prebuilt retrieval index.
+            model (PreTrainedModel, optional): The question answering model. Loaded from model_name if omitted.
+            tokenizer (PreTrainedTokenizer, optional): The tokenizer for the model. Loaded from model_name if omitted.
+            nlp (spacy.language.Language, optional): The spaCy pipeline for question preprocessing.
+                Defaults to the model shared by legal_qa_system.
+            retriever (str): The backend used to build an index from documents ("tfidf" or "bm25").
+            model_name (str): The Hugging Face model to load when no model is given.
+            top_k (int): The number of segments retrieved per question.
+            passages (bool): Index documents as sentence-window passages (PassageIndex) instead of whole documents.
+            max_context_tokens (int): The context token budget when the index is a PassageIndex.
+            cache (AnswerCache, optional): A cache of final answers. The engine binds it to the fingerprints of its
+                corpus and model whenever it loads them, so stale answers are never served.
+            optimize (bool): Load model_name with int8 dynamic quantization for CPU inference.
+            num_threads (int, optional): The number of intra-op threads torch uses.
+            model_cache_dir (str, optional): Where the optimized model is cached between startups.
+            cascade_threshold (float, optional): Answer from the top segment first and escalate to more segments only
+                while the score stays below this threshold. cascade_stats() reports where questions exited.
+            citation_index (CitationIndex, optional): A citation index over the same corpus. For questions that cite
+                an indexed provision, the documents citing it are moved to the front of the retrieved segments. Not
+                used with passages.
+        """
+        if index is None and (not documents or not isinstance(documents, list)):
+            raise ValueError("either documents or a prebuilt index is required")
+        if retriever not in RETRIEVERS:
+            raise ValueError(f"Unknown retriever '{retriever}', expected one of {sorted(RETRIEVERS)}")
+        self.documents = documents
+        self.index = index
+        self.model = model
+        self.tokenizer = tokenizer
+        self.nlp = nlp
+        self.retriever = retriever
+        self.model_name = model_name
+        self.top_k = top_k
+        self.passages = passages
+        self.max_context_tokens = max_context_tokens
+        self.cache = cache
+        self.optimize = optimize
+        self.num_threads = num_threads
+        self.model_cache_dir = model_cache_dir
+        self.cascade_threshold = cascade_threshold
+        self.citation_index = citation_index
+        self.stage_exits = Counter()
+        self.qa_pipeline = None
+        # whether close() may drop the index because load() can rebuild it from the documents
+        self._index_rebuildable = False
+        # whether close() may drop the model, tokenizer and spaCy model because load() loaded them
+        self._model_loaded = False
+        self._nlp_loaded = False
+        # the index version the cache was last bound to, so that a change made behind the engine is noticed
+        self._cache_index_version = None
+        # serialises updates with compaction, which renumbers the documents
+        self._update_lock = threading.Lock()
+
+    def __enter__(self):
+        self.load()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    @property
+    def is_loaded(self):
+        return self.qa_pipeline is not None
+
+    def load(self):
+        """
+        Loads every resource the engine needs. Safe to call more than once.
+
+        Returns:
+            LegalQAEngine: The engine itself.
+        """
+        if self.is_loaded:
+            return self
+        if self.model is None or self.tokenizer is None:
+            self.model, self.tokenizer = load_finetuned_model(self.model_name, optimize=self.optimize,
+                                                              num_threads=self.num_threads,
+                                                              cache_dir=self.model_cache_dir)
+            self._model_loaded = True
+        if self.nlp is None:
+            self.nlp = get_nlp()
+            self._nlp_loaded = True
+        if self.index is None:
+            if self.passages:
+                self.index = PassageIndex.build(self.documents, retriever=self.retriever)
+            else:
+                self.index = RETRIEVERS[self.retriever].build(self.documents)
+            self._index_rebuildable = True
+        self.qa_pipeline = pipeline("question-answering", model=self.model, tokenizer=self.tokenizer)
+        self._bind_cache()
+        return self
+
+    def _bind_cache(self):
+        if self.cache is not None:
+            self._cache_index_version = getattr(self.index, "version", None)
+            bind_answer_cache(self.cache, None, self.index, self.model, self.tokenizer, top_k=self.top_k,
+                              max_context_tokens=self.max_context_tokens, cascade_threshold=self.cascade_threshold,
+                              citation_index=self.citation_index)
+
+    def warm_up(self, question="What is the penalty for copyright infringement?"):
+        """
+        Runs one question end to end so lazy initialisation and first-call overheads are paid before serving.
+
+        Args:
+            question (str): The question to answer during warm-up.
+
+        Returns:
+            float: The warm-up latency in seconds.
+        """
+        start = time.perf_counter()
+        self.answer(question)
+        return time.perf_counter() - start
+
+    def answer(self, question):
+        """
+        Answers a legal question using the loaded resources.
+
+        Args:
+            question (str): The legal question to be answered.
+
+        Returns:
+            str: The final answer to the legal question, or None for an empty question.
+        """
+        if not question or not isinstance(question, str):
+            return None
+        self.load()
+        processed_question, tokens, entities = preprocess_question(question, nlp_model=self.nlp)
+        if self.cache is not None:
+            if getattr(self.index, "version", None) != self._cache_index_version:
+                self._bind_cache()
+            cached_answer = self.cache.get(processed_question)
+            if cached_answer is not None:
+                return cached_answer
+        if isinstance(self.index, PassageIndex):
+            preprocessed = (processed_question, tokens, entities)
+            final_answer = self.answer_with_source(question, preprocessed=preprocessed)["answer"]
+        else:
+            relevant_segments = None
+            if self.citation_index is not None:
+                relevant_segments = retrieve_cited_segments(question, processed_question, self.citation_index,
+                                                            self.index, top_k=self.top_k)
+            if relevant_segments is None:
+                relevant_segments = self.index.retrieve(processed_question, top_k=self.top_k)
+            if self.cascade_threshold is not None:
+                raw_answer, confidence_score, _ = generate_answer_cascade(
+                    processed_question, relevant_segments, self.model, self.tokenizer, entities,
+                    threshold=self.cascade_threshold, qa_pipeline=self.qa_pipeline, stage_counter=self.stage_exits)
+            else:
+                context = " ".join(relevant_segments)
+                raw_answer, confidence_score = generate_answer(processed_question, context, self.model,
+                                                               self.tokenizer, entities, qa_pipeline=self.qa_pipeline)
+            final_answer = postprocess_answer(raw_answer, relevant_segments, processed_question, confidence_score)
+        if self.cache is not None:
+            self.cache.put(processed_question, final_answer)
+        return final_answer
+
+    def answer_with_source(self, question, preprocessed=None):
+        """
+        Answers a legal question from a passage index and reports where the answer is in the source corpus.
+
+        Args:
+            question (str): The legal question to be answered.
+            preprocessed (tuple, optional): The preprocess_question result for the question, when already computed.
+
+        Returns:
+            dict: The answer_from_passages result ("answer", "raw_answer", "score" and "source"), or None for an
+            empty question.
+        """
+        self.load()
+        if not isinstance(self.index, PassageIndex):
+            raise TypeError("answer_with_source needs a PassageIndex; create the engine with passages=True")
+        return answer_from_passages(question, self.index, self.model, self.tokenizer, nlp_model=self.nlp,
+                                    qa_pipeline=self.qa_pipeline, max_context_tokens=self.max_context_tokens,
+                                    top_k=self.top_k, preprocessed=preprocessed)
+
+    def answer_batch(self, questions, batch_size=16):
+        """
+        Answers many legal questions at once using legal_qa_system_batch and the loaded resources. Questions in the
+        answer cache are served from it, and the others are added to it.
+
+        Args:
+            questions (list of str): The legal questions to be answered.
+            batch_size (int): The number of question/context windows per QA forward pass.
+
+        Returns:
+            list of str: One final answer per question, or None for an empty or non-string question.
+        """
+        self.load()
+        return legal_qa_system_batch(questions, None, self.model, self.tokenizer, index=self.index,
+                                     nlp_model=self.nlp, qa_pipeline=self.qa_pipeline, batch_size=batch_size,
+                                     max_context_tokens=self.max_context_tokens,
+                                     cascade_threshold=self.cascade_threshold, stage_counter=self.stage_exits,
+                                     citation_index=self.citation_index, cache=self.cache, top_k=self.top_k)
+
+    def cascade_stats(self):
+        """
+        Reports how many questions exited the confidence cascade at each stage.
+
+        Returns:
+            dict: "exits" maps each stage (the number of top segments used, or "all") to its question count, and
+            "questions" is the total number of questions answered through the cascade.
+        """
+        exits = {"all" if stage is None else stage: count for stage, count in self.stage_exits.items()}
+        return {"exits": exits, "questions": sum(exits.values())}
+
+    def add_documents(self, documents):
+        """
+        Adds documents to the index without refitting it; they are retrievable by the next question.
+
+        Args:
+            documents (list of str): The documents to add.
+
+        Returns:
+            list of int: The ids assigned to the new documents.
+        """
+        self.load()
+        if not hasattr(self.index, "add_documents"):
+            raise TypeError(f"{type(self.index).__name__} does not support incremental updates")
+        with self._update_lock:
+            doc_ids = self.index.add_documents(documents)
+            # the updated index, and any citation index numbered like it, can no longer be rebuilt from the documents
+            self._index_rebuildable = False
+            if self.citation_index is not None:
+                self.citation_index.add_documents(documents)
+            self._bind_cache()
+        return doc_ids
+
+    def remove_documents(self, doc_ids):
+        """
+        Removes documents from the index without refitting it.
+
+        Args:
+            doc_ids (list of int): The ids of the documents to remove.
+        """
+        self.load()
+        if not hasattr(self.index, "remove_documents"):
+            raise TypeError(f"{type(self.index).__name__} does not support incremental updates")
+        with self._update_lock:
+            self.index.remove_documents(doc_ids)
+            self._index_rebuildable = False
+            if self.citation_index is not None:
+                self.citation_index.remove_documents(doc_ids)
+            self._bind_cache()
+
+    def compact(self):
+        """
+        Refits the index on its live documents (see LegalCorpusIndex.compact), renumbers the citation index like it
+        and rebinds the answer cache to the new index version. Questions keep being answered while it runs;
+        add_documents and remove_documents wait for it.
+
+        Returns:
+            np.ndarray: The new id of every old document id, or -1 for removed documents.
+        """
+        self.load()
+        if not hasattr(self.index, "compact"):
+            raise TypeError(f"{type(self.index).__name__} does not support compaction")
+        with self._update_lock:
+            mapping = self.index.compact()
+            if self.citation_index is not None:
+                self.citation_index.renumber(mapping)
+            self._bind_cache()
+        return mapping
+
+    def start_compaction(self):
+        """
+        Runs compact() in a background thread.
+
+        Returns:
+            threading.Thread: The started thread.
+        """
+        thread = threading.Thread(target=self.compact, name="legal-qa-engine-compaction", daemon=True)
+        thread.start()
+        return thread
+
+    def close(self):
+        """
+        Releases the pipeline and the resources load() created so their memory can be reclaimed. A model,
+        tokenizer, spaCy model or index that was passed in is kept, as is an index updated with add_documents or
+        remove_documents, since the next load() could not recreate them.
+        """
+        self.qa_pipeline = None
+        if self._model_loaded:
+            self.model = None
+            self.tokenizer = None
+            self._model_loaded = False
+        if self._nlp_loaded:
+            self.nlp = None
+            self._nlp_loaded = False
+        if self._index_rebuildable:
+            self.index = None
+            self._index_rebuildable = False
@@ -0,0 +1,149 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+
+class QAService:
+    """
+    An asyncio front-end that answers concurrent questions in micro-batches.
+
+    Incoming questions wait in a bounded queue. A single batcher task takes the first waiting question, keeps
+    collecting until max_batch_size questions are queued or max_wait seconds have passed, and answers the whole batch
+    with one engine.answer_batch call in an executor, so the event loop stays free while the model runs. Each caller
+    awaits its own future.
+
+    The engine is usually a LegalQAEngine, but any object with an answer_batch(questions) method works.
+    """
+
+    def __init__(self, engine, max_batch_size=16, max_wait=0.01, max_queue_size=256, executor=None):
+        """
+        Args:
+            engine (LegalQAEngine): The engine that answers the batches.
+            max_batch_size (int): The largest number of questions answered together.
+            max_wait (float): How long, in seconds, the first question of a batch waits for others to join it.
+            max_queue_size (int): The number of questions that may wait; callers are held back when it is reached.
+            executor (concurrent.futures.Executor, optional): Runs answer_batch. A single worker thread when None,
+                since one model instance answers one batch at a time.
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be positive")
+        self.engine = engine
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.max_queue_size = max_queue_size
+        self.batches = 0
+        self.answered = 0
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._queue = None
+        self._batcher = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback):
+        await self.stop()
+
+    @property
+    def is_running(self):
+        return self._batcher is not None and not self._batcher.done()
+
+    async def start(self):
+        """
+        Loads the engine in the executor and starts the batcher task. Safe to call more than once.
+        """
+        if self.is_running:
+            return
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="qa-service")
+        # the queue belongs to the running loop, so it is created here rather than in __init__
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        if hasattr(self.engine, "load"):
+            await asyncio.get_running_loop().run_in_executor(self._executor, self.engine.load)
+        self._batcher = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Answers the questions still queued, then stops the batcher task and the service's own executor.
+        """
+        if self._batcher is None:
+            return
+        await self._queue.join()
+        self._batcher.cancel()
+        try:
+            await self._batcher
+        except asyncio.CancelledError:
+            pass
+        self._batcher = None
+        if self._owns_executor:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    async def answer(self, question, wait=True):
+        """
+        Queues a question and waits for its answer.
+
+        Args:
+            question (str): The legal question to be answered.
+            wait (bool): When the queue is full, wait for room (backpressure) if True, or raise asyncio.QueueFull.
+
+        Returns:
+            str: The final answer, as returned by the engine for this question.
+        """
+        if not self.is_running:
+            raise RuntimeError("the service is not running; call start() first")
+        future = asyncio.get_running_loop().create_future()
+        if wait:
+            await self._queue.put((question, future))
+        else:
+            self._queue.put_nowait((question, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            await self._answer_batch(loop, batch)
+
+    async def _answer_batch(self, loop, batch):
+        # callers that gave up (cancelled) are dropped before the model sees their question
+        pending = [(question, future) for question, future in batch if not future.done()]
+        try:
+            if pending:
+                questions = [question for question, _ in pending]
+                answers = await loop.run_in_executor(self._executor, self.engine.answer_batch, questions)
+                self.batches += 1
+                self.answered += len(pending)
+                for (_, future), answer in zip(pending, answers):
+                    if not future.done():
+                        future.set_result(answer)
+        except Exception as error:
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(error)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def stats(self):
+        """
+        Returns the batching counters.
+
+        Returns:
+            dict: batches, answered, mean_batch_size and the number of questions waiting in the queue.
+        """
+        return {
+            "batches": self.batches,
+            "answered": self.answered,
+            "mean_batch_size": self.answered / self.batches if self.batches else 0.0,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
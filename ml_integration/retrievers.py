@@ -0,0 +1,26 @@
+from .corpus_index import LegalCorpusIndex
+from .bm25_index import BM25Index
+
+# retrieval backends selectable by name; each exposes build(documents), build_from_store(store, documents),
+# search(question, top_k), search_batch(questions, top_k), score_documents(question, doc_ids),
+# retrieve(question, top_k), save(path) and load(path)
+RETRIEVERS = {
+    "tfidf": LegalCorpusIndex,
+    "bm25": BM25Index,
+}
+
+
+def retriever_name(index):
+    """
+    Returns the RETRIEVERS name of an index instance.
+
+    Args:
+        index: A retrieval index.
+
+    Returns:
+        str: The registered name of the index's class.
+    """
+    for name, index_class in RETRIEVERS.items():
+        if type(index) is index_class:
+            return name
+    raise ValueError(f"{type(index).__name__} is not a registered retriever")
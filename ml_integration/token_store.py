@@ -0,0 +1,308 @@
+import json
+import os
+import numpy as np
+from scipy import sparse
+from text_processing import tokenize_legal_text, normalize_legal_texts, NormalizationCache
+from .corpus_index import pack_strings, unpack_strings
+
+# the files of a token store directory; meta.json is written last, so a store without it is incomplete
+TOKENS_FILE = "tokens.u32"
+SENTENCES_FILE = "sentences.i64"
+DOCUMENTS_FILE = "documents.i64"
+VOCABULARY_FILE = "vocabulary.npz"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+
+# explicit byte order, so a store written on one machine reads the same on another
+TOKEN_DTYPE = np.dtype("<u4")
+OFFSET_DTYPE = np.dtype("<i8")
+
+
+class TokenStoreWriter:
+    """
+    Writes a tokenized corpus as a token store: an interned vocabulary, one flat array of token ids and two offset
+    tables, the first token of every sentence and the first sentence of every document.
+
+    Token ids are appended to disk as documents arrive, so memory holds the vocabulary and one buffer of ids rather
+    than the corpus. The files are written under temporary names and renamed by close(), which first removes the
+    meta.json of any previous store in the directory: a crash part way leaves no store rather than a mix of two.
+    """
+
+    def __init__(self, path, buffer_size=1 << 20):
+        """
+        Args:
+            path (str): The directory to write the store to.
+            buffer_size (int): The number of token ids collected before they are written out.
+        """
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.buffer_size = buffer_size
+        self.vocabulary = {}
+        self.n_tokens = 0
+        self.n_sentences = 0
+        self.n_documents = 0
+        self._buffer = []
+        self._files = {name: open(self._tmp(name), "wb") for name in (TOKENS_FILE, SENTENCES_FILE, DOCUMENTS_FILE)}
+        np.zeros(1, dtype=OFFSET_DTYPE).tofile(self._files[SENTENCES_FILE])
+        np.zeros(1, dtype=OFFSET_DTYPE).tofile(self._files[DOCUMENTS_FILE])
+
+    def _tmp(self, name):
+        return os.path.join(self.path, name + ".tmp")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+    def add_document(self, sentences):
+        """
+        Appends a tokenized document.
+
+        Args:
+            sentences (list of list of str): The tokens of each sentence, as returned by tokenize_legal_text.
+
+        Returns:
+            int: The id of the document.
+        """
+        vocabulary = self.vocabulary
+        sentence_ends = []
+        for sentence in sentences:
+            for token in sentence:
+                token_id = vocabulary.get(token)
+                if token_id is None:
+                    token_id = vocabulary[token] = len(vocabulary)
+                self._buffer.append(token_id)
+            self.n_tokens += len(sentence)
+            sentence_ends.append(self.n_tokens)
+        self.n_sentences += len(sentence_ends)
+        np.asarray(sentence_ends, dtype=OFFSET_DTYPE).tofile(self._files[SENTENCES_FILE])
+        np.asarray([self.n_sentences], dtype=OFFSET_DTYPE).tofile(self._files[DOCUMENTS_FILE])
+        if len(self._buffer) >= self.buffer_size:
+            self._flush()
+        self.n_documents += 1
+        return self.n_documents - 1
+
+    def add_text(self, text):
+        """
+        Tokenizes a document with tokenize_legal_text and appends it.
+
+        Args:
+            text (str): The document text.
+
+        Returns:
+            int: The id of the document.
+        """
+        return self.add_document(tokenize_legal_text(text))
+
+    def _flush(self):
+        np.asarray(self._buffer, dtype=TOKEN_DTYPE).tofile(self._files[TOKENS_FILE])
+        self._buffer = []
+
+    def close(self):
+        """
+        Writes the vocabulary and metadata and moves the files into place.
+        """
+        self._flush()
+        for f in self._files.values():
+            f.close()
+        data, offsets = pack_strings(list(self.vocabulary))
+        with open(self._tmp(VOCABULARY_FILE), "wb") as f:
+            np.savez(f, data=data, offsets=offsets)
+        meta_path = os.path.join(self.path, META_FILE)
+        if os.path.exists(meta_path):
+            os.remove(meta_path)
+        for name in (TOKENS_FILE, SENTENCES_FILE, DOCUMENTS_FILE, VOCABULARY_FILE):
+            os.replace(self._tmp(name), os.path.join(self.path, name))
+        meta = {"format": FORMAT_VERSION, "documents": self.n_documents, "sentences": self.n_sentences,
+                "tokens": self.n_tokens, "vocabulary": len(self.vocabulary)}
+        with open(self._tmp(META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(self._tmp(META_FILE), os.path.join(self.path, META_FILE))
+
+    def abort(self):
+        """
+        Closes and deletes the partly written files, leaving any previous store in the directory untouched.
+        """
+        for name, f in self._files.items():
+            f.close()
+            os.remove(self._tmp(name))
+
+
+class TokenStore:
+    """
+    A read-only view of a token store written by TokenStoreWriter.
+
+    The token ids and offset tables are memory-mapped, so opening a store reads only the vocabulary, slices are views
+    into the files, and every process that opens the same store shares its pages through the OS page cache. A store
+    is pickled as its path and mapped again on unpickling, so it can be passed to worker processes without copying
+    the corpus. The retrievers build from a store with build_from_store, and iter_normalized normalizes it, so
+    neither tokenizes the text again.
+
+    Attributes:
+        vocabulary (list of str): The distinct tokens; a token id is an index into this list.
+        token_ids (np.ndarray): The token ids of the whole corpus, uint32.
+        sentence_offsets (np.ndarray): Sentence j is token_ids[sentence_offsets[j]:sentence_offsets[j + 1]].
+        document_offsets (np.ndarray): Document i holds sentences document_offsets[i] to document_offsets[i + 1].
+    """
+
+    def __init__(self, path):
+        """
+        Args:
+            path (str): The store directory.
+        """
+        meta_path = os.path.join(path, META_FILE)
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f"no complete token store at {path}")
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta["format"] != FORMAT_VERSION:
+            raise ValueError(f"unsupported token store format {meta['format']}")
+        self.path = path
+        sizes = {TOKENS_FILE: meta["tokens"] * TOKEN_DTYPE.itemsize,
+                 SENTENCES_FILE: (meta["sentences"] + 1) * OFFSET_DTYPE.itemsize,
+                 DOCUMENTS_FILE: (meta["documents"] + 1) * OFFSET_DTYPE.itemsize}
+        for name, size in sizes.items():
+            if os.path.getsize(os.path.join(path, name)) != size:
+                raise ValueError(f"token store at {path} is inconsistent: {name} does not match {META_FILE}")
+        with np.load(os.path.join(path, VOCABULARY_FILE)) as data:
+            self.vocabulary = unpack_strings(data["data"], data["offsets"])
+        if len(self.vocabulary) != meta["vocabulary"]:
+            raise ValueError(f"token store at {path} is inconsistent: {VOCABULARY_FILE} does not match {META_FILE}")
+        self.token_ids = self._map(TOKENS_FILE, TOKEN_DTYPE)
+        self.sentence_offsets = self._map(SENTENCES_FILE, OFFSET_DTYPE)
+        self.document_offsets = self._map(DOCUMENTS_FILE, OFFSET_DTYPE)
+        self._token_index = None
+
+    def _map(self, name, dtype):
+        path = os.path.join(self.path, name)
+        # an empty file cannot be mapped
+        if os.path.getsize(path) == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def __getstate__(self):
+        return {"path": self.path}
+
+    def __setstate__(self, state):
+        self.__init__(state["path"])
+
+    def __len__(self):
+        return len(self.document_offsets) - 1
+
+    @classmethod
+    def build(cls, documents, path):
+        """
+        Tokenizes documents with tokenize_legal_text and writes them as a token store.
+
+        Args:
+            documents (iterable of str): The corpus of legal documents.
+            path (str): The directory to write the store to.
+
+        Returns:
+            TokenStore: The opened store; document i is the i-th document.
+        """
+        with TokenStoreWriter(path) as writer:
+            for document in documents:
+                writer.add_text(document)
+        return cls(path)
+
+    def token_id(self, token):
+        """
+        Returns the id of a token, or None when it is not in the vocabulary.
+        """
+        if self._token_index is None:
+            self._token_index = {token: i for i, token in enumerate(self.vocabulary)}
+        return self._token_index.get(token)
+
+    def document_token_ids(self, i):
+        """
+        Returns the token ids of document i, as a view into the mapped file.
+        """
+        first, last = self.document_offsets[i], self.document_offsets[i + 1]
+        return self.token_ids[self.sentence_offsets[first]:self.sentence_offsets[last]]
+
+    def document(self, i):
+        """
+        Returns document i as tokenize_legal_text returned it, a list of token strings per sentence.
+        """
+        first, last = self.document_offsets[i], self.document_offsets[i + 1]
+        offsets = self.sentence_offsets[first:last + 1].tolist()
+        ids = self.token_ids[offsets[0]:offsets[-1]].tolist()
+        base = offsets[0]
+        return [[self.vocabulary[token_id] for token_id in ids[start - base:end - base]]
+                for start, end in zip(offsets, offsets[1:])]
+
+    def iter_documents(self):
+        """
+        Yields every document as a list of token strings per sentence, one document at a time.
+        """
+        for i in range(len(self)):
+            yield self.document(i)
+
+    def iter_normalized(self, batch_size=256, cache=None):
+        """
+        Yields every document normalized like normalize_legal_texts, without re-tokenizing the text. Documents are
+        read in batches of batch_size, and each distinct token is normalized once for the whole store.
+
+        Args:
+            batch_size (int): The number of documents normalized at once.
+            cache (NormalizationCache, optional): Normalized tokens kept across runs. An in-memory cache is used when
+                None.
+
+        Yields:
+            list of str: The normalized tokens of each document.
+        """
+        cache = NormalizationCache() if cache is None else cache
+        for start in range(0, len(self), batch_size):
+            token_lists = [[token for sentence in self.document(i) for token in sentence]
+                           for i in range(start, min(start + batch_size, len(self)))]
+            yield from normalize_legal_texts(token_lists, cache=cache)
+
+    def term_counts(self):
+        """
+        Counts every token of the vocabulary over the whole corpus.
+
+        Returns:
+            np.ndarray: The number of occurrences of each token id.
+        """
+        return np.bincount(self.token_ids, minlength=len(self.vocabulary))
+
+    def count_matrix(self, block_size=1 << 20):
+        """
+        Builds the document-term count matrix from the token ids and document offsets. Documents are counted about
+        block_size tokens at a time, so besides the matrix itself only one block of ids is copied out of the file.
+
+        Args:
+            block_size (int): The number of tokens counted at once.
+
+        Returns:
+            scipy.sparse.csr_matrix: A (documents, vocabulary size) matrix of token counts.
+        """
+        token_offsets = self.sentence_offsets[self.document_offsets]
+        blocks = [sparse.csr_matrix((0, len(self.vocabulary)), dtype=np.int32)]
+        first = 0
+        while first < len(self):
+            # at least one document per block, however long
+            last = int(np.searchsorted(token_offsets, token_offsets[first] + block_size, side="right")) - 1
+            last = min(max(last, first + 1), len(self))
+            start, end = token_offsets[first], token_offsets[last]
+            block = sparse.csr_matrix((np.ones(end - start, dtype=np.int32), self.token_ids[start:end].astype(np.int32),
+                                       token_offsets[first:last + 1] - start),
+                                      shape=(last - first, len(self.vocabulary)))
+            block.sum_duplicates()
+            blocks.append(block)
+            first = last
+        return sparse.vstack(blocks, format="csr")
+
+    def document_frequencies(self):
+        """
+        Counts the documents each token of the vocabulary occurs in.
+
+        Returns:
+            np.ndarray: The number of documents containing each token id.
+        """
+        return np.bincount(self.count_matrix().indices, minlength=len(self.vocabulary))
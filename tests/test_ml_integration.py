@@ -1,8 +1,47 @@
-from ml_integration import legal_qa_system, load_sample_documents, postprocess_answer, retrieve_relevant_segments, preprocess_question, generate_answer, load_finetuned_model
+from ml_integration import legal_qa_system, legal_qa_system_batch, retrieve_cited_segments, generate_answers_cascade, load_sample_documents, postprocess_answer, retrieve_relevant_segments, preprocess_question, generate_answer, load_finetuned_model, LegalCorpusIndex, BM25Index, LegalQAEngine, PassageIndex, split_passages, answer_from_passages, AnswerCache, corpus_fingerprint, DenseIndex, HybridIndex, QAService, ingest_pdfs, iter_corpus, build_index_from_corpus, CitationIndex, build_citation_index_from_corpus, TokenStore, TokenStoreWriter, build_token_store_from_corpus
+from ml_integration.ingestion import read_pdf_pages
+import asyncio
+from collections import Counter
+import numpy as np
+import os
+import pickle
+import subprocess
+import sys
+import tempfile
+import time
+import types
 import unittest
-from unittest.mock import patch
+import zlib
+from unittest.mock import ANY, MagicMock, patch
 
 from safetensors.torch import load_model
+from text_processing import tokenize_legal_text, normalize_legal_texts
+
+
+def fake_qa_pipeline(answer, score=0.5):
+    """
+    Stand-in for the question-answering pipeline. answer and score are constants or functions of (question, context);
+    a batched call gets one result per question, and every call's contexts are recorded in the stub's contexts.
+    """
+    def result(question, context):
+        return {"answer": answer(question, context) if callable(answer) else answer,
+                "score": score(question, context) if callable(score) else score}
+
+    def qa_pipeline(question, context, batch_size=None):
+        if isinstance(context, list):
+            qa_pipeline.contexts.append(list(context))
+            return [result(q, c) for q, c in zip(question, context)]
+        qa_pipeline.contexts.append([context])
+        return result(question, context)
+
+    qa_pipeline.contexts = []
+    return qa_pipeline
+
+
+def patch_engine_pipeline(qa_pipeline):
+    """Makes LegalQAEngine use qa_pipeline instead of building one from its model."""
+    return patch("ml_integration.qa_engine.pipeline", return_value=qa_pipeline)
+
 
 class TestLegalQASystem(unittest.TestCase):
 
@@ -30,3 +69,885 @@ class TestLegalQASystem(unittest.TestCase):
         question = "What is the penalty for copyright infringement under Pakistani law?"
         result = legal_qa_system(question, " ", "model", "tokenizer")
         self.assertIsNone(result)
+
+
+class TestLoadFinetunedModel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp_dir.cleanup)
+        # torch and transformers stand-ins: the cache logic is tested without downloading a model
+        self.torch = types.ModuleType("torch")
+        self.torch.__version__ = "2.0"
+        self.torch.set_num_threads = MagicMock()
+        self.torch.save = self.save
+        self.torch.load = MagicMock(side_effect=self.load_weights)
+        self.transformers = MagicMock(__version__="4.0")
+        self.pretrained = MagicMock(name="pretrained")
+        self.pretrained.state_dict.return_value = {"weight": [1, 2]}
+        self.skeleton = MagicMock(name="skeleton")
+        auto_model = self.transformers.AutoModelForQuestionAnswering
+        auto_model.from_pretrained.return_value = self.pretrained
+        auto_model.from_config.return_value = self.skeleton
+        modules = patch.dict(sys.modules, {"torch": self.torch, "transformers": self.transformers})
+        modules.start()
+        self.addCleanup(modules.stop)
+        quantize = patch("ml_integration.legal_qa_system.quantize_model", side_effect=lambda model: model)
+        self.quantize = quantize.start()
+        self.addCleanup(quantize.stop)
+
+    @staticmethod
+    def save(state, path):
+        with open(path, "wb") as f:
+            pickle.dump(state, f)
+
+    @staticmethod
+    def load_weights(path, weights_only):
+        with open(path, "rb") as f:
+            return pickle.load(f)
+
+    def load(self):
+        return load_finetuned_model("tiny/model", optimize=True, cache_dir=self.tmp_dir.name)
+
+    def test_cache_miss_then_hit(self):
+        model, _ = self.load()
+        self.assertIs(model, self.pretrained)
+        self.quantize.assert_called_once_with(self.pretrained)
+        self.assertEqual(len(os.listdir(self.tmp_dir.name)), 1)
+
+        self.transformers.AutoModelForQuestionAnswering.from_pretrained.reset_mock()
+        model, _ = self.load()
+        self.assertIs(model, self.skeleton)
+        self.transformers.AutoModelForQuestionAnswering.from_pretrained.assert_not_called()
+        self.skeleton.load_state_dict.assert_called_once_with({"weight": [1, 2]})
+        self.torch.load.assert_called_once_with(ANY, weights_only=True)
+
+    def test_corrupt_cache_is_rebuilt(self):
+        self.load()
+        path = os.path.join(self.tmp_dir.name, os.listdir(self.tmp_dir.name)[0])
+        with open(path, "wb") as f:
+            f.write(b"not a state dict")
+        with self.assertWarns(UserWarning):
+            model, _ = self.load()
+        self.assertIs(model, self.pretrained)
+        self.assertIs(self.load()[0], self.skeleton)
+
+    def test_num_threads_without_optimization(self):
+        model, tokenizer = load_finetuned_model("tiny/model", num_threads=2)
+        self.torch.set_num_threads.assert_called_once_with(2)
+        self.assertIs(model, self.pretrained)
+        self.assertIs(tokenizer, self.transformers.AutoTokenizer.from_pretrained.return_value)
+        self.quantize.assert_not_called()
+        self.assertEqual(os.listdir(self.tmp_dir.name), [])
+
+
+class TestLegalCorpusIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = load_sample_documents()
+        self.index = LegalCorpusIndex.build(self.documents)
+
+    def test_matches_refit_retrieval(self):
+        question = "what is the penalty for copyright infringement"
+        expected = retrieve_relevant_segments(question, self.documents)
+        self.assertEqual(retrieve_relevant_segments(question, self.documents, index=self.index), expected)
+
+    def test_save_and_load(self):
+        question = "copyright ordinance 1962"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.npz")
+            self.index.save(path)
+            loaded = LegalCorpusIndex.load(path)
+        self.assertEqual(loaded.documents, self.documents)
+        self.assertEqual(loaded.retrieve(question), self.index.retrieve(question))
+
+    def test_unknown_terms(self):
+        indices, scores = self.index.search("zzzz qqqq", top_k=3)
+        self.assertEqual(len(indices), 3)
+        self.assertTrue((scores == 0).all())
+
+    def test_legal_qa_system_without_documents(self):
+        result = legal_qa_system("", None, "model", "tokenizer", index=self.index)
+        self.assertIsNone(result)
+
+
+class TestIncrementalIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = load_sample_documents()
+        self.index = LegalCorpusIndex.build(self.documents)
+
+    def test_added_documents_are_searchable(self):
+        new_document = "The copyright of a sound recording lasts fifty years."
+        doc_ids = self.index.add_documents([new_document])
+        self.assertEqual(doc_ids, [len(self.documents)])
+        self.assertEqual(self.index.retrieve("sound recording copyright", top_k=1), [new_document])
+        batch_indices, _ = self.index.search_batch(["sound recording copyright"], top_k=1)[0]
+        self.assertEqual(batch_indices.tolist(), doc_ids)
+
+    def test_removed_documents_are_not_returned(self):
+        top_indices, _ = self.index.search("penalty fines imprisonment", top_k=len(self.documents))
+        self.index.remove_documents([int(top_indices[0])])
+        indices, _ = self.index.search("penalty fines imprisonment", top_k=len(self.documents))
+        self.assertNotIn(top_indices[0], indices)
+        self.assertEqual(len(indices), len(self.documents) - 1)
+        self.assertEqual(len(self.index), len(self.documents) - 1)
+
+    def test_deltas_are_merged_by_size(self):
+        added = [f"Schedule {i} lists the fees for registering copyright." for i in range(100)]
+        for document in added:
+            self.index.add_documents([document])
+        deltas = [matrix.shape[0] for _, matrix in self.index._state.segments[1:]]
+        self.assertEqual(sum(deltas), len(added))
+        self.assertLessEqual(len(deltas), 7)
+        self.assertTrue(all(larger >= 2 * smaller for larger, smaller in zip(deltas, deltas[1:])))
+        expected = LegalCorpusIndex.build(self.documents)
+        expected.add_documents(added)
+        for question in ("fees registering copyright", "schedule 42"):
+            self.assertEqual(self.index.retrieve(question), expected.retrieve(question))
+
+    def test_compaction_matches_refit(self):
+        added = ["Trademarks are registered under the Trade Marks Ordinance 2001."]
+        self.index.add_documents(added)
+        self.index.remove_documents([0])
+        version = self.index.version
+        self.index.start_compaction().join()
+        expected = LegalCorpusIndex.build(self.documents[1:] + added)
+        question = "trademarks registered ordinance"
+        self.assertEqual(self.index.retrieve(question), expected.retrieve(question))
+        self.assertNotEqual(self.index.version, version)
+
+    def test_save_and_load_keeps_updates(self):
+        self.index.add_documents(["The copyright of a sound recording lasts fifty years."])
+        self.index.remove_documents([1])
+        question = "sound recording copyright"
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "index.npz")
+            self.index.save(path)
+            loaded = LegalCorpusIndex.load(path)
+        self.assertEqual(loaded.retrieve(question), self.index.retrieve(question))
+        self.assertEqual(len(loaded), len(self.index))
+        self.assertEqual(loaded.version, self.index.version)
+
+
+class TestBM25Index(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = load_sample_documents()
+        self.index = BM25Index.build(self.documents)
+
+    def test_top_document(self):
+        segments = retrieve_relevant_segments("penalty fines imprisonment", self.documents, retriever="bm25")
+        self.assertEqual(segments[0], "The penalty for copyright infringement may include fines and imprisonment.")
+        self.assertEqual(len(segments), 5)
+
+    def test_prebuilt_index_matches_retriever(self):
+        question = "copyright ordinance 1962"
+        expected = retrieve_relevant_segments(question, self.documents, retriever="bm25")
+        self.assertEqual(retrieve_relevant_segments(question, None, index=self.index), expected)
+
+    def test_posting_arrays(self):
+        self.assertEqual(self.index.posting_docs.dtype, np.int32)
+        self.assertEqual(self.index.posting_weights.dtype, np.float32)
+        self.assertEqual(self.index.posting_offsets[-1], len(self.index.posting_docs))
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "bm25.npz")
+            self.index.save(path)
+            loaded = BM25Index.load(path)
+        indices, scores = self.index.search("pakistan offense")
+        loaded_indices, loaded_scores = loaded.search("pakistan offense")
+        np.testing.assert_array_equal(indices, loaded_indices)
+        np.testing.assert_allclose(scores, loaded_scores)
+
+    def test_unknown_retriever(self):
+        with self.assertRaises(ValueError):
+            retrieve_relevant_segments("penalty", self.documents, retriever="unknown")
+
+
+class TestLegalQAEngine(unittest.TestCase):
+
+    def setUp(self):
+        self.fake_pipeline = fake_qa_pipeline(" fines and imprisonment ")
+
+    def test_pipeline_built_once(self):
+        with patch_engine_pipeline(self.fake_pipeline) as mock_pipeline:
+            with LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer") as engine:
+                first = engine.answer("What is the penalty for copyright infringement?")
+                second = engine.answer("What does the Copyright Ordinance outline?")
+        self.assertEqual(mock_pipeline.call_count, 1)
+        self.assertEqual(first, "fines and imprisonment (Confidence Score: 50.00%)")
+        self.assertEqual(second, first)
+        self.assertFalse(engine.is_loaded)
+
+    def test_warm_up(self):
+        with patch_engine_pipeline(self.fake_pipeline):
+            engine = LegalQAEngine(index=BM25Index.build(load_sample_documents()), model="model", tokenizer="tokenizer")
+            self.assertGreaterEqual(engine.warm_up(), 0.0)
+            self.assertTrue(engine.is_loaded)
+            engine.close()
+        self.assertIsNotNone(engine.index)
+
+    def test_close_keeps_injected_model(self):
+        with patch_engine_pipeline(self.fake_pipeline), \
+                patch("ml_integration.qa_engine.load_finetuned_model") as load_model:
+            engine = LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer")
+            with engine:
+                pass
+            self.assertEqual((engine.model, engine.tokenizer), ("model", "tokenizer"))
+            engine.load()
+        load_model.assert_not_called()
+
+    def test_empty_question(self):
+        engine = LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer")
+        self.assertIsNone(engine.answer(""))
+
+    def test_requires_documents_or_index(self):
+        with self.assertRaises(ValueError):
+            LegalQAEngine()
+
+
+class TestLegalQASystemBatch(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = load_sample_documents()
+        self.questions = ["What is the penalty for copyright infringement?", "", "Which ordinance governs copyright?"]
+        self.fake_pipeline = fake_qa_pipeline(lambda question, context: f"answer to {question}", score=0.25)
+
+    def test_batch_answers(self):
+        answers = legal_qa_system_batch(self.questions, self.documents, "model", "tokenizer",
+                                        qa_pipeline=self.fake_pipeline)
+        processed = [preprocess_question(question)[0] for question in self.questions[::2]]
+        self.assertEqual(answers, [f"answer to {processed[0]} (Confidence Score: 25.00%)", None,
+                                   f"answer to {processed[1]} (Confidence Score: 25.00%)"])
+
+    def test_search_batch_matches_search(self):
+        questions = ["penalty for copyright infringement", "copyright ordinance 1962", "unknown words"]
+        for index_class in (LegalCorpusIndex, BM25Index):
+            index = index_class.build(self.documents)
+            for question, (indices, scores) in zip(questions, index.search_batch(questions)):
+                with self.subTest(index=index_class.__name__, question=question):
+                    expected_indices, expected_scores = index.search(question)
+                    np.testing.assert_array_equal(indices, expected_indices)
+                    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+    def test_score_documents_matches_search(self):
+        index = LegalCorpusIndex().fit(self.documents[:3])
+        index.add_documents(self.documents[3:])
+        for index in (index, BM25Index.build(self.documents)):
+            with self.subTest(index=type(index).__name__):
+                indices, scores = index.search("penalty for copyright infringement", top_k=len(self.documents))
+                np.testing.assert_allclose(index.score_documents("penalty for copyright infringement", indices[::-1]),
+                                           scores[::-1], rtol=1e-6)
+
+    def test_empty_questions(self):
+        self.assertIsNone(legal_qa_system_batch([], self.documents, "model", "tokenizer"))
+        self.assertIsNone(legal_qa_system_batch(["question"], [], "model", "tokenizer"))
+
+    def test_engine_answer_batch(self):
+        with patch_engine_pipeline(self.fake_pipeline):
+            with LegalQAEngine(documents=self.documents, model="model", tokenizer="tokenizer") as engine:
+                answers = engine.answer_batch(self.questions)
+        self.assertEqual(answers[1], None)
+        self.assertEqual(len(answers), 3)
+
+    def test_engine_answer_batch_honors_top_k(self):
+        with patch_engine_pipeline(self.fake_pipeline):
+            with LegalQAEngine(documents=self.documents, model="model", tokenizer="tokenizer", top_k=2) as engine:
+                engine.answer(self.questions[0])
+                engine.answer_batch(self.questions[:1])
+                context = " ".join(engine.index.retrieve(preprocess_question(self.questions[0])[0], top_k=2))
+        self.assertEqual(self.fake_pipeline.contexts, [[context], [context]])
+
+
+class TestCascade(unittest.TestCase):
+
+    def setUp(self):
+        # confident only once the context mentions the penalty
+        self.fake_pipeline = fake_qa_pipeline("fines",
+                                              score=lambda question, context: 0.9 if "penalty" in context else 0.1)
+
+    def test_early_exit_and_escalation(self):
+        segments = [["the penalty is a fine", "b", "c", "d"], ["a", "b", "the penalty is a fine", "d", "e"], ["a"]]
+        counter = Counter()
+        results = generate_answers_cascade(["q1", "q2", "q3"], segments, "model", "tokenizer", threshold=0.5,
+                                           qa_pipeline=self.fake_pipeline, stage_counter=counter)
+        self.assertEqual([result[2] for result in results], [1, 3, 1])
+        self.assertEqual([len(batch) for batch in self.fake_pipeline.contexts], [3, 1])
+        self.assertEqual(results[2][1], 0.1)
+        self.assertEqual(counter, Counter({1: 2, 3: 1}))
+
+    def test_engine_reports_stage_exits(self):
+        with patch_engine_pipeline(self.fake_pipeline):
+            engine = LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer",
+                                   cascade_threshold=0.5)
+            answers = engine.answer_batch(["What is the penalty for copyright infringement?",
+                                           "Which ordinance governs copyright?"])
+        self.assertEqual(answers[0], "fines (Confidence Score: 90.00%)")
+        stats = engine.cascade_stats()
+        self.assertEqual(stats["questions"], 2)
+        self.assertEqual(stats["exits"][1], 1)
+
+
+class TestCitationIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = load_sample_documents() + [
+            "Article 184(3) confers original jurisdiction on the Supreme Court.",
+            "The Supreme Court held in PLD 2020 SC 1 that Art. 184(3) applies.",
+        ]
+        self.index = CitationIndex.build(self.documents)
+        self.fake_pipeline = fake_qa_pipeline(lambda question, context: context)
+
+    def test_variants_share_a_posting(self):
+        self.assertEqual(self.index.lookup("ordinance copyright 1962"), [(2, 4), (3, 45)])
+        self.assertEqual(self.index.search("What does Art.184 (3) say?"), [5, 6])
+        self.assertEqual(self.index.search("What does art. 184(3) say?"), [5, 6])
+        self.assertEqual(self.index.search("Was PLD 2020 SC 1 decided under Article 184(3)?"), [6, 5])
+        self.assertEqual(self.index.search("What is the penalty for copyright infringement?"), [])
+
+    def test_remove_and_save(self):
+        self.index.remove_documents([5])
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "citations.json")
+            self.index.save(path)
+            loaded = CitationIndex.load(path)
+        self.assertEqual(loaded.postings, self.index.postings)
+        self.assertEqual(len(loaded), 7)
+        self.assertEqual(loaded.search("Article 184(3)"), [6])
+
+    def test_batch_uses_cited_documents(self):
+        questions = ["What does the Copyright Ordinance of 1962 provide?", "What is the penalty for infringement?"]
+        answers = legal_qa_system_batch(questions, self.documents, "model", "tokenizer",
+                                        qa_pipeline=self.fake_pipeline, citation_index=self.index)
+        # the citing documents come first, in lexical order, and the best of the rest fill the context
+        context = " ".join(self.documents[i] for i in (3, 2, 1, 4, 0))
+        self.assertEqual(answers[0], context + " (Confidence Score: 50.00%)")
+        self.assertIsNotNone(answers[1])
+
+    def test_statute_names_and_lexical_order(self):
+        documents = [
+            "The Contract Act, 1872 governs agreements. Under the Contract Act, 1872 a contract needs consideration.",
+            "The Evidence Act, 1872 governs the admissibility of evidence.",
+            "Section 302 of the Companies Act sets out the winding up of a company.",
+            "Section 302 of the Penal Code prescribes the punishment for murder.",
+        ]
+        citation_index = CitationIndex.build(documents)
+        index = LegalCorpusIndex().fit(documents)
+        question = "What does the Evidence Act, 1872 say about evidence?"
+        self.assertEqual(citation_index.search(question), [1])
+        self.assertEqual(retrieve_cited_segments(question, preprocess_question(question)[0], citation_index, index,
+                                                 top_k=2), documents[1::-1])
+        # every statute has a section 302; the words of the question decide between them
+        question = "What punishment for murder does Section 302 of the Penal Code prescribe?"
+        self.assertEqual(retrieve_cited_segments(question, preprocess_question(question)[0], citation_index, index,
+                                                 top_k=2), documents[:1:-1])
+        self.assertIsNone(retrieve_cited_segments("What about agreements?", "agreements", citation_index, index))
+
+    def test_engine_keeps_index_in_sync(self):
+        with patch_engine_pipeline(self.fake_pipeline):
+            engine = LegalQAEngine(documents=list(self.documents), model="model", tokenizer="tokenizer",
+                                   citation_index=self.index)
+            engine.add_documents(["Section 302 prescribes the punishment for murder."])
+            engine.remove_documents([2])
+        self.assertEqual(self.index.search("Copyright Ordinance 1962"), [3])
+        self.assertEqual(self.index.search("sec. 302"), [7])
+
+    def test_engine_keeps_updated_index_across_close(self):
+        with patch_engine_pipeline(self.fake_pipeline):
+            engine = LegalQAEngine(documents=list(self.documents), model="model", tokenizer="tokenizer",
+                                   citation_index=self.index)
+            engine.add_documents(["Section 302 prescribes the punishment for murder."])
+            engine.remove_documents([0])
+            index = engine.index
+            engine.close()
+        self.assertIs(engine.index, index)
+        self.assertEqual(len(engine.index), len(self.documents))
+        # the citation index keeps numbering documents like the kept index
+        self.assertEqual([engine.index.documents[i] for i in self.index.search("sec. 302")],
+                         ["Section 302 prescribes the punishment for murder."])
+
+    def test_engine_compaction(self):
+        cache = AnswerCache("unbound", "unbound")
+        with patch_engine_pipeline(self.fake_pipeline):
+            with LegalQAEngine(documents=list(self.documents), model="model", tokenizer="tokenizer",
+                               citation_index=self.index, cache=cache) as engine:
+                engine.add_documents(["Section 302 prescribes the punishment for murder."])
+                engine.remove_documents([0])
+                citing = [engine.index.documents[i] for i in self.index.search("Copyright Ordinance 1962")]
+                engine.start_compaction().join()
+                self.assertEqual(cache.corpus_version, engine.index.version)
+                # the citation index is renumbered like the compacted index
+                self.assertEqual([engine.index.documents[i] for i in self.index.search("Copyright Ordinance 1962")],
+                                 citing)
+                self.assertEqual([engine.index.documents[i] for i in self.index.search("sec. 302")],
+                                 ["Section 302 prescribes the punishment for murder."])
+                # a compaction behind the engine's back is noticed by the next question
+                engine.index.compact()
+                engine.answer("What is the penalty for infringement?")
+                self.assertEqual(cache.corpus_version, engine.index.version)
+
+
+class TestTokenStore(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "store")
+        self.documents = load_sample_documents() + ["", "Under Art. 184(3) the court. The fine is Rs 100."]
+        self.store = TokenStore.build(self.documents, self.path)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip(self):
+        self.assertEqual(len(self.store), len(self.documents))
+        self.assertIsInstance(self.store.token_ids, np.memmap)
+        self.assertEqual(list(self.store.iter_documents()), [tokenize_legal_text(d) for d in self.documents])
+        ids = self.store.document_token_ids(6)
+        self.assertEqual([self.store.vocabulary[i] for i in ids[1:3]], ["Art. 184(3)", "the"])
+        self.assertIsNone(self.store.token_id("absent"))
+
+    def test_statistics(self):
+        counts = Counter(token for d in self.documents for sentence in tokenize_legal_text(d) for token in sentence)
+        term_counts = self.store.term_counts()
+        self.assertEqual({token: term_counts[self.store.token_id(token)] for token in counts}, dict(counts))
+        matrix = self.store.count_matrix()
+        self.assertEqual(matrix.shape, (7, len(self.store.vocabulary)))
+        self.assertEqual(matrix[1, self.store.token_id("copyright")], 1)
+        self.assertEqual(self.store.document_frequencies()[self.store.token_id("copyright")], 4)
+        self.assertEqual((self.store.count_matrix(block_size=5) != matrix).nnz, 0)
+
+    def test_retrievers_build_from_store(self):
+        for index_class in (LegalCorpusIndex, BM25Index):
+            with self.subTest(index=index_class.__name__):
+                expected = index_class.build(self.documents)
+                index = index_class.build_from_store(self.store, self.documents)
+                for question in ("penalty for copyright infringement", "art 184 court fine"):
+                    indices, scores = index.search(question, top_k=len(self.documents))
+                    expected_indices, expected_scores = expected.search(question, top_k=len(self.documents))
+                    np.testing.assert_array_equal(indices, expected_indices)
+                    np.testing.assert_allclose(scores, expected_scores, rtol=1e-6)
+
+    def test_iter_normalized(self):
+        with patch("text_processing.normalization.normalize_token", side_effect=str.lower), \
+                patch("text_processing.normalization.NormalizationCache._fingerprint", return_value="test"):
+            expected = normalize_legal_texts([[token for sentence in tokenize_legal_text(d) for token in sentence]
+                                              for d in self.documents])
+            self.assertEqual(list(self.store.iter_normalized(batch_size=3)), expected)
+
+    def test_pickles_as_path(self):
+        loaded = pickle.loads(pickle.dumps(self.store))
+        self.assertLess(len(pickle.dumps(self.store)), 200)
+        np.testing.assert_array_equal(loaded.token_ids, self.store.token_ids)
+
+    def test_failed_write_keeps_previous_store(self):
+        with self.assertRaises(RuntimeError):
+            with TokenStoreWriter(self.path) as writer:
+                writer.add_text("A new corpus.")
+                raise RuntimeError
+        self.assertEqual(len(TokenStore(self.path)), len(self.documents))
+
+    def test_interrupted_close_leaves_no_store(self):
+        replace = os.replace
+
+        def crash_after_tokens(source, target):
+            replace(source, target)
+            if target.endswith("tokens.u32"):
+                raise KeyboardInterrupt
+
+        with patch("ml_integration.token_store.os.replace", side_effect=crash_after_tokens):
+            with self.assertRaises(KeyboardInterrupt):
+                TokenStore.build(["A new corpus."], self.path)
+        with self.assertRaises(FileNotFoundError):
+            TokenStore(self.path)
+
+    def test_files_must_match_meta(self):
+        with open(os.path.join(self.path, "tokens.u32"), "ab") as f:
+            f.write(b"\0\0\0\0")
+        with self.assertRaises(ValueError):
+            TokenStore(self.path)
+
+
+class TestPassageIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = [
+            "Section 1. This Ordinance may be called the Copyright Ordinance. It extends to the whole of Pakistan. "
+            "Any person who infringes copyright shall be punishable with imprisonment which may extend to three years.",
+            "The Constitution is the supreme law. Article 184(3) confers original jurisdiction on the Supreme Court.",
+        ]
+        self.index = PassageIndex.build(self.documents, window=2, stride=1)
+
+    def test_passage_offsets(self):
+        for passage in split_passages(self.documents, window=2, stride=1):
+            self.assertEqual(self.documents[passage.doc_id][passage.start:passage.end], passage.text)
+
+    def test_context_respects_token_budget(self):
+        passage_ids, _ = self.index.search("copyright punishable imprisonment", top_k=5)
+        context, spans = self.index.build_context(passage_ids, max_tokens=30)
+        self.assertLessEqual(len(context.split()), 30)
+        for span in spans:
+            self.assertEqual(context[span.context_start:span.context_end],
+                             self.documents[span.doc_id][span.start:span.end])
+
+    @staticmethod
+    def fake_pipeline(question, context):
+        start = context.index("three years")
+        return {"answer": "three years", "score": 0.9, "start": start, "end": start + len("three years")}
+
+    def test_answer_maps_to_source(self):
+        result = answer_from_passages("What is the punishment for copyright infringement?", self.index,
+                                      "model", "tokenizer", qa_pipeline=self.fake_pipeline)
+        doc_id, start, end = result["source"]
+        self.assertEqual(self.documents[doc_id][start:end], "three years")
+        self.assertEqual(result["answer"], "three years (Confidence Score: 90.00%)")
+
+    def test_engine_preprocesses_once(self):
+        with patch_engine_pipeline(self.fake_pipeline), \
+                patch("ml_integration.qa_engine.preprocess_question", wraps=preprocess_question) as engine_preprocess, \
+                patch("ml_integration.legal_qa_system.preprocess_question") as passages_preprocess:
+            engine = LegalQAEngine(documents=self.documents, model="model", tokenizer="tokenizer", passages=True)
+            answer = engine.answer("What is the punishment for copyright infringement?")
+        self.assertEqual(answer, "three years (Confidence Score: 90.00%)")
+        self.assertEqual(engine_preprocess.call_count, 1)
+        passages_preprocess.assert_not_called()
+
+    def test_save_and_load(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "passages.npz")
+            self.index.save(path)
+            loaded = PassageIndex.load(path)
+            # np.savez appends .npz to a path without it; save and load agree on the file
+            self.index.save(os.path.join(tmp_dir, "passages"))
+            self.assertEqual(PassageIndex.load(os.path.join(tmp_dir, "passages")).passages, self.index.passages)
+        self.assertEqual(loaded.passages, self.index.passages)
+        self.assertEqual(loaded.retrieve("supreme court jurisdiction"), self.index.retrieve("supreme court jurisdiction"))
+
+
+class TestAnswerCache(unittest.TestCase):
+
+    def test_memory_hits_and_misses(self):
+        cache = AnswerCache("corpus", "model", max_entries=2)
+        self.assertIsNone(cache.get("penalty copyright"))
+        cache.put("penalty copyright", "fines")
+        self.assertEqual(cache.get("penalty copyright"), "fines")
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = AnswerCache("corpus", "model", max_entries=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+
+    def test_ttl(self):
+        cache = AnswerCache("corpus", "model", ttl=0.01)
+        cache.put("a", "1")
+        time.sleep(0.05)
+        self.assertIsNone(cache.get("a"))
+
+    def test_disk_tier_and_invalidation(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "answers.sqlite")
+            corpus_version = corpus_fingerprint(load_sample_documents())
+            cache = AnswerCache(corpus_version, "model", path=path)
+            cache.put("penalty copyright", "fines")
+            cache.close()
+
+            reopened = AnswerCache(corpus_version, "model", path=path)
+            self.assertEqual(reopened.get("penalty copyright"), "fines")
+            self.assertEqual(reopened.disk_hits, 1)
+            reopened.close()
+
+            changed = AnswerCache(corpus_fingerprint(load_sample_documents()[:-1]), "model", path=path)
+            self.assertIsNone(changed.get("penalty copyright"))
+            changed.close()
+
+            # an engine over another corpus sharing the file leaves this corpus's entries alone
+            shared = AnswerCache(corpus_version, "model", path=path)
+            self.assertEqual(shared.get("penalty copyright"), "fines")
+            shared.close()
+
+    def test_disk_eviction(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "answers.sqlite")
+            cache = AnswerCache("corpus", "model", path=path, max_disk_entries=2)
+            cache.put("a", "1")
+            cache.put("b", "2")
+            cache.put("a", "1")
+            cache.put("c", "3")
+            cache.close()
+
+            reopened = AnswerCache("corpus", "model", path=path, max_disk_entries=2, max_entries=0)
+            self.assertEqual([reopened.get(question) for question in "abc"], ["1", None, "3"])
+            reopened.close()
+
+    def test_pipeline_binds_cache(self):
+        documents = load_sample_documents()
+        question = "What is the penalty for copyright infringement?"
+        cache = AnswerCache("another corpus", "another model")
+        cache.put(preprocess_question(question)[0], "stale")
+        with patch("ml_integration.legal_qa_system.pipeline", return_value=fake_qa_pipeline("fines")):
+            answer = legal_qa_system(question, documents, "model", "tokenizer", cache=cache)
+        self.assertEqual(answer, "fines (Confidence Score: 50.00%)")
+        self.assertEqual(cache.corpus_version, corpus_fingerprint(documents))
+
+    def test_settings_are_part_of_the_key(self):
+        cache = AnswerCache("unbound", "unbound")
+        qa_pipeline = fake_qa_pipeline("fines")
+        with patch_engine_pipeline(qa_pipeline):
+            for top_k in (5, 2):
+                with LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer",
+                                   cache=cache, top_k=top_k) as engine:
+                    engine.answer("What is the penalty for copyright infringement?")
+        # the second engine retrieves fewer segments, so it must not be served the first engine's answer
+        self.assertEqual(len(qa_pipeline.contexts), 2)
+        self.assertEqual(cache.stats()["hits"], 0)
+
+    def test_engine_uses_cache(self):
+        cache = AnswerCache("unbound", "unbound")
+        with patch_engine_pipeline(fake_qa_pipeline("fines")):
+            with LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer",
+                               cache=cache) as engine:
+                first = engine.answer("What is the penalty for copyright infringement?")
+                second = engine.answer("What is the penalty for copyright infringement?")
+        self.assertEqual(first, second)
+        self.assertEqual(cache.stats()["hits"], 1)
+        self.assertEqual(cache.corpus_version, corpus_fingerprint(load_sample_documents()))
+
+    def test_engine_batch_uses_cache(self):
+        cache = AnswerCache("unbound", "unbound")
+        qa_pipeline = fake_qa_pipeline("fines")
+        questions = ["What is the penalty for copyright infringement?", "Which ordinance governs copyright?"]
+        with patch_engine_pipeline(qa_pipeline):
+            with LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer",
+                               cache=cache) as engine:
+                first = engine.answer_batch(questions)
+                second = engine.answer_batch([questions[0], ""])
+                third = engine.answer(questions[1])
+        self.assertEqual(second, [first[0], None])
+        self.assertEqual(third, first[1])
+        self.assertEqual(cache.stats()["hits"], 2)
+        # only the first batch reached the model
+        self.assertEqual(len(qa_pipeline.contexts), 1)
+
+
+def hashing_encoder(texts, dim=64):
+    """Deterministic stand-in for a sentence encoder: a bag of hashed words."""
+    embeddings = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        for word in text.lower().split():
+            embeddings[row, zlib.crc32(word.strip(".,?").encode("utf-8")) % dim] += 1.0
+    return embeddings
+
+
+class TestDenseIndex(unittest.TestCase):
+
+    def setUp(self):
+        self.documents = load_sample_documents()
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "embeddings.npy")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_float16_memory_map(self):
+        index = DenseIndex.build(self.documents, hashing_encoder, self.path)
+        loaded = DenseIndex.load(self.path, hashing_encoder)
+        self.assertIsInstance(loaded.embeddings, np.memmap)
+        self.assertEqual(loaded.embeddings.dtype, np.float16)
+        self.assertEqual(loaded.documents, self.documents)
+
+    def test_blocked_search_matches_exhaustive(self):
+        index = DenseIndex.build(self.documents, hashing_encoder, self.path, block_size=2)
+        question = "penalty fines imprisonment"
+        embeddings = np.asarray(index.embeddings, dtype=np.float32)
+        query = hashing_encoder([question])[0]
+        expected = np.argsort(-(embeddings @ (query / np.linalg.norm(query))), kind="stable")[:3]
+        indices, _ = index.search(question, top_k=3)
+        np.testing.assert_array_equal(indices, expected)
+
+    def test_ivf_with_all_lists_probed(self):
+        flat = DenseIndex.build(self.documents, hashing_encoder, self.path)
+        ivf = DenseIndex.build(self.documents, hashing_encoder, os.path.join(self.tmp_dir.name, "ivf.npy"), n_lists=2)
+        question = "copyright ordinance 1962"
+        np.testing.assert_array_equal(ivf.search(question, n_probe=2)[0], flat.search(question)[0])
+
+    def test_hybrid_retrieval(self):
+        dense = DenseIndex.build(self.documents, hashing_encoder, self.path)
+        hybrid = HybridIndex(BM25Index.build(self.documents), dense)
+        segments = retrieve_relevant_segments("penalty fines imprisonment", None, index=hybrid)
+        self.assertEqual(segments[0], "The penalty for copyright infringement may include fines and imprisonment.")
+        self.assertEqual(len(segments), 5)
+
+    def test_hybrid_rejects_updated_sparse_index(self):
+        sparse_index = LegalCorpusIndex.build(self.documents)
+        hybrid = HybridIndex(sparse_index, DenseIndex.build(self.documents, hashing_encoder, self.path))
+        sparse_index.remove_documents([0])
+        for search in (lambda: hybrid.search("penalty"), lambda: hybrid.search_batch(["penalty"])):
+            with self.assertRaises(ValueError):
+                search()
+
+
+class FakeEngine:
+
+    def __init__(self, fail=False, delay=0.0):
+        self.fail = fail
+        self.delay = delay
+        self.batch_sizes = []
+
+    def answer_batch(self, questions):
+        time.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("model failed")
+        self.batch_sizes.append(len(questions))
+        return [f"answer to {question}" for question in questions]
+
+
+class TestQAService(unittest.TestCase):
+
+    def test_concurrent_questions_are_batched(self):
+        engine = FakeEngine()
+
+        async def run():
+            async with QAService(engine, max_batch_size=4, max_wait=0.05) as service:
+                return await asyncio.gather(*(service.answer(f"q{i}") for i in range(10)))
+
+        answers = asyncio.run(run())
+        self.assertEqual(answers, [f"answer to q{i}" for i in range(10)])
+        self.assertEqual(sum(engine.batch_sizes), 10)
+        self.assertLessEqual(max(engine.batch_sizes), 4)
+        self.assertLess(len(engine.batch_sizes), 10)
+
+    def test_errors_reach_every_caller(self):
+        async def run():
+            async with QAService(FakeEngine(fail=True)) as service:
+                return await asyncio.gather(service.answer("q1"), service.answer("q2"), return_exceptions=True)
+
+        results = asyncio.run(run())
+        self.assertTrue(all(isinstance(result, RuntimeError) for result in results))
+
+    def test_backpressure_when_queue_is_full(self):
+        async def run():
+            async with QAService(FakeEngine(delay=0.1), max_batch_size=1, max_wait=0, max_queue_size=1) as service:
+                first = asyncio.ensure_future(service.answer("q1"))
+                await asyncio.sleep(0.02)
+                second = asyncio.ensure_future(service.answer("q2"))
+                await asyncio.sleep(0)
+                with self.assertRaises(asyncio.QueueFull):
+                    await service.answer("q3", wait=False)
+                return await asyncio.gather(first, second)
+
+        self.assertEqual(asyncio.run(run()), ["answer to q1", "answer to q2"])
+
+    def test_with_engine_and_fake_model(self):
+        async def run(engine):
+            async with QAService(engine, max_wait=0.02) as service:
+                return await asyncio.gather(*(service.answer(q) for q in ["What is the penalty?", "Who enacts it?"]))
+
+        with patch_engine_pipeline(fake_qa_pipeline("fines")):
+            engine = LegalQAEngine(documents=load_sample_documents(), model="model", tokenizer="tokenizer")
+            answers = asyncio.run(run(engine))
+        self.assertEqual(answers, ["fines (Confidence Score: 50.00%)"] * 2)
+
+
+class TestLazyImports(unittest.TestCase):
+
+    def test_import_loads_no_models(self):
+        probe = ("import sys, spacy, nltk\n"
+                 "def fail(*args, **kwargs): raise AssertionError('loaded at import time')\n"
+                 "spacy.load = nltk.download = fail\n"
+                 "import ml_integration, text_processing.pos_tagging\n"
+                 "print(sorted(m for m in ('transformers', 'torch') if m in sys.modules))")
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", probe], cwd=root, capture_output=True, text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout.strip(), "[]")
+
+
+def write_pdf(path, pages):
+    # a minimal single-font PDF with one line of text per page
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None, "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for text in pages:
+        stream = f"BT /F1 12 Tf 72 720 Td ({text}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+        kids.append(f"{len(objects)} 0 R")
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>"
+    out, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n".encode("latin-1")
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    out += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(out)
+
+
+class TestIngestion(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.pdf_dir = os.path.join(self.tmp_dir.name, "pdfs")
+        os.makedirs(self.pdf_dir)
+        write_pdf(os.path.join(self.pdf_dir, "gazette_1.pdf"), load_sample_documents()[:3])
+        write_pdf(os.path.join(self.pdf_dir, "gazette_2.pdf"), load_sample_documents()[3:] + ["Page 2of3"])
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def path(self, name):
+        return os.path.join(self.tmp_dir.name, name)
+
+    def test_ingest_and_index(self):
+        written = ingest_pdfs(self.pdf_dir, self.path("corpus.jsonl"))
+        records = list(iter_corpus(self.path("corpus.jsonl")))
+        self.assertEqual(written, 5)
+        self.assertEqual([(r["source"], r["page"]) for r in records][-1], ("gazette_2.pdf", 1))
+        self.assertEqual(records[1]["text"], "penalty copyright infringement include fines and imprisonment")
+        self.assertEqual(records[1]["sentences"], [records[1]["text"].split()])
+        self.assertEqual(records[2]["citations"], [["ordinance copyright 1962", 0]])
+        index = build_index_from_corpus(self.path("corpus.jsonl"))
+        self.assertEqual(index.retrieve("fines imprisonment", top_k=1), [records[1]["text"]])
+        bm25 = build_index_from_corpus(self.path("corpus.jsonl"), retriever="bm25", store_path=self.path("pages"))
+        self.assertEqual(bm25.retrieve("fines imprisonment", top_k=1), [records[1]["text"]])
+        self.assertEqual(len(TokenStore(self.path("pages"))), len(records))
+        citation_index = build_citation_index_from_corpus(self.path("corpus.jsonl"))
+        self.assertEqual(len(citation_index), len(records))
+        self.assertEqual(citation_index.search("Copyright Ordinance of 1962"), [2, 3])
+        store = build_token_store_from_corpus(self.path("corpus.jsonl"), self.path("store"))
+        self.assertEqual(list(store.iter_documents()), [record["sentences"] for record in records])
+
+    def test_resume_after_interruption(self):
+        ingest_pdfs(self.pdf_dir, self.path("expected.jsonl"))
+
+        def failing_reader(path, start_page):
+            for page_number, text in read_pdf_pages(path, start_page):
+                if path.endswith("gazette_2.pdf") and page_number == 1:
+                    raise KeyboardInterrupt
+                yield page_number, text
+
+        checkpoint = self.path("corpus.checkpoint.json")
+        with self.assertRaises(KeyboardInterrupt):
+            ingest_pdfs(self.pdf_dir, self.path("corpus.jsonl"), checkpoint_path=checkpoint, checkpoint_every=1,
+                        page_reader=failing_reader)
+        self.assertEqual(ingest_pdfs(self.pdf_dir, self.path("corpus.jsonl"), checkpoint_path=checkpoint), 1)
+        self.assertEqual(list(iter_corpus(self.path("corpus.jsonl"))), list(iter_corpus(self.path("expected.jsonl"))))
+        self.assertEqual(ingest_pdfs(self.pdf_dir, self.path("corpus.jsonl"), checkpoint_path=checkpoint), 0)
+
+    def test_missing_corpus_restarts_ingestion(self):
+        ingest_pdfs(self.pdf_dir, self.path("expected.jsonl"))
+        checkpoint = self.path("corpus.checkpoint.json")
+        written = ingest_pdfs(self.pdf_dir, self.path("corpus.jsonl"), checkpoint_path=checkpoint)
+        os.remove(self.path("corpus.jsonl"))
+        self.assertEqual(ingest_pdfs(self.pdf_dir, self.path("corpus.jsonl"), checkpoint_path=checkpoint), written)
+        with open(self.path("corpus.jsonl"), "rb") as f:
+            self.assertNotIn(b"\0", f.read())
+        self.assertEqual(list(iter_corpus(self.path("corpus.jsonl"))), list(iter_corpus(self.path("expected.jsonl"))))
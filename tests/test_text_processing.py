@@ -1,13 +1,28 @@
-from text_processing.cleaning import clean_legal_text
-from text_processing.normalization import normalize_legal_text
-from text_processing.pattern_matching import extract_patterns
-from text_processing.pos_tagging import train_legal_pos_tagger
-from text_processing.tokenization import tokenize_legal_text
+from text_processing.abbreviations import AbbreviationExpander
+from text_processing.cleaning import clean_legal_text, clean_legal_texts, CleaningPipeline
+from text_processing.normalization import normalize_legal_text, normalize_legal_texts, LegalTermMatcher, NormalizationCache
+from text_processing.pattern_matching import extract_patterns, pattern_scanner, PatternMatch, PatternScanner
+from text_processing.pos_tagging import train_legal_pos_tagger, tag_documents, get_legal_pos_model
+from text_processing.spelling import SpellingCorrector, get_spelling_corrector
+from text_processing.tokenization import tokenize_legal_text, tokenize_legal_spans, iter_legal_spans
+from utils.helpers import find_citations, protect_citations, restore_citations
 from spacy.training import Example
 
+import numpy as np
 import spacy
 
+import functools
+import os
+import tempfile
 import unittest
+from unittest.mock import patch
+
+def setUpModule():
+    # normalization's shared spelling corrector keeps its index in memory, so the tests store nothing on disk
+    patcher = patch("text_processing.normalization.get_spelling_corrector",
+                    functools.partial(get_spelling_corrector, index_path=None))
+    patcher.start()
+    unittest.addModuleCleanup(patcher.stop)
 
 class TestCleanLegalText(unittest.TestCase):
     
@@ -51,6 +66,43 @@ class TestCleanLegalText(unittest.TestCase):
         expected_output = "Sec.1.2 court finds defendant mr smith violated Sec.3(a)-2 act"
         self.assertEqual(clean_legal_text(text), expected_output)
 
+    def test_clean_legal_texts_keeps_order(self):
+        texts = ["This   is   a   test.", "Hello, World! @2024 & #Python", ""] * 10
+        expected_output = [clean_legal_text(text) for text in texts]
+        self.assertEqual(list(clean_legal_texts(texts, workers=2, chunksize=4)), expected_output)
+        self.assertEqual(list(clean_legal_texts(iter(texts), workers=1)), expected_output)
+
+class TestCleaningPipeline(unittest.TestCase):
+
+    def test_matches_clean_legal_text(self):
+        pipeline = CleaningPipeline()
+        for text in ["This   is   a   test.", "135. Abetment WAPDA of desertion of soldier, sailor [or] [airman.] ",
+                     "Sec.1.2 The court finds that the defendant Mr. Smith violated Sec.3(a)-2 of the Act.", ""]:
+            self.assertEqual(pipeline(text), clean_legal_text(text))
+
+    def test_disabled_stages(self):
+        pipeline = CleaningPipeline(disable=["case", "stopwords", "punctuation"])
+        self.assertEqual(pipeline.clean("This is a test, wapda."), "This is a test, Water and Power Development Authority.")
+
+    def test_unknown_stage(self):
+        with self.assertRaises(ValueError):
+            CleaningPipeline(disable=["spelling"])
+
+class TestAbbreviationExpander(unittest.TestCase):
+
+    def test_matches_sequential_expansion(self):
+        expander = AbbreviationExpander({"a. o.": "Administrative Order", "p/a": "per annum", "max.": "maximum",
+                                         "max": "maximum"})
+        self.assertTrue(expander.single_pass)
+        for text in ["p/a. o.", "max. profit p/a.", "a. o. max or max.", "p/a", "xp/a"]:
+            self.assertEqual(expander.expand(text), expander._expand_sequential(text))
+        self.assertEqual(expander.expand("p/a. o."), "p/Administrative Order")
+
+    def test_falls_back_when_expansion_contains_abbreviation(self):
+        expander = AbbreviationExpander({"PC": "the PM Commission", "PM": "Prime Minister"})
+        self.assertFalse(expander.single_pass)
+        self.assertEqual(expander.expand("PC"), "the Prime Minister Commission")
+
 class TestNormalizeLegalText(unittest.TestCase):
 
     def test_normalize_legal_text_with_legal_terms(self):
@@ -101,6 +153,74 @@ class TestNormalizeLegalText(unittest.TestCase):
         expected_output = ["unknown", "term", "should", "be", "lemmat", "and", "stem"]
         self.assertEqual(normalize_legal_text(tokens), expected_output)
         
+class TestLegalTermMatcher(unittest.TestCase):
+
+    def test_longest_match(self):
+        matcher = LegalTermMatcher({"statute": "law", "statute of limitations": "time limit"})
+        tokens = ["statute", "of", "limitations", "statute", "of"]
+        self.assertEqual(matcher.match(tokens, 0), (3, ["time", "limit"]))
+        self.assertEqual(matcher.match(tokens, 3), (1, ["law"]))
+        self.assertIsNone(matcher.match(tokens, 1))
+
+class TestNormalizeLegalTexts(unittest.TestCase):
+
+    def setUp(self):
+        self.token_lists = [["The", "statute", "of", "limitations", "applies", "Sec. 3(a)-2"],
+                            ["the", "statute", "applies", "the"]]
+
+    @patch("text_processing.normalization.normalize_token", side_effect=str.upper)
+    def test_matches_normalize_legal_text(self, normalize_token):
+        expected = [normalize_legal_text(tokens) for tokens in self.token_lists]
+        normalize_token.reset_mock()
+        self.assertEqual(normalize_legal_texts(self.token_lists), expected)
+        # "The", "the" and "applies" are normalized once each
+        self.assertEqual(normalize_token.call_count, 3)
+
+    @patch.object(NormalizationCache, "_fingerprint", return_value="test")
+    @patch("text_processing.normalization.normalize_token", side_effect=str.upper)
+    def test_cache_persists(self, normalize_token, _):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "normalization_cache.json")
+            expected = normalize_legal_texts(self.token_lists, cache=NormalizationCache(path))
+            normalize_token.reset_mock()
+            cache = NormalizationCache(path)
+            self.assertEqual(len(cache), 3)
+            self.assertEqual(normalize_legal_texts(self.token_lists, cache=cache), expected)
+            normalize_token.assert_not_called()
+
+class TestSpellingCorrector(unittest.TestCase):
+
+    def setUp(self):
+        self.corrector = SpellingCorrector({"the": 100, "then": 10, "court": 5, "abetment": 1})
+
+    def test_corrections(self):
+        self.assertEqual(self.corrector.correct("teh"), "the")
+        self.assertEqual(self.corrector.correct("Cort"), "Court")
+        self.assertEqual(self.corrector.correct("abetment"), "abetment")
+        self.assertEqual(self.corrector.correct("12"), "12")
+        self.assertEqual(self.corrector.correct("xyzzyq"), "xyzzyq")
+
+    def test_index_is_stored_and_reused(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "spelling_index.json")
+            SpellingCorrector({"court": 5}, index_path=path)
+            self.assertTrue(os.path.exists(path))
+            self.assertEqual(SpellingCorrector({"court": 5}, index_path=path).correct("cort"), "court")
+            # a different word list rebuilds the index
+            self.assertEqual(SpellingCorrector({"count": 5}, index_path=path).correct("cort"), "count")
+
+    def test_corrupt_index_is_rebuilt(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "spelling_index.json")
+            SpellingCorrector({"court": 5}, index_path=path)
+            with open(path, "w", encoding="utf-8") as f:
+                f.write('{"fingerprint": "trunc')
+            with self.assertWarns(UserWarning):
+                corrector = SpellingCorrector({"court": 5}, index_path=path)
+            self.assertEqual(corrector.correct("cort"), "court")
+            # the rebuilt index replaced the corrupt file
+            self.assertEqual(SpellingCorrector({"court": 5}, index_path=path).correct("cort"), "court")
+
 class TestPatternExtraction(unittest.TestCase):
 
     def test_case_citations(self):
@@ -133,6 +253,55 @@ class TestPatternExtraction(unittest.TestCase):
         result = extract_patterns(text)
         self.assertEqual(result["repealed_statements"], ["Rep. by the Offences of Zina (Enforcement of Hudood) Ordinance, 1979 (VII of 1979), s. 19 (w.e.f the 10th day of February, 1979)"])
 
+class TestPatternScanner(unittest.TestCase):
+
+    text = ("The Workmen's Breach of Contract (Repealing) Act, 1925 (III of 1925), s. 2 and Sch. Refer to "
+            "123 U.S.C. § 456 and Sec. 4.5, as amended on the 23rd March, 1956 by the Ordinance, 1961.")
+
+    def test_typed_matches_with_offsets(self):
+        matches = list(pattern_scanner.scan(self.text))
+        self.assertEqual([(match.kind, match.text) for match in matches],
+                         [("acts_references", "Act, 1925"), ("statute_references", "123 U.S.C. § 456"),
+                          ("sections", "Sec. 4.5"), ("dates", "23rd March, 1956"),
+                          ("acts_references", "Ordinance, 1961")])
+        for match in matches:
+            self.assertEqual(self.text[match.start:match.end], match.text)
+
+    def test_priority(self):
+        scanner = PatternScanner({"year": r"\d{4}", "act": r"Act, \d{4}"})
+        self.assertEqual(list(scanner.scan("Act, 1925")), [PatternMatch("act", 0, 9, "Act, 1925")])
+        self.assertEqual(list(scanner.scan("1925 Act, 1926")),
+                         [PatternMatch("year", 0, 4, "1925"), PatternMatch("act", 5, 14, "Act, 1926")])
+
+    def test_chunks_match_whole_text(self):
+        text = self.text * 20
+        expected = list(pattern_scanner.scan(text))
+        for size in (1, 7, 50, 1000):
+            with self.subTest(size=size):
+                chunks = (text[i:i + size] for i in range(0, len(text), size))
+                self.assertEqual(list(pattern_scanner.scan_chunks(chunks, overlap=64)), expected)
+
+class TestCitations(unittest.TestCase):
+
+    def test_find_citations(self):
+        text = "Under Article 184(3) and PLD 2020 SC 1 the Hudood Ordinance, 1979 applies."
+        spans = find_citations(text)
+        self.assertEqual([(text[start:end], kind) for start, end, kind in spans],
+                         [("Article 184(3)", "article"), ("PLD 2020 SC 1", "case_law"), ("Ordinance, 1979", "ordinance")])
+
+    def test_named_act(self):
+        # the output of the helper's own citation pattern before the patterns were shared
+        text = "The Contract Act, 1872 Section 5 applies."
+        self.assertEqual([text[start:end] for start, end, _ in find_citations(text)], ["Contract Act, 1872 Section 5"])
+        self.assertEqual(clean_legal_text(text), "Contract Act, 1872 Section 5 applies")
+
+    def test_protect_and_restore(self):
+        text = "Section 1 and Section 12 apply; Sec. 1 again"
+        protected, citations = protect_citations(text)
+        self.assertEqual(protected, "__citation_0__ and __citation_1__ apply; __citation_2__ again")
+        self.assertEqual(citations, ["Section 1", "Section 12", "Sec. 1"])
+        self.assertEqual(restore_citations(protected, citations), text)
+
 class TestTokenizeLegalText(unittest.TestCase):
     
     def test_simple_sentence(self):
@@ -170,6 +339,33 @@ class TestTokenizeLegalText(unittest.TestCase):
         expected_output = [['Sec. 1.2', 'Art. 184(3)', 'the', 'Ordinance 784', 'court', 'also', 'sec. 6.8', 'Sec. 1.2', 'finds', 'Art. 9', 'hiding', 'act 67', '.'], ['Sec.3.5', 'Sec.6(8)-d', 'defendant', '114 Stat. 899', 'mr', 'smith', 'violated', 'Sec. 3(a)-2', 'act', '.'], ['Art. 184(3)', 'on', 'Pg. 45', 'also', 'Sec. 4.66', 'constitution', 'PPC 4444', 'important', '.'], ['Sec. 4', 'and', 'Pakistan Penal Code 1860', 'implies', 'that', 'Companies Ordinance 1984', 'often', 'referenced', 'refers', 'to', 'PLD 2020 SC 1', 'case', 'law', 'Rule 5(10)', '.'], ['SRO 123(I)/2020', 'is', 'also', 'relevant', '.'], ['18th Amendment', 'brought', 'significant', 'changes', '.'], ['Presidential Order No. 1 of 1977', 'issued', '3rd Amendment', 'also', 'cool', 'refer', 'Notification No. 1234-G/2020', 'Anti-Terrorism Act 1997', 'Review Petition No. 567/2020', 'filed', 'check', '2019', 'clc', '123', 'relevant', 'high', 'court', 'cases', 'Income Tax Ordinance 2001', 'also', 'cited', '144 Stat. 789', 'also', 'states', 'thing', 'AIR 1990 SC 123', 'important', 'precedent', 'Constitution Petition No. 45/2021', '.'], ['ECP Order No. 123/2019', 'notable', 'Companies Ord 1984', 'also', 'checkeddefinition', 'queen', 'omitted', 'A.O., 1961', 'Art. 2', 'and', 'school', '(w.e.f. the 23rd March, 1956)', 'case', 'smith', 'volume', 'jones', '123', 'f2d', '456', '2022', 'court', 'interpreted', 'Section 123(a)', 'act', 'hearing', 'date', 'set', 'aug', '15', '2024', 'adultery', 'report', 'offences', 'zina', 'enforcement', 'hudood', 'Ordinance, 1979 (VII of 1979), s. 19', '(w.e.f the 10th day of February, 1979)', 'workmens', 'breach', 'contract', 'repealing', 'Act, 1925 (III of 1925), s. 2', 'school']]
         self.assertEqual(tokenize_legal_text(text), expected_output)
 
+    def test_citation_next_to_other_text(self):
+        text = "Under (Sec. 5 of the Act, 1925 (III of 1925), s. 2 and Sec. 4. it applies."
+        expected_output = [["Under", "(", "Sec. 5", "of", "the", "Act, 1925 (III of 1925), s. 2", "and", "Sec. 4.", "it",
+                            "applies", "."]]
+        self.assertEqual(tokenize_legal_text(text), expected_output)
+
+class TestTokenizeLegalSpans(unittest.TestCase):
+
+    text = "The court relied on Art. 184(3) and PLD 2020 SC 1. The fine is Rs 100. "
+
+    def test_offsets_into_text(self):
+        spans = tokenize_legal_spans(self.text)
+        self.assertEqual(spans.tokens.dtype, np.int32)
+        self.assertEqual(spans.sentences.tolist(), [[0, 50], [51, 70], [71, 71]])
+        self.assertEqual(spans.sentence_tokens.tolist(), [0, 8, 14, 14])
+        self.assertEqual(spans.tokens[4].tolist(), [20, 31])
+        self.assertEqual(spans.token(4), "Art. 184(3)")
+        self.assertEqual(spans.sentence(1), ["The", "fine", "is", "Rs", "100", "."])
+
+    def test_views_match_tokenize_legal_text(self):
+        expected = tokenize_legal_text(self.text)
+        self.assertEqual(tokenize_legal_spans(self.text).to_lists(), expected)
+        sentences = [[self.text[start:end] for start, end in tokens.tolist()]
+                     for _, tokens in iter_legal_spans(self.text)]
+        self.assertEqual(sentences, expected)
+        self.assertEqual(tokenize_legal_spans("").to_lists(), [[]])
+
 
 # Load the SpaCy model and add the custom component
 nlp = spacy.load("en_core_web_sm")
@@ -221,6 +417,19 @@ class TestLegalPOSTagger(unittest.TestCase):
         doc = nlp(text)
         self.assertEqual(len(doc), 0, "The document should be empty for an empty input text")
 
+    def test_tag_documents(self):
+        """Test that batched tagging with the pruned pipeline tags like the full pipeline, one document at a time"""
+        texts = ["The Court finds that the Defendant violated Section 123 of the Act.", "", "The fox jumps."]
+        docs = list(tag_documents(texts, batch_size=2))
+        self.assertNotIn("parser", get_legal_pos_model(("tok2vec", "tagger", "attribute_ruler", "ner")).pipe_names)
+        full = get_legal_pos_model()
+        for text, doc in zip(texts, docs):
+            expected = full(text)
+            self.assertEqual([token.tag_ for token in doc], [token.tag_ for token in expected])
+            self.assertEqual([token.pos_ for token in doc], [token.pos_ for token in expected])
+            self.assertEqual([(ent.text, ent.label_) for ent in doc.ents], [(ent.text, ent.label_) for ent in expected.ents])
+        self.assertEqual(docs[0][1].tag_, "LEGAL_TERM")
+
     def test_train_legal_pos_tagger(self):
         """Test the training function to ensure it runs without errors"""
         train_data = [
@@ -1,3 +1,6 @@
+import os
+import subprocess
+import sys
 import unittest
 from urdu_processing.unicode_handler import process_urdu_text, is_rtl, urdu_to_latin, latin_to_urdu
 
@@ -45,3 +48,9 @@ class TestUrduTextProcessing(unittest.TestCase):
         expected_urdu = "حکومت خود مختار ہے"
         self.assertEqual(latin_to_urdu(latin_text), expected_urdu)
 
+    def test_import_is_silent(self):
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        result = subprocess.run([sys.executable, "-c", "import urdu_processing"], cwd=root, capture_output=True,
+                                text=True)
+        self.assertEqual(result.returncode, 0, result.stderr)
+        self.assertEqual(result.stdout, "")
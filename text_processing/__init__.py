@@ -9,18 +9,24 @@ Modules:
 
 Functions:
 - clean_legal_text: Function to clean legal text.
+- clean_legal_texts: Function to clean many legal texts in parallel.
+- CleaningPipeline: Class to clean legal text with configurable stages.
 - normalize_legal_text: Function to normalize legal text.
+- normalize_legal_texts: Function to normalize a batch of legal texts, each distinct token once.
 - tokenize_legal_text: Function to tokenize legal text.
+- tokenize_legal_spans: Function to tokenize legal text into NumPy arrays of character offsets.
+- iter_legal_spans: Function to tokenize legal text into character offsets one sentence at a time.
 - extract_patterns: Function to extract predefined legal patterns from legal text.
+- PatternScanner: Class to find legal patterns of all categories in one pass, optionally over streamed chunks.
 Version:
 1.0.0
 """
 
-from .cleaning import clean_legal_text
-from .normalization import normalize_legal_text
-from .tokenization import tokenize_legal_text
-from .pattern_matching import extract_patterns
+from .cleaning import clean_legal_text, clean_legal_texts, CleaningPipeline
+from .normalization import normalize_legal_text, normalize_legal_texts, NormalizationCache
+from .tokenization import tokenize_legal_text, tokenize_legal_spans, iter_legal_spans, TokenSpans
+from .pattern_matching import extract_patterns, PatternScanner
 
-__all__ = ["clean_legal_text", "normalize_legal_text", "tokenize_legal_text","extract_patterns"]
+__all__ = ["clean_legal_text", "clean_legal_texts", "CleaningPipeline", "normalize_legal_text", "normalize_legal_texts", "NormalizationCache", "tokenize_legal_text", "tokenize_legal_spans", "iter_legal_spans", "TokenSpans", "extract_patterns", "PatternScanner"]
 
 __version__ = "1.0.0"
@@ -0,0 +1,166 @@
+import re
+
+# an abbreviation must follow a non-word character (or the start of the text) and end before whitespace, the end of
+# the text, or punctuation that is not followed by a word character
+PRECEDING = r"(\W|^)"
+FOLLOWING = r"(?=\s|\Z|\W(?!\w))"
+
+
+def abbreviation_pattern(abbreviation):
+    """
+    Builds the regex clean_legal_text has always used to find one abbreviation.
+
+    Args:
+        abbreviation (str): The abbreviation.
+
+    Returns:
+        str: The regex; group 1 is the preceding character.
+    """
+    return PRECEDING + re.escape(abbreviation) + FOLLOWING
+
+
+class AbbreviationExpander:
+    """
+    Expands every abbreviation of a dictionary in one left-to-right pass over the text.
+
+    The abbreviations are compiled once into a single regex whose alternation is a character trie, so the work per
+    position is bounded by the length of the longest abbreviation instead of growing with the size of the dictionary.
+
+    The output is identical to running one re.sub per abbreviation in dictionary order, where an earlier entry can
+    consume text a later, overlapping entry would have matched (for example "a. o." inside "p/a. o."). Such entries
+    get a negative lookahead that reproduces the loop's precedence. The equivalence is verified when the expander is
+    built; if it does not hold, for example because an expansion contains another abbreviation, the expander falls
+    back to the per-abbreviation loop.
+    """
+
+    def __init__(self, abbreviations):
+        """
+        Args:
+            abbreviations (dict): Maps each abbreviation to its expansion; earlier entries take precedence.
+        """
+        self.abbreviations = dict(abbreviations)
+        self._priority = {abbreviation: i for i, abbreviation in enumerate(self.abbreviations)}
+        self._sequential = [(abbreviation, re.compile(abbreviation_pattern(abbreviation)), r"\1" + expansion)
+                            for abbreviation, expansion in self.abbreviations.items()]
+        self._by_prefix = {}
+        for abbreviation in self.abbreviations:
+            for end in range(1, len(abbreviation) + 1):
+                self._by_prefix.setdefault(abbreviation[:end], []).append(abbreviation)
+        self._guards = self._precedence_guards()
+        self.pattern = None
+        self.single_pass = False
+        if self.abbreviations and self._guards is not None:
+            trie = {}
+            for abbreviation in self.abbreviations:
+                node = trie
+                for char in abbreviation:
+                    node = node.setdefault(char, {})
+                node[""] = abbreviation
+            self._trie_order = []
+            self.pattern = re.compile(PRECEDING + "(" + self._alternation(trie) + ")" + FOLLOWING)
+            self.single_pass = self._single_pass_is_exact()
+
+    def _overlaps(self):
+        # yields (a, b, start) for every b that can start inside a, at a position after a non-word character
+        for a in self.abbreviations:
+            for start in range(1, len(a)):
+                if re.match(r"\W", a[start - 1]) is None:
+                    continue
+                rest = a[start:]
+                for b in self._by_prefix.get(rest, []):
+                    yield a, b, start
+                for end in range(1, len(rest)):
+                    if rest[:end] in self.abbreviations:
+                        yield a, rest[:end], start
+
+    def _precedence_guards(self):
+        # for every abbreviation a, the texts after a's end that mean an earlier entry b, starting inside a, matches
+        guards = {}
+        for a, b, start in self._overlaps():
+            if self._priority[b] >= self._priority[a]:
+                continue
+            if len(b) >= len(a) - start:
+                guards.setdefault(a, []).append(re.escape(b[len(a) - start:]) + FOLLOWING)
+            else:
+                # b ends inside a, so whether it matches depends on a's own characters, and rarely on the character
+                # after a; the latter case is left to the loop
+                inside = [re.match(re.escape(b) + FOLLOWING, a[start:] + after) is not None for after in "x "]
+                if inside[0] != inside[1]:
+                    return None
+                if inside[0]:
+                    guards.setdefault(a, []).append("")
+        return guards
+
+    def _alternation(self, node):
+        # options are tried in order of the best (lowest) dictionary position they lead to
+        options = []
+        for char, child in node.items():
+            if char == "":
+                options.append((self._priority[child], "", child))
+            else:
+                options.append((self._min_priority(child), char, child))
+        options.sort(key=lambda option: option[0])
+        parts = []
+        for _, char, child in options:
+            if char == "":
+                self._trie_order.append(child)
+                guards = self._guards.get(child)
+                parts.append("(?!" + "|".join(guards) + ")" if guards else "")
+            else:
+                parts.append(re.escape(char) + self._alternation(child))
+        if len(parts) == 1:
+            return parts[0]
+        return "(?:" + "|".join(parts) + ")"
+
+    def _min_priority(self, node):
+        return min(self._priority[value] if char == "" else self._min_priority(value) for char, value in node.items())
+
+    def _single_pass_is_exact(self):
+        # an expansion that contains an abbreviation would be expanded again by a later re.sub, and re.sub reads
+        # backslashes in an expansion as escapes
+        for expansion in self.abbreviations.values():
+            if "\\" in expansion:
+                return False
+            for abbreviation, pattern, _ in self._sequential:
+                if abbreviation in expansion and pattern.search(expansion):
+                    return False
+        # when one abbreviation is a prefix of another, both start at the same position and the trie must try them
+        # in dictionary order
+        trie_rank = {abbreviation: rank for rank, abbreviation in enumerate(self._trie_order)}
+        for a in self.abbreviations:
+            for b in self._by_prefix[a]:
+                if a != b and (self._priority[a] < self._priority[b]) != (trie_rank[a] < trie_rank[b]):
+                    return False
+        # every overlap of two abbreviations must come out the same both ways
+        for a, b, start in self._overlaps():
+            if a == b:
+                continue
+            merged = a[:start] + b if len(b) > len(a) - start else a
+            for text in (merged, merged + " ", merged + ". ", merged + ".x"):
+                if self._expand_sequential(text) != self.pattern.sub(self._replace, text):
+                    return False
+        return True
+
+    def _expand_sequential(self, text):
+        for abbreviation, pattern, replacement in self._sequential:
+            # the substring test is much cheaper than the regex and rules most abbreviations out
+            if abbreviation in text:
+                text = pattern.sub(replacement, text)
+        return text
+
+    def _replace(self, match):
+        return match.group(1) + self.abbreviations[match.group(2)]
+
+    def expand(self, text):
+        """
+        Replaces every abbreviation in the text with its expansion.
+
+        Args:
+            text (str): The text.
+
+        Returns:
+            str: The text with abbreviations expanded.
+        """
+        if self.single_pass:
+            return self.pattern.sub(self._replace, text)
+        return self._expand_sequential(text)
@@ -1,7 +1,9 @@
 import json
+import multiprocessing
 import re
 import os
-from utils.helpers import get_citation_pattern
+from utils.helpers import protect_citations, restore_citations
+from .abbreviations import AbbreviationExpander
 
 # load custom legal stopwords and abbreviations
 current_dir = os.path.dirname(__file__)
@@ -10,6 +12,124 @@ with open(os.path.join(current_dir, "../data/legal_abbreviations.json"), "r") as
 with open(os.path.join(current_dir, "../data/legal_stopwords.json"), "r") as f:
     legal_stopwords = json.load(f)
 
+# compiled once: expands every abbreviation in a single pass instead of one re.sub per dictionary entry
+abbreviation_expander = AbbreviationExpander(legal_abbreviations)
+
+PAGE_NUMBER_PATTERN = re.compile(r"[pP][aA][gG][eE]\s*\d+[oO][fF]\d+")
+NUMBERING_PATTERN = re.compile(r"\d+\.\s*")
+PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+# both remove what they match and neither can create a match for the other, so one pass does the work of two
+NUMBERING_AND_PUNCTUATION_PATTERN = re.compile(r"\d+\.\s*|[^\w\s]")
+UNDERSCORE_PATTERN = re.compile(r"\b_\b")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+class CleaningPipeline:
+    """
+    The clean_legal_text transformations with their regexes compiled and their tables loaded once.
+
+    The word-level stages (case normalization and stopword removal) share a single split of the text, and stopwords
+    are looked up in a frozenset. Any stage can be turned off by name:
+
+    - "page_numbers": removes page number text such as "Page 3of10".
+    - "citations": keeps citations intact through the other stages.
+    - "case": lower-cases every word that is not an abbreviation.
+    - "stopwords": removes stopwords.
+    - "abbreviations": expands abbreviations.
+    - "numbering": removes leading numbers and periods.
+    - "punctuation": removes punctuation.
+    - "underscores": removes lone underscores.
+    - "whitespace": normalizes whitespace.
+    """
+
+    STAGES = ("page_numbers", "citations", "case", "stopwords", "abbreviations", "numbering", "punctuation",
+              "underscores", "whitespace")
+
+    def __init__(self, abbreviations=None, stopwords=None, disable=()):
+        """
+        Args:
+            abbreviations (dict, optional): Maps abbreviations to expansions. Defaults to the legal abbreviations.
+            stopwords (iterable of str, optional): The stopwords. Defaults to the legal stopwords.
+            disable (iterable of str): The names of the stages to skip.
+        """
+        if abbreviations is None:
+            abbreviations = legal_abbreviations
+        if stopwords is None:
+            stopwords = legal_stopwords
+        if not isinstance(abbreviations, dict):
+            raise TypeError("abbreviations must be a dictionary")
+        unknown = set(disable) - set(self.STAGES)
+        if unknown:
+            raise ValueError(f"Unknown cleaning stages {sorted(unknown)}, expected some of {list(self.STAGES)}")
+        self.stages = [stage for stage in self.STAGES if stage not in set(disable)]
+        self.abbreviations = abbreviations
+        self.stopwords = frozenset(stopwords)
+        self.abbreviation_expander = (abbreviation_expander if abbreviations is legal_abbreviations
+                                      else AbbreviationExpander(abbreviations))
+        if "numbering" in self.stages and "punctuation" in self.stages:
+            self.removal_pattern = NUMBERING_AND_PUNCTUATION_PATTERN
+        elif "numbering" in self.stages:
+            self.removal_pattern = NUMBERING_PATTERN
+        elif "punctuation" in self.stages:
+            self.removal_pattern = PUNCTUATION_PATTERN
+        else:
+            self.removal_pattern = None
+
+    def clean(self, text):
+        """
+        Cleans a legal text with the enabled stages.
+
+        Args:
+            text (str): The legal text to be cleaned.
+
+        Returns:
+            str: The cleaned text.
+        """
+        if not isinstance(text, str):
+            raise TypeError("text must be a string")
+        if not text:
+            return ""
+        stages = self.stages
+
+        if "page_numbers" in stages:
+            text = PAGE_NUMBER_PATTERN.sub("", text)
+
+        citations = []
+        if "citations" in stages:
+            text, citations = protect_citations(text)
+
+        if "case" in stages or "stopwords" in stages:
+            text = " ".join(self._clean_words(text.split()))
+
+        if "abbreviations" in stages:
+            text = self.abbreviation_expander.expand(text)
+
+        if self.removal_pattern is not None:
+            text = self.removal_pattern.sub("", text)
+
+        text = restore_citations(text, citations)
+
+        if "underscores" in stages:
+            text = UNDERSCORE_PATTERN.sub("", text)
+
+        if "whitespace" in stages:
+            text = WHITESPACE_PATTERN.sub(" ", text).strip()
+
+        return text
+
+    def _clean_words(self, words):
+        abbreviations, stopwords = self.abbreviations, self.stopwords
+        if "case" in self.stages:
+            words = (word if word in abbreviations else word.lower() for word in words)
+        if "stopwords" in self.stages:
+            words = (word for word in words if word not in stopwords)
+        return words
+
+    def __call__(self, text):
+        return self.clean(text)
+
+# the pipeline clean_legal_text runs, with every stage enabled
+default_pipeline = CleaningPipeline()
+
 def clean_legal_text(text):
     """
     Cleans and normalizes legal text by performing several transformations:
@@ -28,61 +148,32 @@ def clean_legal_text(text):
     Returns:
         str: The cleaned and normalized legal text.
     """
+    return default_pipeline.clean(text)
 
-    # ensure text is a string 
-    if not isinstance(text, str):
-        raise TypeError("text must be a string")
-    # return empty string if text is empty
-    if not text:
-        return ""
-    # ensure legal_abbreviations is a dictionary
-    if not isinstance(legal_abbreviations, dict):
-        raise TypeError("legal_abbreviations must be a dictionary")
-    # ensure legal_stopwords is a list
-    if not isinstance(legal_stopwords, list):
-        raise TypeError("legal_stopwords must be a set")
-
-    # removing page number text
-    text = re.sub(r"[pP][aA][gG][eE]\s*\d+[oO][fF]\d+", "", text) # comment out if page numbers are needed
-
-    # identifying and replacing citations with placeholders
-    citation_pattern = get_citation_pattern()
-    citations = citation_pattern.findall(text)
-    citations = ["".join(citation) for citation in citations]
-    # print("\nCITATIONS:\t" + str((citations)))
-    # print("\nCITATIONS LEN:\t" + str(len((citations))))
-    placeholders = {f"__citation_{i}__": citation for i, citation in enumerate(citations)}
-    for placeholder, citation in placeholders.items():
-        text = text.replace(citation, placeholder)
-    
-    # normalizing case and preserve specific terms
-    text = " ".join([word if word in legal_abbreviations else word.lower() for word in text.split()])
-
-    # removing stopwords
-    words = [word for word in text.split() if word not in legal_stopwords]
-    text = " ".join(words)  
-
-    # expanding the abbreviations 
-    for abbr, expansion in legal_abbreviations.items():
-        escaped_abbr = re.escape(abbr)
-        pattern = r"(\W|^)" + escaped_abbr + r"(?=\s|\Z|\W(?!\w))"
-        replacement = r"\1" + expansion
-        text = re.sub(pattern, replacement, text)
-        
-    # removing leading numbers and periods
-    text = re.sub(r"\d+\.\s*", "", text)
-
-    # removing punctuation
-    text = re.sub(r"[^\w\s]", "", text)
+def clean_legal_texts(texts, workers=None, chunksize=64):
+    """
+    Cleans many legal texts with clean_legal_text, spreading the work over a pool of worker processes.
 
-    # preserving the citations by replacing the placeholders
-    for placeholder, citation in placeholders.items():
-        text = text.replace(placeholder, citation)
+    Results are yielded in input order as soon as they are ready, so a caller can start using the first texts while
+    later ones are still being cleaned. Each worker imports this module once, so the abbreviation and stopword tables
+    are loaded once per worker rather than once per text.
 
-    # remove underscores
-    text = re.sub(r"\b_\b", "", text)
+    Args:
+        texts (iterable of str): The legal texts to be cleaned.
+        workers (int, optional): The number of worker processes. Defaults to the number of CPUs; 1 cleans in the
+            calling process.
+        chunksize (int): The number of texts sent to a worker at a time.
 
-    # normalizing whitespace
-    text = re.sub(r"\s+", " ", text).strip()
+    Returns:
+        iterator of str: The cleaned texts, in input order.
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # a pool costs more to start than a handful of texts cost to clean
+    if workers <= 1 or (hasattr(texts, "__len__") and len(texts) <= chunksize):
+        return map(clean_legal_text, texts)
+    return _clean_in_pool(texts, workers, chunksize)
 
-    return text
+def _clean_in_pool(texts, workers, chunksize):
+    with multiprocessing.Pool(workers) as pool:
+        yield from pool.imap(clean_legal_text, texts, chunksize)
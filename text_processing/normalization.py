@@ -1,21 +1,131 @@
-from nltk.stem import WordNetLemmatizer
-from nltk.stem.porter import PorterStemmer
-from textblob import TextBlob
 from utils import get_citation_pattern
+from utils.resources import ensure_nltk_data, get_resource
+from .spelling import get_spelling_corrector
 import json
 import os
 
-lemmatizer = WordNetLemmatizer()
-stemmer = PorterStemmer()
+def get_lemmatizer():
+    def load():
+        from nltk.stem import WordNetLemmatizer
+
+        ensure_nltk_data('wordnet')
+        return WordNetLemmatizer()
+
+    return get_resource(('nltk', 'WordNetLemmatizer'), load)
+
+def get_stemmer():
+    def load():
+        from nltk.stem.porter import PorterStemmer
+
+        return PorterStemmer()
+
+    return get_resource(('nltk', 'PorterStemmer'), load)
+
 current_dir = os.path.dirname(__file__)
 with open(os.path.join(current_dir, '../data/legal_terms.json'), 'r') as f:
     legal_terms = json.load(f)
 
+class LegalTermMatcher:
+    """
+    Finds legal terms in a token list with a trie keyed by token, so each position costs at most the length of the
+    longest term rather than a comparison against every term.
+    """
+
+    # marks the node where a term ends; tokens are strings, so None never collides with one
+    END = None
+
+    def __init__(self, terms):
+        """
+        Args:
+            terms (dict): Maps each term (space-separated tokens) to its replacement.
+        """
+        self.root = {}
+        for term, replacement in terms.items():
+            node = self.root
+            for token in term.split():
+                node = node.setdefault(token, {})
+            # the first of two terms with the same tokens wins, as it did when terms were compared in order
+            node.setdefault(self.END, replacement.split())
+
+    def match(self, tokens, start):
+        """
+        Finds the longest term starting at a position.
+
+        Args:
+            tokens (list of str): The tokens.
+            start (int): The position.
+
+        Returns:
+            tuple: (length, replacement tokens) of the longest matching term, or None when no term matches.
+        """
+        node = self.root
+        longest = None
+        for i in range(start, len(tokens)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            if self.END in node:
+                longest = (i - start + 1, node[self.END])
+        return longest
+
+legal_term_matcher = LegalTermMatcher(legal_terms)
+
+def normalize_token(token):
+    """
+    Corrects the spelling of a token, then lemmatizes and stems it. The result depends on the token alone.
+
+    Args:
+        token (str): The token.
+
+    Returns:
+        str: The normalized token.
+    """
+    corrected_token = get_spelling_corrector().correct(token)
+    lemma = get_lemmatizer().lemmatize(corrected_token.lower())
+    return get_stemmer().stem(lemma)
+
+def _match_legal_terms(tokens, citation_pattern):
+    # replaces citations with placeholders and legal terms with their replacements; the positions of the other
+    # tokens are returned as pending, still holding the raw token, for the caller to normalize
+    placeholders = {}
+    normalized_tokens = []
+    citation_index = 0
+    for token in tokens:
+        if citation_pattern.match(token):
+            placeholder = f"__CITATION_{citation_index}__"
+            placeholders[placeholder] = token
+            normalized_tokens.append(placeholder)
+            citation_index += 1
+        else:
+            normalized_tokens.append(token)
+
+    i = 0
+    final_tokens = []
+    pending = []
+    while i < len(normalized_tokens):
+        token = normalized_tokens[i]
+        if token in placeholders:
+            final_tokens.append(token)
+            i += 1
+            continue
+
+        match = legal_term_matcher.match(normalized_tokens, i)
+        if match is not None:
+            length, replacement_tokens = match
+            final_tokens.extend(replacement_tokens)
+            i += length
+        else:
+            pending.append(len(final_tokens))
+            final_tokens.append(token)
+            i += 1
+
+    return final_tokens, pending, placeholders
+
 def normalize_legal_text(tokens):
     """
     Normalizes legal text tokens by performing several transformations:
     
-    1. Matches and replaces custom legal terms.
+    1. Matches and replaces custom legal terms, preferring the longest term at each position.
     2. Corrects spelling of tokens.
     3. Lemmatizes tokens.
     4. Stems tokens.
@@ -36,53 +146,110 @@ def normalize_legal_text(tokens):
     if not isinstance(legal_terms, dict):
         raise TypeError("legal_terms must be a dictionary")
     
-    citation_pattern = get_citation_pattern()
-    placeholders = {}
-    normalized_tokens = []
-    i = 0
-    citation_index = 0
-    final_tokens = []
+    final_tokens, pending, placeholders = _match_legal_terms(tokens, get_citation_pattern())
+    for position in pending:
+        final_tokens[position] = normalize_token(final_tokens[position])
 
-    while i < len(tokens):
-        token = tokens[i]
-        if citation_pattern.match(token):
-            placeholder = f"__CITATION_{citation_index}__"
-            placeholders[placeholder] = token
-            normalized_tokens.append(placeholder)
-            citation_index += 1
-        else:
-            normalized_tokens.append(token)
-        i += 1
+    final_tokens = [placeholders.get(token, token) for token in final_tokens]
 
-    i = 0
-    final_tokens = []
-    while i < len(normalized_tokens):
-        token = normalized_tokens[i]
-        if token in placeholders:
-            final_tokens.append(token)
-            i += 1
-            continue
+    return final_tokens
 
-        matched = False
-        for term in legal_terms:
-            term_tokens = term.split()
-            if normalized_tokens[i:i+len(term_tokens)] == term_tokens:
-                replacement_tokens = legal_terms[term.lower()].split()
-                final_tokens.extend(replacement_tokens)
-                i += len(term_tokens)
-                matched = True
-                break
+class NormalizationCache:
+    """
+    A token -> normalized token table that persists across runs as a JSON file.
 
-        if not matched:
-            corrected_token = str(TextBlob(token).correct())
-            lemma = lemmatizer.lemmatize(corrected_token.lower())
-            stem = stemmer.stem(lemma)
-            final_tokens.append(stem)
-            i += 1
+    The file records the spelling dictionary and NLTK version it was built with and is ignored when either changes,
+    since both decide what a token normalizes to.
+    """
 
-    final_tokens = [placeholders.get(token, token) for token in final_tokens]
+    def __init__(self, path=None):
+        """
+        Args:
+            path (str, optional): The cache file. The cache lives in memory only when None.
+        """
+        self.path = path
+        self.tokens = {}
+        self._dirty = False
+        self.fingerprint = self._fingerprint()
+        if path is not None and os.path.exists(path):
+            with open(path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get('fingerprint') == self.fingerprint:
+                self.tokens = stored['tokens']
 
-    return final_tokens
+    @staticmethod
+    def _fingerprint():
+        import nltk
+
+        return f"{get_spelling_corrector().fingerprint()}-nltk{nltk.__version__}"
+
+    def __len__(self):
+        return len(self.tokens)
+
+    def update(self, normalized):
+        """
+        Adds normalized tokens to the cache.
+
+        Args:
+            normalized (dict): Maps tokens to their normalized form.
+        """
+        if normalized:
+            self.tokens.update(normalized)
+            self._dirty = True
+
+    def save(self):
+        """
+        Writes the cache file if anything was added since it was loaded.
+        """
+        if self.path is None or not self._dirty:
+            return
+        # write then rename, so an interruption never leaves a half-written cache
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': self.fingerprint, 'tokens': self.tokens}, f, ensure_ascii=False)
+        os.replace(self.path + '.tmp', self.path)
+        self._dirty = False
+
+def normalize_legal_texts(token_lists, cache=None):
+    """
+    Normalizes a batch of tokenized documents like normalize_legal_text, normalizing each distinct token only once.
+
+    Legal terms and citations are matched per document, since they depend on the neighbouring tokens. The remaining
+    tokens of the whole batch are deduplicated with NumPy, each distinct token not already in the cache is normalized
+    once, and the results are mapped back to every occurrence. The cost of spelling correction, lemmatization and
+    stemming therefore grows with the vocabulary of the batch rather than its length.
+
+    Args:
+        token_lists (list of list of str): The tokens of each document.
+        cache (NormalizationCache, optional): Normalized tokens kept across calls and runs. It is updated and saved
+            when given.
+
+    Returns:
+        list of list of str: The normalized tokens of each document.
+    """
+    import numpy as np
+
+    if not isinstance(token_lists, list) or not all(isinstance(tokens, list) for tokens in token_lists):
+        raise TypeError("token_lists must be a list of lists")
+
+    citation_pattern = get_citation_pattern()
+    documents = [_match_legal_terms(tokens, citation_pattern) for tokens in token_lists]
+    pending_tokens = [final_tokens[position] for final_tokens, pending, _ in documents for position in pending]
+
+    if pending_tokens:
+        vocabulary, inverse = np.unique(np.array(pending_tokens, dtype=object), return_inverse=True)
+        known = cache.tokens if cache is not None else {}
+        new = {str(token): normalize_token(str(token)) for token in vocabulary if token not in known}
+        if cache is not None:
+            cache.update(new)
+            cache.save()
+        normalized_vocabulary = [new[token] if token in new else known[token] for token in vocabulary]
+        normalized = iter(inverse.tolist())
+        for final_tokens, pending, _ in documents:
+            for position in pending:
+                final_tokens[position] = normalized_vocabulary[next(normalized)]
+
+    return [[placeholders.get(token, token) for token in final_tokens]
+            for final_tokens, _, placeholders in documents]
 
 # tokens = ["Sec. 1.2", "court", "finds", "Sec.3.5", "defendant", "mr", "smith", "violated", "Sec. 3(a)-2", "Act", "according", "Ordinance 1444", "far", "more", "crimes", "than", "Sec. 3(a)-12", "acts"]
 # print("\nInput:\t" + str(tokens) + "\nOutput:\t" + str(normalize_legal_text(tokens)))
@@ -1,18 +1,115 @@
 import re
+from collections import namedtuple
+
+PATTERNS = {
+    "case_citations": r"\b[A-Za-z]+ v\. [A-Za-z]+, \d+ [A-Z]\.[A-Za-z]* \d+ \(\d{4}\)\b",
+    "statute_references": r"\d+ U\.S\.C\. § \d+[a-z]?",
+    "dates": r"\b(?:w\.e\.f\. )?\d*(?:st|nd|rd|th)? (?:day of )?(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?),?\s*\d*(?:st|nd|rd|th)?\,?\s*\d{4}\b",
+    "acts_references": r"\b(?:Act|Ordinance),? \d{4}\b",
+    "sections": r"\[sS]ect?i?o?n?\.?\s*\d*\([\da-zA-Z]\)-?[\da-zA-Z]*|[sS]ect?i?o?n?\.?\s*\d+\.*\d*\b",
+    "repealed_statements": r"\bRep\. by the [A-Za-z0-9() ]+ Ordinance, \d{4} \([A-Z]+ of \d{4}\), s\. \d+ \((?:w\.e\.f\. )?\d{1,2}(?:st|nd|rd|th)? (?:day of )?(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?),? \d{4}\)\b",
+}
+COMPILED_PATTERNS = {key: re.compile(pattern) for key, pattern in PATTERNS.items()}
+
+# where two categories match at the same position the scanner keeps the first in this order, so a repeal statement
+# is reported whole rather than as the date and ordinance inside it
+SCAN_PRIORITY = ["repealed_statements", "case_citations", "statute_references", "dates", "acts_references", "sections"]
+
+# text a streaming scan keeps from one chunk to the next; a match longer than this may be cut at a chunk boundary
+DEFAULT_OVERLAP = 4096
+
+# one match of a PatternScanner; start and end are offsets in the whole text, also when it is streamed in chunks
+PatternMatch = namedtuple("PatternMatch", ["kind", "start", "end", "text"])
+
 
 def extract_patterns(text):
-    patterns = {
-        "case_citations": r"\b[A-Za-z]+ v\. [A-Za-z]+, \d+ [A-Z]\.[A-Za-z]* \d+ \(\d{4}\)\b",
-        "statute_references": r"\d+ U\.S\.C\. § \d+[a-z]?",
-        "dates": r"\b(?:w\.e\.f\. )?\d*(?:st|nd|rd|th)? (?:day of )?(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?),?\s*\d*(?:st|nd|rd|th)?\,?\s*\d{4}\b",
-        "acts_references": r"\b(?:Act|Ordinance),? \d{4}\b",
-        "sections": r"\[sS]ect?i?o?n?\.?\s*\d*\([\da-zA-Z]\)-?[\da-zA-Z]*|[sS]ect?i?o?n?\.?\s*\d+\.*\d*\b",
-        "repealed_statements": r"\bRep\. by the [A-Za-z0-9() ]+ Ordinance, \d{4} \([A-Z]+ of \d{4}\), s\. \d+ \((?:w\.e\.f\. )?\d{1,2}(?:st|nd|rd|th)? (?:day of )?(?:Jan(?:uary)?|Feb(?:ruary)?|Mar(?:ch)?|Apr(?:il)?|May|Jun(?:e)?|Jul(?:y)?|Aug(?:ust)?|Sep(?:tember)?|Oct(?:ober)?|Nov(?:ember)?|Dec(?:ember)?),? \d{4}\)\b",
-    }
-
-    extracted = {key: re.findall(pattern, text) for key, pattern in patterns.items()}
+    """
+    Extracts every match of each legal pattern category. Each category is searched on its own, so a match may
+    overlap matches of other categories; PatternScanner finds all categories in one pass without overlaps.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        dict: Maps each category of PATTERNS to the list of its matches.
+    """
+    extracted = {key: pattern.findall(text) for key, pattern in COMPILED_PATTERNS.items()}
     return extracted
 
+
+class PatternScanner:
+    """
+    Finds the matches of several pattern categories in a single left-to-right scan. The categories are compiled once
+    into one regex with a named group per category, so each match reports its category and offsets directly.
+
+    Matches never overlap: at each position the first category in order that matches wins, and the scan resumes
+    after its end.
+    """
+
+    def __init__(self, patterns):
+        """
+        Args:
+            patterns (dict): Maps each category name, a valid Python identifier, to its regex; earlier categories
+                take precedence.
+        """
+        self.kinds = list(patterns)
+        # the group naming each category is an empty one after its pattern rather than one around it, so every
+        # alternative still starts with its own first character and the engine can rule it out without entering it
+        self.pattern = re.compile("|".join(f"(?:{pattern})(?P<{kind}>)" for kind, pattern in patterns.items()))
+
+    def _matches(self, text, pos, offset):
+        for match in self.pattern.finditer(text, pos):
+            yield PatternMatch(match.lastgroup, offset + match.start(), offset + match.end(), match.group())
+
+    def scan(self, text):
+        """
+        Scans a text.
+
+        Args:
+            text (str): The text.
+
+        Yields:
+            PatternMatch: Every match, in order of position.
+        """
+        return self._matches(text, 0, 0)
+
+    def scan_chunks(self, chunks, overlap=DEFAULT_OVERLAP):
+        """
+        Scans a text given as consecutive chunks, e.g. the pages of a gazette as they are read, holding only about
+        one chunk plus overlap characters in memory. The matches are the same as scanning the joined text, as long
+        as no match is longer than overlap characters.
+
+        Args:
+            chunks (iterable of str): The pieces of the text, in order.
+            overlap (int): The number of characters kept back from each chunk until the next one arrives, so matches
+                crossing a chunk boundary are found whole.
+
+        Yields:
+            PatternMatch: Every match, in order of position, with offsets in the joined text.
+        """
+        buffer = ""
+        # buffer starts at offset in the joined text; the scan resumes at pos, with the character before it kept so
+        # word boundaries at pos are decided as in the joined text
+        offset, pos = 0, 0
+        for chunk in chunks:
+            buffer += chunk
+            # a match starting before safe has overlap characters after it, so later chunks cannot change it
+            safe = len(buffer) - overlap
+            if safe <= pos:
+                continue
+            resume = safe
+            for match in self.pattern.finditer(buffer, pos):
+                if match.start() >= safe:
+                    break
+                yield PatternMatch(match.lastgroup, offset + match.start(), offset + match.end(), match.group())
+                resume = max(resume, match.end())
+            keep = max(resume - 1, 0)
+            buffer, offset, pos = buffer[keep:], offset + keep, resume - keep
+        yield from self._matches(buffer, pos, offset)
+
+
+pattern_scanner = PatternScanner({kind: PATTERNS[kind] for kind in SCAN_PRIORITY})
+
 def print_extracted_patterns(extracted):
     for pattern_name, matches in extracted.items():
         print(f"{pattern_name.replace('_', ' ').title()}: {matches}")
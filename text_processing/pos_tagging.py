@@ -1,25 +1,76 @@
-import spacy
-from spacy.tokens import Doc
-from spacy.training import Example
-from spacy.language import Language
+from utils.resources import get_resource, load_spacy_model
 
-nlp = spacy.load("en_core_web_sm")
+LEGAL_TERMS = ["Section", "Act", "Court", "Defendant"]
 
-@spacy.Language.component("legal_pos_tagger")
 def legal_pos_tagger(doc):
     # Consider legal-specific rules and patterns
     for token in doc:
         # Example: Rule-based tagging for legal-specific terms
-        if token.text in ["Section", "Act", "Court", "Defendant"]:
+        if token.text in LEGAL_TERMS:
             token.tag_ = "LEGAL_TERM"
         # Add more rules as necessary
     return doc
 
+# what tagging needs from en_core_web_sm: the tagger with the tok2vec it listens to, the attribute ruler that maps
+# its tags to coarse POS tags, and the entity recognizer; the parser and lemmatizer are left out
+TAGGING_COMPONENTS = ("tok2vec", "tagger", "attribute_ruler", "ner")
 
-nlp.add_pipe("legal_pos_tagger", after="tagger")
+def _build_legal_pos_model(components=None):
+    from spacy.language import Language
+
+    if not Language.has_factory("legal_pos_tagger"):
+        Language.component("legal_pos_tagger", func=legal_pos_tagger)
+    # a model of its own: the component must not leak into the shared model used for question preprocessing
+    model = load_spacy_model("en_core_web_sm", components)
+    model.add_pipe("legal_pos_tagger", after="tagger" if "tagger" in model.pipe_names else None)
+    return model
+
+def get_legal_pos_model(components=None):
+    """
+    Returns the spaCy pipeline with the legal_pos_tagger component, building it on first use.
+
+    Args:
+        components (iterable of str, optional): The en_core_web_sm components to keep, e.g. TAGGING_COMPONENTS.
+            All components are kept when None.
+
+    Returns:
+        spacy.language.Language: The legal POS tagging pipeline.
+    """
+    if components is None:
+        return get_resource(("spacy", "en_core_web_sm", "legal_pos_tagger"), _build_legal_pos_model)
+    components = tuple(sorted(components))
+    return get_resource(("spacy", "en_core_web_sm", components, "legal_pos_tagger"),
+                        lambda: _build_legal_pos_model(components))
+
+def tag_documents(texts, batch_size=64, n_process=1, components=TAGGING_COMPONENTS):
+    """
+    Tags many documents with the legal POS pipeline, streaming them through nlp.pipe in batches instead of calling
+    the pipeline once per document.
+
+    Args:
+        texts (iterable of str): The documents.
+        batch_size (int): The number of documents spaCy processes per batch.
+        n_process (int): The number of worker processes spaCy tags with.
+        components (iterable of str, optional): The en_core_web_sm components to run before legal_pos_tagger. The
+            full pipeline when None.
+
+    Yields:
+        spacy.tokens.Doc: The tagged document for each text, in order.
+    """
+    model = get_legal_pos_model(components)
+    yield from model.pipe(texts, batch_size=batch_size, n_process=n_process)
+
+def __getattr__(name):
+    # keeps `from text_processing.pos_tagging import nlp` working without loading the model at import time
+    if name == "nlp":
+        return get_legal_pos_model()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # Function to train the model
 def train_legal_pos_tagger(train_data):
+    from spacy.training import Example
+
+    nlp = get_legal_pos_model()
     optimizer = nlp.begin_training()
     for i in range(10):  # 10 iterations
         losses = {}
@@ -29,8 +80,9 @@ def train_legal_pos_tagger(train_data):
             nlp.update([example], drop=0.5, losses=losses)
     return nlp
 
-# Example usage
-text = "The court finds that the defendant violated Section 123 of the Act."
-doc = nlp(text)
-for token in doc:
-    print(token.text, token.pos_, token.tag_)
\ No newline at end of file
+if __name__ == "__main__":
+    # Example usage
+    text = "The court finds that the defendant violated Section 123 of the Act."
+    doc = get_legal_pos_model()(text)
+    for token in doc:
+        print(token.text, token.pos_, token.tag_)
@@ -0,0 +1,216 @@
+import functools
+import hashlib
+import json
+import os
+import re
+import string
+import warnings
+from utils.resources import get_resource
+
+current_dir = os.path.dirname(__file__)
+LEGAL_DICTIONARY_PATH = os.path.join(current_dir, "../legal_dictionary.txt")
+# the precomputed index is rebuilt whenever the word lists or the edit distance change; it is stored in the user's
+# cache directory, never inside the package
+CACHE_DIR = os.environ.get("LEGAL_QA_CACHE_DIR") or os.path.join(
+    os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache"), "legal-qa")
+SPELLING_INDEX_PATH = os.path.join(CACHE_DIR, "spelling_index.json")
+
+# TextBlob splits a string into these pieces before correcting each one
+WORD_PATTERN = re.compile(r"\w+|[^\w\s]|\s")
+
+def english_word_frequencies():
+    """
+    Reads the English word-frequency list TextBlob corrects against (word counts from Norvig's big.txt).
+
+    Returns:
+        dict: Maps each word to its count.
+    """
+    import textblob
+
+    path = os.path.join(os.path.dirname(textblob.__file__), "en", "en-spelling.txt")
+    frequencies = {}
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.startswith(";;;") or not line.strip():
+                continue
+            word, count = line.split()
+            frequencies[word] = int(count)
+    return frequencies
+
+def legal_word_frequencies(frequencies, dictionary_path=LEGAL_DICTIONARY_PATH):
+    """
+    Adds the words of the legal dictionary to a frequency list. Legal words the list lacks get a count of 1, so they
+    are recognized as correct without outranking common English words.
+
+    Args:
+        frequencies (dict): Maps each word to its count.
+        dictionary_path (str): The legal dictionary, space-separated words and phrases.
+
+    Returns:
+        dict: The merged frequencies.
+    """
+    merged = dict(frequencies)
+    with open(dictionary_path, "r", encoding="utf-8") as f:
+        for word in f.read().split():
+            merged.setdefault(word, 1)
+    return merged
+
+def deletes(word, max_edit_distance):
+    """
+    Returns every string obtained by deleting up to max_edit_distance characters from a word, the word included.
+    """
+    result = {word}
+    frontier = {word}
+    for _ in range(max_edit_distance):
+        frontier = {candidate[:i] + candidate[i + 1:] for candidate in frontier for i in range(len(candidate))}
+        result |= frontier
+    return result
+
+def edit_distance(a, b, max_distance):
+    """
+    The optimal string alignment distance (insertions, deletions, substitutions and adjacent transpositions) of two
+    strings, or max_distance + 1 when it is larger than max_distance.
+    """
+    if abs(len(a) - len(b)) > max_distance:
+        return max_distance + 1
+    previous_previous = None
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                current[j] = min(current[j], previous_previous[j - 2] + 1)
+        if min(current) > max_distance:
+            return max_distance + 1
+        previous_previous, previous = previous, current
+    return previous[-1] if previous[-1] <= max_distance else max_distance + 1
+
+class SpellingCorrector:
+    """
+    Spelling correction with a symmetric-delete index: every dictionary word is stored under each string its
+    deletions produce, so the candidates for a word are found by looking up its own deletions, without generating
+    the far larger set of insertions and substitutions.
+
+    Corrections follow TextBlob's rules: a known word is kept, otherwise the most frequent word at the smallest edit
+    distance wins, single characters and numbers are never changed, and title case is preserved. Recent corrections
+    are kept in an LRU cache.
+    """
+
+    def __init__(self, frequencies, max_edit_distance=2, index_path=None, cache_size=65536):
+        """
+        Args:
+            frequencies (dict): Maps each known word to its count.
+            max_edit_distance (int): The largest edit distance a correction may be from the word.
+            index_path (str, optional): The file the delete index is stored in, so later runs load it instead of
+                building it. The index is kept in memory only when None.
+            cache_size (int): The number of recent corrections to keep.
+        """
+        self.frequencies = frequencies
+        self.max_edit_distance = max_edit_distance
+        self.index = self._load_or_build_index(index_path)
+        self.correct_word = functools.lru_cache(maxsize=cache_size)(self._correct_word)
+
+    def fingerprint(self):
+        """
+        Identifies the word list and edit distance an index was built for.
+        """
+        digest = hashlib.sha256(str(self.max_edit_distance).encode())
+        for word in sorted(self.frequencies):
+            digest.update(word.encode("utf-8") + b"\0")
+        return digest.hexdigest()
+
+    def _load_or_build_index(self, index_path):
+        fingerprint = self.fingerprint()
+        if index_path is not None and os.path.exists(index_path):
+            # JSON rather than pickle: loading a file from a writable cache directory must not run code
+            try:
+                with open(index_path, "r", encoding="utf-8") as f:
+                    stored = json.load(f)
+                if stored["fingerprint"] == fingerprint:
+                    return stored["index"]
+            except (OSError, ValueError, KeyError, TypeError) as error:
+                warnings.warn(f"Ignoring unreadable spelling index {index_path}: {error}")
+        index = {}
+        for word in self.frequencies:
+            for deleted in deletes(word, self.max_edit_distance):
+                index.setdefault(deleted, []).append(word)
+        if index_path is not None:
+            # write then rename, so a reader never sees a half-written index
+            os.makedirs(os.path.dirname(os.path.abspath(index_path)), exist_ok=True)
+            with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump({"fingerprint": fingerprint, "index": index}, f, ensure_ascii=False)
+            os.replace(index_path + ".tmp", index_path)
+        return index
+
+    def candidates(self, word):
+        """
+        Finds the known words closest to a word.
+
+        Args:
+            word (str): The word.
+
+        Returns:
+            tuple: (distance, list of words) for the smallest edit distance within max_edit_distance, or
+                (None, []) when no known word is close enough.
+        """
+        if word in self.frequencies:
+            return 0, [word]
+        best_distance, best = self.max_edit_distance + 1, set()
+        for deleted in deletes(word, self.max_edit_distance):
+            for candidate in self.index.get(deleted, ()):
+                if candidate in best:
+                    continue
+                distance = edit_distance(word, candidate, self.max_edit_distance)
+                if distance > self.max_edit_distance:
+                    continue
+                if distance < best_distance:
+                    best_distance, best = distance, {candidate}
+                elif distance == best_distance:
+                    best.add(candidate)
+        if not best:
+            return None, []
+        return best_distance, sorted(best)
+
+    def _correct_word(self, word):
+        if len(word) == 1 or word in string.punctuation or word.replace(".", "").isdigit():
+            return word
+        _, candidates = self.candidates(word)
+        if not candidates:
+            return word
+        # the most frequent candidate; ties go to the word that sorts last, as in TextBlob
+        correction = max(candidates, key=lambda candidate: (self.frequencies[candidate], candidate))
+        return correction.title() if word.istitle() else correction
+
+    def correct(self, text):
+        """
+        Corrects the spelling of every word in a token or short text.
+
+        Args:
+            text (str): The token.
+
+        Returns:
+            str: The corrected text.
+        """
+        return "".join(self.correct_word(piece) if not piece.isspace() else piece
+                       for piece in WORD_PATTERN.findall(text))
+
+def get_spelling_corrector(index_path=SPELLING_INDEX_PATH, max_edit_distance=2):
+    """
+    Returns the shared corrector over the English word-frequency list merged with the legal dictionary, loading its
+    index from index_path or building and storing it on first use.
+
+    Args:
+        index_path (str, optional): The file the delete index is stored in, by default in $LEGAL_QA_CACHE_DIR or the
+            user's cache directory; None keeps it in memory only.
+        max_edit_distance (int): The largest edit distance a correction may be from the word.
+
+    Returns:
+        SpellingCorrector: The corrector.
+    """
+    def load():
+        frequencies = legal_word_frequencies(english_word_frequencies())
+        return SpellingCorrector(frequencies, max_edit_distance=max_edit_distance, index_path=index_path)
+
+    return get_resource(("spelling", index_path, max_edit_distance), load)
@@ -1,12 +1,51 @@
+import array
+import bisect
 import re
-import json
-from nltk.corpus import stopwords
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.tokenize import RegexpTokenizer
+import numpy as np
+from utils.helpers import find_citations
+
+# the custom word tokenizer pattern, with the flags nltk's RegexpTokenizer compiles it with; matching it directly
+# avoids importing nltk, which takes seconds
+WORD_PATTERN = re.compile(r'\w+(?:-\w+)*|\d+(?:\.\d+)?%?|\w+\.\w+|\S+', re.UNICODE | re.MULTILINE | re.DOTALL)
+
+# Simplified sentence splitting based on common punctuation
+SENTENCE_BOUNDARY = re.compile(r'(?<=[.!?])\s+')
+
+def _words(text, start, end, strings):
+    if strings:
+        return WORD_PATTERN.findall(text, start, end)
+    return [match.span() for match in WORD_PATTERN.finditer(text, start, end)]
+
+def _sentence_spans(text, strings=False):
+    # yields (sentence start, sentence end, tokens) for every sentence of the text; the tokens are (start, end) pairs,
+    # or the token strings themselves when strings is True
+    # citations end at their last non-space character, so whitespace a citation pattern takes is never in a token
+    citations = [(start, start + len(text[start:end].rstrip())) for start, end, _ in find_citations(text)]
+    citation_starts = [start for start, _ in citations]
+    next_citation = 0
+    sentence_start = 0
+    boundaries = [boundary.span() for boundary in SENTENCE_BOUNDARY.finditer(text)]
+    for sentence_end, boundary_end in boundaries + [(len(text), len(text))]:
+        if sentence_end < len(text):
+            # punctuation inside a citation ("Sec. 5.") does not end a sentence
+            i = bisect.bisect_right(citation_starts, sentence_end - 1) - 1
+            if i >= 0 and citations[i][1] > sentence_end - 1:
+                continue
+        tokens = []
+        position = sentence_start
+        while next_citation < len(citations) and citations[next_citation][0] < sentence_end:
+            start, end = citations[next_citation]
+            tokens.extend(_words(text, position, start, strings))
+            tokens.append(text[start:end] if strings else (start, end))
+            position = end
+            next_citation += 1
+        tokens.extend(_words(text, position, sentence_end, strings))
+        yield sentence_start, sentence_end, tokens
+        sentence_start = boundary_end
 
 def tokenize_legal_text(text):
     """
-    Tokenizes legal text into sentences and words using custom patterns.
+    Tokenizes legal text into sentences and words using custom patterns. Each citation is kept as a single token.
 
     Args:
         text (str): The input legal text to be tokenized.
@@ -14,31 +53,89 @@ def tokenize_legal_text(text):
     Returns:
         list of list of str: A nested list where each sublist contains tokens from a sentence.
     """
-    citation_pattern = re.compile(r'''[sS]ect?i?o?n?\.?\s*\d+\([\da-zA-Z]\)-*[\da-zA-Z]*|[sS]ect?i?o?n?\.?\s*\d+\.*\d*|[aA]ct\s*\,?\.?\s*\(*\d+\)*\s\([IivV]*\sof\s\d*\)\,*\s*[sSvV]*\.*\s*\d*|[aA]ct\s*\,?\.?\s*\(*\d+\)*|[aA]rti?c?l?e?\s*\,?\.?\s*\(*\d+\)*\s\([IivV]*\sof\s\d*\)\,*\s*[sSvV]*\.*\s*\d*|[aA]rti?c?l?e?\.?\s*\d*\(*\d+\)*|[eE]lection\s*[cC]ommission\s*[pP]etition\sOrder\s*No\.\s*\d+\/\d+|ECP\s*Order\s*No\.\s*\d+\/\d+|[pP]akistan\s*[pP]enal\s*[cC]ode\s*\d{4}|[pP][pP][cC]\s*\d{4}|[pP]g\.\s*\d+|[pP]g\.\s*\d+|\d+\s*[sS]tat\.\s*\d+|[sS]tatute\s*\d+|[cC]l\.\s*\d+|[pP]t\.\s*\d+|[tT]bl\.\s*\d+|[fF]ig\.\s*\d+|[lL]n\.\s*\d+|[pP]ara\.\s*\d+|[aA]pp\.\s*\d+|[cC]h\.\s*\d+|[vV]ol\.\s*\d+|[rR]eg\.\s*\d+|[oO]rdinance\,*\s*\d+\s\([VIvi]*\sof\s\d*\)\,*\s*\w*\.*\s*\d*|[oO]rdinance\,*\s*\d+|[oO]rd\.\s*\d+|[aA]rt\.\s*\d+\(\d+\)\(\d+\)|SRO\s*\d+\(I\)\/\d{4}|\d+\s*[rsnt][tdh]\s*[aA]mendment|[aA]IR\s*\d+\s*[a-zA-Z]+\s*\d+|[pP][lL][dD]\s*\d{4}\s*[sS][cC]\s*\d+|[rR]ule\s*\d+\(\d+\)|[rR]ule\s*\d+\(\[a-zA-Z]\)|[rR]ule\s*\d+|[pP]residential\s*[oO]rder\s*[nN]o\.*\s*\d+\s*of\s*\d{4}|[pP]residential\s*[oO]rder\s*[nN]o\.*\s*\d+|[aA]nti\s*\-\s*[tT]errorism\s*[aA]ct\s*\d{4}|[rR]eview\s*[pP]etition\s*[nN]o\.*\s*\d+\/\d{4}|[cC]onstitution\s*[pP]etition\s*[nN]o\.*\s*\d+\/\d{4}|[iI]ncome\s*[tT]ax\s*[oO]rdinance\s\d{4}|[cC]ompanies\s*[oO]rdinance\s*\d{4}|[cC]ompanies\s*[oO]rd\s*\d{4}|[nN]otification\s*[nN]o\.*\s*\d+-\w*\/\d{4}|\(*[wE]\s*\.*[eE]\s*\.*[fF]\s*\.?\s*[tT][hH][eE]\s*\d+[rnts][thd]\s*\w*\s*\w*\s*o*f*\s*\w*\,*\s*\d*\)*|[aA]\.?\s*[oO]\.?\s*\,*\s*\d+''')
-    citations = citation_pattern.findall(text)
-    citations = [''.join(citation) for citation in citations]  
-    placeholders = {f"__citation_{i}__": citation for i, citation in enumerate(citations)}
-    for placeholder, citation in placeholders.items():
-        text = text.replace(citation, placeholder)
-
-    # Simplified sentence splitting based on common punctuation
-    sentences = re.split(r'(?<=[.!?])\s+', text)
-    
-   # print("Sentences after split:", sentences)  # Debugging statement
-
-    # Custom word tokenizer pattern
-    word_tokenizer = RegexpTokenizer(r'\w+(?:-\w+)*|\d+(?:\.\d+)?%?|\w+\.\w+|\S+')
-    
-    tokenized_text = []
-    for sentence in sentences:
-        words = word_tokenizer.tokenize(sentence)
-        #print("Words in sentence:", words)  # Debugging statement
-        tokenized_text.append(words)
-
-    for i, sentence in enumerate(tokenized_text):
-        tokenized_text[i] = [placeholders.get(word, word) for word in sentence]
-    
-    return tokenized_text
+    return [words for _, _, words in _sentence_spans(text, strings=True)]
+
+def iter_legal_spans(text):
+    """
+    Tokenizes legal text one sentence at a time into character offsets, so the tokens of a huge document are never
+    all held at once. Each citation is kept as a single token.
+
+    Args:
+        text (str): The input legal text to be tokenized.
+
+    Yields:
+        tuple: ((start, end) of the sentence, int32 array of shape (n_tokens, 2) with the (start, end) of its tokens).
+    """
+    for sentence_start, sentence_end, spans in _sentence_spans(text):
+        yield (sentence_start, sentence_end), np.array(spans, dtype=np.int32).reshape(-1, 2)
+
+def tokenize_legal_spans(text):
+    """
+    Tokenizes legal text like tokenize_legal_text, but into character offsets in the original text instead of new
+    strings; the strings are only made when asked for.
+
+    Args:
+        text (str): The input legal text to be tokenized.
+
+    Returns:
+        TokenSpans: The sentence and token offsets.
+    """
+    # the offsets are collected as flat C ints rather than lists of tuples, which would take more memory than the
+    # token strings they replace while the text is being tokenized
+    sentences, tokens, sentence_tokens = array.array("i"), array.array("i"), array.array("i", [0])
+    for sentence_start, sentence_end, spans in _sentence_spans(text):
+        sentences.extend((sentence_start, sentence_end))
+        for span in spans:
+            tokens.extend(span)
+        sentence_tokens.append(len(tokens) // 2)
+    tokens, sentences, sentence_tokens = (np.frombuffer(offsets, dtype=np.intc).astype(np.int32)
+                                          for offsets in (tokens, sentences, sentence_tokens))
+    return TokenSpans(text, tokens.reshape(-1, 2), sentences.reshape(-1, 2), sentence_tokens)
+
+class TokenSpans:
+    """
+    The sentences and tokens of a text as int32 (start, end) offsets into it. Two arrays of offsets take a fraction
+    of the memory of a list of lists of token strings, and the strings are sliced from the text only when needed.
+
+    Attributes:
+        text (str): The tokenized text.
+        tokens (np.ndarray): The (start, end) of every token, shape (n_tokens, 2).
+        sentences (np.ndarray): The (start, end) of every sentence, shape (n_sentences, 2).
+        sentence_tokens (np.ndarray): The tokens of sentence i are tokens[sentence_tokens[i]:sentence_tokens[i + 1]].
+    """
+
+    def __init__(self, text, tokens, sentences, sentence_tokens):
+        self.text = text
+        self.tokens = tokens
+        self.sentences = sentences
+        self.sentence_tokens = sentence_tokens
+
+    def __len__(self):
+        return len(self.sentences)
+
+    def token(self, i):
+        """
+        Returns the text of token i.
+        """
+        start, end = self.tokens[i]
+        return self.text[start:end]
+
+    def sentence(self, i):
+        """
+        Returns the token strings of sentence i.
+        """
+        spans = self.tokens[self.sentence_tokens[i]:self.sentence_tokens[i + 1]].tolist()
+        return [self.text[start:end] for start, end in spans]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.sentence(i)
+
+    def to_lists(self):
+        """
+        Returns the tokens as tokenize_legal_text does, a list of token strings per sentence.
+        """
+        return list(self)
 
 # sample_text = """Sec. 1.2 Art. 184(3) the Ordinance 784 court also sec. 6.8 Sec. 1.2 finds Art. 9 
 # hiding act 67. Sec.3.5 Sec.6(8)-d defendant 114 Stat. 899 mr smith violated Sec. 3(a)-2 act. Art. 184(3) 
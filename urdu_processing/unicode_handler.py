@@ -1,7 +1,4 @@
 import unicodedata
-from langdetect import detect
-from urduhack import normalize
-from urduhack.urdu_characters import URDU_ALL_CHARACTERS
 
 urdu_to_latin_map = {
     'ا': 'a', 'ب': 'b', 'پ': 'p', 'ت': 't', 'ٹ': 'tt', 'ث': 's', 'ج': 'j',
@@ -22,6 +19,11 @@ def latin_to_urdu(text):
     return ''.join(latin_to_urdu_map.get(char, char) for char in text)
 
 def process_urdu_text(text):
+    # langdetect and urduhack are slow to import, so they are only loaded once text is processed
+    from langdetect import detect
+    from urduhack import normalize
+    from urduhack.urdu_characters import URDU_ALL_CHARACTERS
+
     text = unicodedata.normalize('NFKC', text)
     lang = detect(text)
     
@@ -36,14 +38,15 @@ def is_rtl(text):
     return ord(text[0]) >= 0x0600 and ord(text[0]) <= 0x06FF
 
 
-sample_text = "حکومت خود مختار ہے"
-processed_text, detected_lang = process_urdu_text(sample_text)
-print(f"Processed text: {processed_text}")
-print(f"Detected language: {detected_lang}")
-print(f"Is RTL: {is_rtl(processed_text)}")
+if __name__ == "__main__":
+    sample_text = "حکومت خود مختار ہے"
+    processed_text, detected_lang = process_urdu_text(sample_text)
+    print(f"Processed text: {processed_text}")
+    print(f"Detected language: {detected_lang}")
+    print(f"Is RTL: {is_rtl(processed_text)}")
 
-latin_text = urdu_to_latin(processed_text)
-print(f"Latin transliteration: {latin_text}")
+    latin_text = urdu_to_latin(processed_text)
+    print(f"Latin transliteration: {latin_text}")
 
-reverted_urdu_text = latin_to_urdu(latin_text)
-print(f"Reverted Urdu text: {reverted_urdu_text}")
\ No newline at end of file
+    reverted_urdu_text = latin_to_urdu(latin_text)
+    print(f"Reverted Urdu text: {reverted_urdu_text}")
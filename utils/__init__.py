@@ -1,5 +1,6 @@
-from .helpers import get_citation_pattern
+from .helpers import get_citation_pattern, find_citations, protect_citations, restore_citations
+from .resources import get_resource, get_spacy_model, load_spacy_model, ensure_nltk_data
 
-__all__ = ["get_citation_pattern"]
+__all__ = ["get_citation_pattern", "find_citations", "protect_citations", "restore_citations", "get_resource", "get_spacy_model", "load_spacy_model", "ensure_nltk_data"]
 
 __version__ = "1.0.0"
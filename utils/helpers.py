@@ -1,4 +1,122 @@
 import re
 
+# every citation form as (kind, regex), tried in this order at each position; the kind names the group a match
+# comes from, so one scan tells which form matched
+CITATION_PATTERNS = [
+    ("section", r"[sS]ect?i?o?n?\.?\s*\d+\([\da-zA-Z]\)-*[\da-zA-Z]*"),
+    ("section", r"[sS]ect?i?o?n?\.?\s*\d+\.*\d*"),
+    ("code_of_criminal_procedure",
+     r"[cC]ode\s+[oO]f\s*[cC]riminal\s*[pP]rocedure\,\s*\d+\s*\(?\w*\s*of\s*\d+\)?"),
+    # an Act with its name and an optional section: "Contract Act, 1872 Section 5"
+    ("act", r"\w+\s*[aA]ct\,?\s*\d{4}\,?\s*S?e?c?t?i?o?n\.?\s?\d*"),
+    ("act", r"[aA]ct\s*\,?\.?\s*\(*\d+\)*\s\([IivV]*\sof\s\d*\)\,*\s*[sSvV]*\.*\s*\d*"),
+    ("act", r"[aA]ct\s*\,?\.?\s*\(*\d+\)*"),
+    ("article", r"[aA]rti?c?l?e?\s*\,?\.?\s*\(*\d+\)*\s\([IivV]*\sof\s\d*\)\,*\s*[sSvV]*\.*\s*\d*"),
+    ("article", r"[aA]rti?c?l?e?\.?\s*\d*\(*\d+\)*"),
+    ("ecp_order", r"[eE]lection\s*[cC]ommission\s*[pP]etition\sOrder\s*No\.\s*\d+\/\d+"),
+    ("ecp_order", r"ECP\s*Order\s*No\.\s*\d+\/\d+"),
+    ("penal_code", r"[pP]akistan\s*[pP]enal\s*[cC]ode\s*\d{4}"),
+    ("penal_code", r"[pP][pP][cC]\s*\d{4}"),
+    ("page", r"[pP]g\.\s*\d+"),
+    ("statute", r"\d+\s*[sS]tat\.\s*\d+"),
+    ("statute", r"[sS]tatute\s*\d+"),
+    ("clause", r"[cC]l\.\s*\d+"),
+    ("part", r"[pP]t\.\s*\d+"),
+    ("table", r"[tT]bl\.\s*\d+"),
+    ("figure", r"[fF]ig\.\s*\d+"),
+    ("line", r"[lL]n\.\s*\d+"),
+    ("paragraph", r"[pP]ara\.\s*\d+"),
+    ("appendix", r"[aA]pp\.\s*\d+"),
+    ("chapter", r"[cC]h\.\s*\d+"),
+    ("volume", r"[vV]ol\.\s*\d+"),
+    ("regulation", r"[rR]eg\.\s*\d+"),
+    ("ordinance", r"[cC]opyright\s*[oO]rdinance\s*o?f?\s*\d{4}"),
+    ("ordinance", r"[oO]rdinance\,*\s*\d+\s\([VIvi]*\sof\s\d*\)\,*\s*\w*\.*\s*\d*"),
+    ("ordinance", r"[oO]rdinance\,*\s*\d+"),
+    ("ordinance", r"[oO]rd\.\s*\d+"),
+    ("article", r"[aA]rt\.\s*\d+\(\d+\)\(\d+\)"),
+    ("sro", r"SRO\s*\d+\(I\)\/\d{4}"),
+    ("amendment", r"\d+\s*[rsnt][tdh]\s*[aA]mendment"),
+    ("case_law", r"[aA]IR\s*\d+\s*[a-zA-Z]+\s*\d+"),
+    ("case_law", r"[pP][lL][dD]\s*\d{4}\s*[sS][cC]\s*\d+"),
+    ("rule", r"[rR]ule\s*\d+\(\d+\)"),
+    ("rule", r"[rR]ule\s*\d+\(\[a-zA-Z]\)"),
+    ("rule", r"[rR]ule\s*\d+"),
+    ("presidential_order", r"[pP]residential\s*[oO]rder\s*[nN]o\.*\s*\d+\s*of\s*\d{4}"),
+    ("presidential_order", r"[pP]residential\s*[oO]rder\s*[nN]o\.*\s*\d+"),
+    ("act", r"[aA]nti\s*\-\s*[tT]errorism\s*[aA]ct\s*\d{4}"),
+    ("petition", r"[rR]eview\s*[pP]etition\s*[nN]o\.*\s*\d+\/\d{4}"),
+    ("petition", r"[cC]onstitution\s*[pP]etition\s*[nN]o\.*\s*\d+\/\d{4}"),
+    ("ordinance", r"[iI]ncome\s*[tT]ax\s*[oO]rdinance\s*o?f?\s*\d{4}"),
+    ("ordinance", r"[cC]ompanies\s*[oO]rdinance\s*o?f?\s*\d{4}"),
+    ("ordinance", r"[cC]ompanies\s*[oO]rd\s*\d{4}"),
+    ("notification", r"[nN]otification\s*[nN]o\.*\s*\d+-\w*\/\d{4}"),
+    ("effective_date", r"\(*[wE]\s*\.*[eE]\s*\.*[fF]\s*\.?\s*[tT][hH][eE]\s*\d+[rnts][thd]\s*\w*\s*\w*\s*o*f*\s*\w*\,*\s*\d*\)*"),
+    ("adaptation_order", r"[aA]\.?\s*[oO]\.?\s*\,*\s*\d+"),
+    ("date", r"\b(?:January|February|March|April|May|June|July|August|September|October|November|December|Jan|Feb|Mar|"
+             r"Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\s+\d{1,2}[rnts]*[thd]*\s*\,*\s*\d*"),
+]
+
+# compiled once for every caller; group c<i> holds a match of CITATION_PATTERNS[i]
+CITATION_PATTERN = re.compile("|".join(f"(?P<c{i}>{pattern})" for i, (_, pattern) in enumerate(CITATION_PATTERNS)))
+
+# the placeholder cleaning and tokenization put in place of the i-th citation of a text
+CITATION_PLACEHOLDER = "__citation_{}__"
+PLACEHOLDER_PATTERN = re.compile(r"__citation_(\d+)__")
+
 def get_citation_pattern():
-    return re.compile(r'''[sS]ect?i?o?n?\.?\s*\d+\([\da-zA-Z]\)-*[\da-zA-Z]*|[sS]ect?i?o?n?\.?\s*\d+\.*\d*|[cC]ode\s+[oO]f\s*[cC]riminal\s*[pP]rocedure\,\s*\d+\s*\(?\w*\s*of\s*\d+\)?|[aA]ct\s*\,?\.?\s*\(*\d+\)*\s*\(*[IivV]*\s*of*\s*\d*\)*\,*\s*[sSvV]*\.*\s*\d*|\w+\s*[aA]ct\,?\s*\d{4}\,?\s*S?e?c?t?i?o?n\.?\s?\d*|[aA]rti?c?l?e?\.?\s*\(*\d+\)*\s*\(*[IivV]*\s*o*f*\s*\d*\)*\,*\s*[sSvV]*\.*\s*\d*|[aA]rt\.\s*\d+\(\d+\)|[eE]lection\s*[cC]ommission\s*[pP]etition\sOrder\s*No\.\s*\d+\/\d+|ECP\s*Order\s*No\.\s*\d+\/\d+|[pP]akistan\s*[pP]enal\s*[cC]ode\s*\d{4}|[pP][pP][cC]\s*\d{4}|[pP]g\.\s*\d+|[pP]g\.\s*\d+|\d+\s*[sS]tat\.\s*\d+|[sS]tatute\s*\d+|[cC]l\.\s*\d+|[pP]t\.\s*\d+|[tT]bl\.\s*\d+|[fF]ig\.\s*\d+|[lL]n\.\s*\d+|[pP]ara\.\s*\d+|[aA]pp\.\s*\d+|[cC]h\.\s*\d+|[vV]ol\.\s*\d+|[rR]eg\.\s*\d+|[cC]opyright\s*[oO]rdinance\s*o?f?\s*\d{4}|[oO]rdinance\,*\s*\d+\s*\(*[VIvi]*\s*o*f*\s*\d*\)*\s*\,*\s*[vsVS]*\.*\s*\d*|[oO]rd\.\s*\d+|[aA]rt\.\s*\d+\(\d+\)\(\d+\)|SRO\s*\d+\(I\)\/\d{4}|\d+\s*[rsnt][tdh]\s*[aA]mendment|[aA]IR\s*\d+\s*[a-zA-Z]+\s*\d+|[pP][lL][dD]\s*\d{4}\s*[sS][cC]\s*\d+|[rR]ule\s*\d+\(\d+\)|[rR]ule\s*\d+\(\[a-zA-Z]\)|[rR]ule\s*\d+|[pP]residential\s*[oO]rder\s*[nN]o\.*\s*\d+\s*of\s*\d{4}|[pP]residential\s*[oO]rder\s*[nN]o\.*\s*\d+|[aA]nti\s*\-\s*[tT]errorism\s*[aA]ct\s*\d{4}|[rR]eview\s*[pP]etition\s*[nN]o\.*\s*\d+\/\d{4}|[cC]onstitution\s*[pP]etition\s*[nN]o\.*\s*\d+\/\d{4}|[iI]ncome\s*[tT]ax\s*[oO]rdinance\s*o?f?\s*\d{4}|[cC]ompanies\s*[oO]rdinance\s*o?f?\s*\d{4}|[cC]ompanies\s*[oO]rd\s*\d{4}|[nN]otification\s*[nN]o\.*\s*\d+-\w*\/\d{4}|\(*[wE]\s*\.*[eE]\s*\.*[fF]\s*\.?\s*[tT][hH][eE]\s*\d+[rnts][thd]\s*\w*\s*\w*\s*o*f*\s*\w*\,*\s*\d*\)*|[aA]\.?\s*[oO]\.?\s*\,*\s*\d+|\b(?:January|February|March|April|May|June|July|August|September|October|November|December|Jan|Feb|Mar|Apr|Jun|Jul|Aug|Sep|Sept|Oct|Nov|Dec)\s+\d{1,2}[rnts]*[thd]*\s*\,*\s*\d*''')
+    return CITATION_PATTERN
+
+def find_citations(text):
+    """
+    Finds the citations in a text in one left-to-right scan.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        list of tuple: (start, end, kind) of every citation, in order of position.
+    """
+    return [(match.start(), match.end(), CITATION_PATTERNS[int(match.lastgroup[1:])][0])
+            for match in CITATION_PATTERN.finditer(text)]
+
+def protect_citations(text):
+    """
+    Replaces every citation with a numbered placeholder, slicing the text at the citation spans, so later
+    transformations leave the citations intact.
+
+    Args:
+        text (str): The text.
+
+    Returns:
+        tuple: (text with placeholders, list of citations), where the i-th citation replaced CITATION_PLACEHOLDER(i).
+    """
+    pieces = []
+    citations = []
+    last = 0
+    for start, end, _ in find_citations(text):
+        pieces.append(text[last:start])
+        pieces.append(CITATION_PLACEHOLDER.format(len(citations)))
+        citations.append(text[start:end])
+        last = end
+    pieces.append(text[last:])
+    return "".join(pieces), citations
+
+def restore_citations(text, citations):
+    """
+    Puts the citations protect_citations took out back in place of their placeholders, in one pass.
+
+    Args:
+        text (str): The text with placeholders.
+        citations (list of str): The citations protect_citations returned.
+
+    Returns:
+        str: The text with citations.
+    """
+    if not citations:
+        return text
+    def citation(match):
+        index = int(match.group(1))
+        return citations[index] if index < len(citations) else match.group(0)
+
+    return PLACEHOLDER_PATTERN.sub(citation, text)
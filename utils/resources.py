@@ -0,0 +1,156 @@
+import threading
+
+# heavy resources (spaCy models, NLTK data, transformers) are created on first use and shared by every package,
+# so importing a module never loads a model, touches the network or prints anything
+_resources = {}
+_lock = threading.RLock()
+_checked_nltk_packages = set()
+
+# where nltk.data.find looks for each downloadable package
+NLTK_RESOURCE_PATHS = {
+    "punkt": "tokenizers/punkt",
+    "averaged_perceptron_tagger": "taggers/averaged_perceptron_tagger",
+    "maxent_ne_chunker": "chunkers/maxent_ne_chunker",
+    "words": "corpora/words",
+    "wordnet": "corpora/wordnet",
+    "stopwords": "corpora/stopwords",
+}
+
+
+def get_resource(key, factory):
+    """
+    Returns the shared resource stored under key, creating it with factory() on first use.
+
+    The factory runs at most once per key, even when several threads ask for the resource at the same time.
+
+    Args:
+        key (hashable): The name of the resource.
+        factory (callable): Builds the resource.
+
+    Returns:
+        object: The resource.
+    """
+    try:
+        return _resources[key]
+    except KeyError:
+        pass
+    with _lock:
+        if key not in _resources:
+            _resources[key] = factory()
+        return _resources[key]
+
+
+def is_loaded(key):
+    """
+    Tells whether the resource stored under key has been created.
+
+    Args:
+        key (hashable): The name of the resource.
+
+    Returns:
+        bool: True once get_resource has built it.
+    """
+    return key in _resources
+
+
+def spacy_components(name):
+    """
+    Lists the components of a spaCy pipeline from its meta.json, without loading the pipeline.
+
+    Args:
+        name (str): The spaCy model name or path.
+
+    Returns:
+        list of str: The names of all components, including those disabled by default.
+    """
+    from pathlib import Path
+    import spacy
+
+    path = spacy.util.get_package_path(name) if spacy.util.is_package(name) else Path(name)
+    meta = spacy.util.get_model_meta(path)
+    return meta.get("components", meta["pipeline"])
+
+
+def load_spacy_model(name, components=None):
+    """
+    Loads a spaCy pipeline, with only the given components. The other components are excluded, so their weights
+    are never read and they take no time per document.
+
+    Args:
+        name (str): The spaCy model name or path.
+        components (iterable of str, optional): The components to keep, including those they depend on (e.g.
+            "tok2vec" for a tagger listening to it). All components are kept when None.
+
+    Returns:
+        spacy.language.Language: The loaded pipeline.
+    """
+    import spacy
+
+    if components is None:
+        return spacy.load(name)
+    available = spacy_components(name)
+    unknown = set(components) - set(available)
+    if unknown:
+        raise ValueError(f"{name} has no components {sorted(unknown)}, expected some of {available}")
+    return spacy.load(name, exclude=[component for component in available if component not in components])
+
+
+def get_spacy_model(name="en_core_web_sm", components=None):
+    """
+    Returns the shared spaCy pipeline of the given name, loading it on first use. Each combination of name and
+    components is loaded once per process.
+
+    Callers must not add or remove pipeline components on the shared model; build a separate model through
+    get_resource for that.
+
+    Args:
+        name (str): The spaCy model name or path.
+        components (iterable of str, optional): The components to keep, as in load_spacy_model. All components are
+            kept when None.
+
+    Returns:
+        spacy.language.Language: The loaded pipeline.
+    """
+    if components is None:
+        return get_resource(("spacy", name), lambda: load_spacy_model(name))
+    components = tuple(sorted(components))
+    return get_resource(("spacy", name, components), lambda: load_spacy_model(name, components))
+
+
+def ensure_nltk_data(*packages):
+    """
+    Makes sure NLTK data packages are installed, downloading only those that are missing.
+
+    Each package is checked once per process, so calling this on every use is cheap.
+
+    Args:
+        *packages (str): The NLTK package names, e.g. "wordnet".
+    """
+    missing = [package for package in packages if package not in _checked_nltk_packages]
+    if not missing:
+        return
+    import nltk
+
+    with _lock:
+        for package in missing:
+            try:
+                nltk.data.find(NLTK_RESOURCE_PATHS.get(package, package))
+            except LookupError:
+                nltk.download(package, quiet=True)
+            _checked_nltk_packages.add(package)
+
+
+def pipeline(*args, **kwargs):
+    """
+    Builds a Hugging Face pipeline, importing transformers only when the first pipeline is needed.
+
+    Args:
+        *args: Passed on to transformers.pipeline.
+        **kwargs: Passed on to transformers.pipeline.
+
+    Returns:
+        transformers.Pipeline: The pipeline.
+    """
+    from transformers import pipeline as transformers_pipeline
+
+    return transformers_pipeline(*args, **kwargs)